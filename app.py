@@ -1,17 +1,65 @@
+import asyncio
 import base64
+import glob
+import json
+import mimetypes
+import re
 import time
 import subprocess
 import os
 import zipfile
 import shutil
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
-from utils.extractPhotosFromVideo import extract_frames_smart
+import threading
+from collections import deque
+from functools import partial
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from utils.extractPhotosFromVideo import extract_frames_smart, video_frame_size
+from utils.imageSource import save_image_source, load_image_source, record_working_resolution
+from utils.featureStore import (plan_feature_extraction, write_import_stubs,
+                                write_cached_features, store_extracted_features,
+                                evict_feature_store)
+from utils.featureMatching import (choose_matching_strategy, prepare_matching,
+                                   prepare_append_matching, build_matching_command,
+                                   count_database_pairs)
+from utils.cameraGroups import (group_images_by_camera, camera_reader_options,
+                                read_camera_id, summarize_camera_groups)
+from utils.sparseQualityGate import (evaluate_sparse_quality, SparseQualityError,
+                                     MIN_REGISTRATION_RATIO, MIN_SPARSE_POINTS,
+                                     MIN_MEAN_TRACK_LENGTH)
+from utils.objectROI import compute_object_roi, write_openmvs_roi
+from utils.meshStatistics import mesh_statistics
+from utils.imageProbe import directory_index
+from utils.photoIngest import list_zip_images, ingest_zip_images
+from utils.photoPruning import (prune_photos, save_pruning_report, load_pruning_suggestions,
+                                NEAR_DUPLICATE_DISTANCE, BLUR_OUTLIER_RATIO)
+from utils.resolutionPolicy import (resolution_policy, working_scale,
+                                    summarize_working_resolution)
+from utils.thumbnails import (schedule_thumbnails, thumbnail_file, THUMBNAIL_SIZES,
+                              DEFAULT_THUMBNAIL_SIZE)
+from utils.meshExport import export_glb_lods, LOD_PATH_TEMPLATE
+from utils.resultPackage import (write_result_zip, file_etag, etag_matches, parse_range,
+                                 iter_file_range)
+from utils.pointCloudFilter import filter_dense_point_cloud, ply_element_count
+from utils.meshProcessing import process_mesh
+from utils.sparsePreview import export_sparse_preview, SPARSE_PREVIEW_PATH
+from utils.qualityPresets import get_quality_preset, next_quality_preset, MAX_THREADS
+from utils.jobs import (create_job, submit_job, current_job, get_job, list_jobs,
+                        job_summary, cancel_job, cancel_active_jobs, check_cancelled,
+                        attach_process, detach_process, terminate_process_group,
+                        publish_event, events_since, JobCancelled, ACTIVE_STATUSES)
+from utils.progressParser import follow_output, overall_progress
+from utils.stageProfiler import (new_profile, start_stage, finish_profile, track_process,
+                                 stage_key, describe_dataset, aggregate_profiles)
+from utils.runtimeModel import (get_runtime_model, predict_stage_seconds, stage_timeout,
+                                APPEND_STAGES)
+from utils.metrics import inc_counter, observe, render_metrics
+from utils.sceneState import (save_scene_state, load_scene_state, restore_scene_state,
+                              clear_scene_state)
 from fastapi.responses import FileResponse, Response
-import cv2
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import numpy as np
 
 app = FastAPI()
@@ -24,89 +72,56 @@ app.add_middleware(
 )
 
 
-def extract_mesh_statistics(obj_file_path):
-    """
-    Extrae estadísticas básicas de un archivo OBJ
-    """
-    if not os.path.exists(obj_file_path):
-        return None
-
-    vertices = 0
-    faces = 0
-    texture_coords = 0
-    normals = 0
-
+@app.middleware("http")
+async def measure_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
     try:
-        with open(obj_file_path, 'r') as file:
-            for line in file:
-                line = line.strip()
-                if line.startswith('v '):  # Vertex
-                    vertices += 1
-                elif line.startswith('f '):  # Face
-                    faces += 1
-                elif line.startswith('vt '):  # Texture coordinate
-                    texture_coords += 1
-                elif line.startswith('vn '):  # Vertex normal
-                    normals += 1
-
-        # Calcular triángulos (la mayoría de faces en fotogrametría son triángulos)
-        triangles = faces  # Asumir que cada face es un triángulo
-
-        # Calcular tamaño del archivo
-        file_size_bytes = os.path.getsize(obj_file_path)
-        file_size_mb = file_size_bytes / (1024 * 1024)
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Plantilla de la ruta ("/jobs/{job_id}") para no crear una serie por id
+        route = request.scope.get("route")
+        observe("http_request_duration_seconds", time.perf_counter() - start,
+                method=request.method, route=route.path if route else "desconocida",
+                status=status)
 
-        return {
-            "vertices": vertices,
-            "faces": faces,
-            "triangles": triangles,  # Generalmente faces = triangles en fotogrametría
-            "texture_coordinates": texture_coords,
-            "vertex_normals": normals,
-            "file_size_bytes": file_size_bytes,
-            "file_size_mb": round(file_size_mb, 2)
-        }
 
-    except Exception as e:
-        print(f"Error leyendo estadísticas del mesh: {e}")
-        return None
+def record_upload(endpoint, size_bytes, seconds):
+    inc_counter("upload_bytes_total", size_bytes, endpoint=endpoint)
+    if seconds > 0:
+        observe("upload_throughput_bytes_per_second", size_bytes / seconds,
+                endpoint=endpoint)
 
 
 def get_texture_files_info(data_folder):
     """
-    Obtiene información sobre los archivos de textura
+    Obtiene información sobre los archivos de textura (dimensiones leídas de
+    las cabeceras, sin decodificar las texturas)
     """
-    texture_files = [f for f in os.listdir(data_folder)
-                     if f.lower().endswith(('.jpg', '.jpeg', '.png')) and 'texture' in f.lower()]
+    index = directory_index(data_folder, ('.jpg', '.jpeg', '.png'))
+    texture_files = [f for f in index if 'texture' in f.lower()]
 
     texture_info = []
     total_texture_size = 0
 
     for texture_file in texture_files:
-        texture_path = os.path.join(data_folder, texture_file)
-        if os.path.exists(texture_path):
-            size_bytes = os.path.getsize(texture_path)
-            total_texture_size += size_bytes
-
-            # Obtener dimensiones de la textura
-            try:
-                import cv2
-                img = cv2.imread(texture_path)
-                if img is not None:
-                    height, width = img.shape[:2]
-                    texture_info.append({
-                        "filename": texture_file,
-                        "size_bytes": size_bytes,
-                        "size_mb": round(size_bytes / (1024 * 1024), 2),
-                        "width": width,
-                        "height": height,
-                        "resolution": f"{width}x{height}"
-                    })
-            except:
-                texture_info.append({
-                    "filename": texture_file,
-                    "size_bytes": size_bytes,
-                    "size_mb": round(size_bytes / (1024 * 1024), 2)
-                })
+        metadata = index[texture_file]
+        size_bytes = metadata["size"]
+        total_texture_size += size_bytes
+        info = {
+            "filename": texture_file,
+            "size_bytes": size_bytes,
+            "size_mb": round(size_bytes / (1024 * 1024), 2)
+        }
+        if metadata["width"] and metadata["height"]:
+            info.update({
+                "width": metadata["width"],
+                "height": metadata["height"],
+                "resolution": f"{metadata['width']}x{metadata['height']}"
+            })
+        texture_info.append(info)
 
     return {
         "texture_files": texture_info,
@@ -119,43 +134,177 @@ class PhotoSelectionRequest(BaseModel):
     selected_photos: List[str]
 
 
-def run_command(cmd, timeout=300):
+# Líneas finales de stdout/stderr que se conservan de cada comando
+OUTPUT_TAIL_LINES = 200
+
+
+def run_command(cmd, timeout=300, progress_total=None):
+    """
+    Ejecuta un comando en su propio grupo de procesos, de modo que un timeout
+    o la cancelación del trabajo terminan también sus procesos hijos.
+    La salida se lee conforme se produce: el progreso reconocido se publica
+    como eventos del trabajo y solo se conservan las últimas líneas
+    """
+    check_cancelled()
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True, errors="replace", cwd="/data",
+                                   start_new_session=True)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+    attach_process(process)
+    job = current_job()
+    publish = partial(publish_event, job) if job else None
+    tool = os.path.basename(cmd[0]) if cmd[0] != "colmap" else f"colmap {cmd[1]}"
+    stdout_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    stderr_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    readers = [
+        threading.Thread(target=follow_output, daemon=True,
+                         args=(process.stdout, stdout_tail, tool, publish, progress_total)),
+        threading.Thread(target=follow_output, daemon=True,
+                         args=(process.stderr, stderr_tail, tool, publish, progress_total))
+    ]
+    for reader in readers:
+        reader.start()
+
     try:
-        result = subprocess.run(cmd, capture_output=True,
-                                text=True, timeout=timeout, cwd="/data")
-        return {
-            "success": result.returncode == 0,
-            "stdout": result.stdout,
-            "stderr": result.stderr,
-            "returncode": result.returncode
-        }
+        with track_process(process.pid):
+            process.wait(timeout=timeout)
     except subprocess.TimeoutExpired:
+        terminate_process_group(process)
+        process.wait()
+        check_cancelled()
         return {"success": False, "error": "Comando excedió tiempo límite"}
     except Exception as e:
         return {"success": False, "error": str(e)}
+    finally:
+        for reader in readers:
+            reader.join(timeout=5)
+        detach_process()
+
+    check_cancelled()
+    return {
+        "success": process.returncode == 0,
+        "stdout": "\n".join(stdout_tail),
+        "stderr": "\n".join(stderr_tail),
+        "returncode": process.returncode
+    }
+
+
+# Elementos de /data que se conservan entre ejecuciones
+WORKSPACE_FILES = ["images", "images_source.json", "cache", "scene_state"]
+
+
+def clean_data_folder(files_to_keep):
+    """
+    Elimina de /data todo lo que no esté en files_to_keep
+    """
+    for item in os.listdir("/data"):
+        item_path = f"/data/{item}"
+        if item not in files_to_keep:
+            try:
+                if os.path.isfile(item_path):
+                    os.remove(item_path)
+                elif os.path.isdir(item_path):
+                    shutil.rmtree(item_path)
+            except Exception as e:
+                print(f"Error eliminando {item}: {e}")
 
 
-def reduce_image_resolution(image_path, reduction_percentage):
-    if reduction_percentage <= 0:
-        return
+def write_image_list(image_names, image_list_path):
+    with open(image_list_path, "w") as file:
+        file.write("\n".join(image_names) + "\n")
+    return ["--image_list_path", image_list_path]
 
-    img = cv2.imread(image_path)
-    if img is None:
-        return
 
-    height, width = img.shape[:2]
-    scale_factor = 1 - (reduction_percentage / 100)
-    new_width = int(width * scale_factor)
-    new_height = int(height * scale_factor)
+def extract_features(image_names, max_image_size=None, timeout=600):
+    """
+    Extrae features SIFT de las imágenes indicadas en /data/database.db,
+    reutilizando las que ya están en el almacén de features.
+    Las imágenes de una misma cámara (frames de video o EXIF idéntico) se
+    registran con una sola cámara y, si se conoce, con la focal a priori.
+    max_image_size limita la resolución usada por SIFT (preset de previsualización)
+    y timeout es el de cada comando de COLMAP
+    """
+    sift_options = ["--SiftExtraction.use_gpu", "1"]
+    if max_image_size:
+        sift_options += ["--SiftExtraction.max_image_size", str(max_image_size)]
+    feature_plan = plan_feature_extraction(
+        "/data/images", image_names, sift_options)
+    cached_images = set(feature_plan["cached"])
+
+    camera_groups = group_images_by_camera(
+        "/data/images", image_names, load_image_source())
+
+    for group in camera_groups:
+        reader_options = camera_reader_options(group)
+        cached = [name for name in group["images"] if name in cached_images]
+        missing = [name for name in group["images"]
+                   if name not in cached_images]
+
+        if cached:
+            write_import_stubs(cached, "/data/features_import")
+            cmd = [
+                "colmap", "feature_importer",
+                "--database_path", "/data/database.db",
+                "--image_path", "/data/images",
+                "--import_path", "/data/features_import"
+            ] + write_image_list(cached, "/data/image_list.txt") + reader_options
+            result = run_command(cmd, timeout=timeout)
+            if not result["success"]:
+                raise Exception(
+                    f"Error importando características en caché: {result.get('stderr', result.get('error'))}")
+
+        if missing:
+            # Reutilizar la cámara ya creada por el importador para el mismo grupo
+            if group["shared_camera"] and cached:
+                camera_id = read_camera_id("/data/database.db", cached[0])
+                if camera_id is not None:
+                    reader_options = [
+                        "--ImageReader.existing_camera_id", str(camera_id)]
+            cmd = [
+                "colmap", "feature_extractor",
+                "--database_path", "/data/database.db",
+                "--image_path", "/data/images"
+            ] + write_image_list(missing, "/data/image_list.txt") + reader_options + sift_options
+            result = run_command(cmd, timeout=timeout)
+            if not result["success"]:
+                raise Exception(
+                    f"Error en extracción de características: {result.get('stderr', result.get('error'))}")
+
+    if feature_plan["cached"]:
+        write_cached_features("/data/database.db", feature_plan)
+    if feature_plan["missing"]:
+        store_extracted_features("/data/database.db", feature_plan)
+
+    feature_store_info = {
+        "cached_images": len(feature_plan["cached"]),
+        "extracted_images": len(feature_plan["missing"])
+    }
+    feature_store_info.update(evict_feature_store())
+    return feature_store_info, summarize_camera_groups(camera_groups)
+
 
-    if new_width > 0 and new_height > 0:
-        resized_img = cv2.resize(
-            img, (new_width, new_height), interpolation=cv2.INTER_AREA)
-        cv2.imwrite(image_path, resized_img)
+def next_image_index(images_folder):
+    """
+    Siguiente índice libre para nombres image_XXXX en la carpeta de imágenes
+    """
+    indices = [int(match.group(1)) for match in
+               (re.match(r"image_(\d+)", f) for f in os.listdir(images_folder)) if match]
+    return max(indices, default=0) + 1
 
 
 @app.get("/photos")
-async def get_photos():
+async def get_photos(page: int = 1, page_size: Optional[int] = None):
+    """
+    Lista las fotos con sus miniaturas. Sin page_size se devuelven todas
+    """
+    if page < 1 or (page_size is not None and page_size < 1):
+        raise HTTPException(
+            status_code=400,
+            detail="page y page_size deben ser mayores que 0"
+        )
     if not os.path.exists("/data/images"):
         return {
             "success": False,
@@ -163,40 +312,91 @@ async def get_photos():
             "photos": []
         }
 
-    photos = [f for f in os.listdir(
-        "/data/images") if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif'))]
+    index = directory_index("/data/images")
+    photos = sorted(index)
+    if page_size is not None:
+        photos = photos[(page - 1) * page_size:page * page_size]
 
+    suggestions = load_pruning_suggestions(index)
     photo_info = []
     for photo in photos:
-        photo_path = f"/data/images/{photo}"
-        if os.path.exists(photo_path):
-            file_size = os.path.getsize(photo_path)
-            photo_info.append({
-                "filename": photo,
-                "size": file_size,
-                "url": f"/photo/{photo}"
-            })
+        metadata = index[photo]
+        # La versión en la URL permite cachear las miniaturas indefinidamente
+        version = f"{metadata['size']:x}-{metadata['mtime_ns']:x}"
+        thumbnails = {str(size): f"/thumbnail/{size}/{photo}?v={version}"
+                      for size in THUMBNAIL_SIZES}
+        photo_info.append({
+            "filename": photo,
+            "size": metadata["size"],
+            "width": metadata["width"],
+            "height": metadata["height"],
+            "url": f"/photo/{photo}",
+            "thumbnail_url": thumbnails[str(DEFAULT_THUMBNAIL_SIZE)],
+            "thumbnails": thumbnails,
+            # Sugerencias de la poda de la subida: el selector las muestra deseleccionadas
+            "suggested_deselect": photo in suggestions,
+            "prune_reason": suggestions.get(photo)
+        })
 
     return {
         "success": True,
         "photos": photo_info,
-        "total_count": len(photo_info)
+        "total_count": len(index),
+        "suggested_deselect_count": len(suggestions),
+        "page": page,
+        "page_size": page_size or len(index),
+        "total_pages": -(-len(index) // page_size) if page_size else 1
     }
 
 
 @app.get("/photo/{filename}")
-async def get_photo(filename: str):
+async def get_photo(filename: str, request: Request):
     file_path = f"/data/images/{filename}"
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Foto no encontrada")
 
+    etag = file_etag(file_path)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
     return FileResponse(
         path=file_path,
         filename=filename,
-        media_type="image/*"
+        media_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        headers=headers
     )
 
 
+@app.get("/thumbnail/{size}/{filename}")
+async def get_thumbnail(size: int, filename: str, request: Request, v: Optional[str] = None):
+    """
+    Miniatura JPEG de una foto. Con la versión de /photos (parámetro v) la
+    respuesta se puede cachear sin revalidar; sin ella se revalida con el ETag
+    """
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=404, detail="Tamaño de miniatura no disponible")
+    image_path = f"/data/images/{filename}"
+    if os.path.basename(filename) != filename or not os.path.exists(image_path):
+        raise HTTPException(status_code=404, detail="Foto no encontrada")
+
+    try:
+        path, etag = await asyncio.get_running_loop().run_in_executor(
+            None, thumbnail_file, image_path, size)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except OSError:
+        raise HTTPException(status_code=404, detail="Foto no encontrada")
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable" if v else "no-cache"
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path=path, media_type="image/jpeg", headers=headers)
+
+
 @app.post("/photos/select")
 async def select_photos(request: PhotoSelectionRequest):
     if not os.path.exists("/data/images"):
@@ -234,160 +434,374 @@ async def select_photos(request: PhotoSelectionRequest):
     }
 
 
-@app.post("/photogrammetry")
-async def run_photogrammetry_pipeline():
-    if not os.path.exists("/data/images"):
-        raise HTTPException(
-            status_code=400,
-            detail="Directorio /data/images no encontrado. Sube las imágenes primero."
-        )
-
-    images = [f for f in os.listdir(
-        "/data/images") if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-    if not images:
-        raise HTTPException(
-            status_code=400,
-            detail="No se encontraron imágenes en /data/images"
-        )
-
-    pipeline_steps = []
+def execute_photogrammetry_pipeline(images, preset, quality, reuse_sparse, append,
+                                    scene_state, new_images, append_info, matching_info,
+                                    object_roi, min_registration_ratio, min_sparse_points,
+                                    min_track_length, dense_filter, dense_voxel_factor,
+                                    mesh_postprocess, mesh_face_budget, export_glb):
+    """
+    Ejecuta el pipeline de fotogrametría dentro del worker de trabajos.
+    Los parámetros ya vienen validados por el endpoint /photogrammetry
+    """
+    job = current_job()
+    pipeline_steps = job["steps"] if job else []
+    profile = new_profile(job["id"] if job else time.strftime("photogrammetry-%Y%m%d-%H%M%S"),
+                          "photogrammetry", describe_dataset("/data/images", images))
+    profile["quality"] = quality
+    profile["append"] = append
+
+    # Duración prevista de cada etapa según los perfiles de ejecuciones anteriores
+    runtime_model = get_runtime_model()
+    planned_stages = (["1-3"] if reuse_sparse else ["1", "2", "3"]) + ["4", "5", "6", "7"] + \
+        (["7b"] if dense_filter else []) + ["8"] + (["8b"] if mesh_postprocess else []) + ["9"] + \
+        (["9b"] if export_glb else []) + ["10"]
+
+    def stage_features(stage):
+        features = profile["dataset"]
+        if append and stage in APPEND_STAGES:
+            # En modo append solo se procesan las imágenes nuevas
+            features = dict(features, images=len(new_images))
+        return features
+
+    def timeout_for(stage):
+        return stage_timeout(runtime_model, stage, stage_features(stage), quality)
+
+    def begin_step(description):
+        pipeline_steps.append(description)
+        key = stage_key(description)
+        start_stage(profile, description, predicted_seconds=predict_stage_seconds(
+            runtime_model, key, stage_features(key), quality))
+        if job and key in planned_stages:
+            remaining = [predict_stage_seconds(runtime_model, stage, stage_features(stage), quality)
+                         for stage in planned_stages[planned_stages.index(key):]]
+            job["predicted_finish_at"] = time.time() + sum(remaining) \
+                if None not in remaining else None
     start_time = time.time()
 
     try:
         os.makedirs("/data/sparse", exist_ok=True)
         os.makedirs("/data/dense", exist_ok=True)
+        for path in [SPARSE_PREVIEW_PATH] + glob.glob(LOD_PATH_TEMPLATE.format(level="*")):
+            if os.path.exists(path):
+                os.remove(path)
+
+        if reuse_sparse:
+            # Otro preset sobre la misma escena: se reutiliza el SfM ya calculado
+            begin_step(
+                f"1-3. Reutilizando reconstrucción dispersa ({scene_state.get('quality', 'desconocida')})...")
+            restore_scene_state("/data/database.db", "/data/sparse/0")
+            feature_store_info, camera_groups = None, None
+        elif append:
+            step_start = time.time()
+            begin_step(
+                "1. Extrayendo características SIFT de las imágenes nuevas...")
+            restore_scene_state("/data/database.db", "/data/sparse/0")
+            feature_store_info, camera_groups = extract_features(
+                new_images, max_image_size=preset["max_image_size"], timeout=timeout_for("1"))
+            print(
+                f"Paso 1 completado en {time.time() - step_start:.2f} segundos")
+
+            step_start = time.time()
+            begin_step(
+                "2. Emparejando imágenes nuevas con la escena...")
+            matching_info = prepare_append_matching(
+                "/data/images", images, new_images)
+            cmd = build_matching_command(matching_info)
+            result = run_command(cmd, timeout=timeout_for("2"))
+            print(
+                f"Paso 2 completado en {time.time() - step_start:.2f} segundos")
+            if not result["success"]:
+                raise Exception(
+                    f"Error en emparejamiento: {result.get('stderr', result.get('error'))}")
+            pair_counts = count_database_pairs("/data/database.db")
+            if pair_counts:
+                matching_info.update(pair_counts)
+
+            step_start = time.time()
+            begin_step(
+                "3. Registrando imágenes nuevas en el modelo existente...")
+            cmd = [
+                "colmap", "image_registrator",
+                "--database_path", "/data/database.db",
+                "--input_path", "/data/sparse/0",
+                "--output_path", "/data/sparse/0"
+            ]
+            result = run_command(cmd, timeout=timeout_for("3"), progress_total=len(images))
+            if not result["success"]:
+                raise Exception(
+                    f"Error registrando imágenes nuevas: {result.get('stderr', result.get('error'))}")
+            cmd = [
+                "colmap", "bundle_adjuster",
+                "--input_path", "/data/sparse/0",
+                "--output_path", "/data/sparse/0"
+            ]
+            result = run_command(cmd, timeout=timeout_for("3"))
+            print(
+                f"Paso 3 completado en {time.time() - step_start:.2f} segundos")
+            if not result["success"]:
+                raise Exception(
+                    f"Error en bundle adjustment: {result.get('stderr', result.get('error'))}")
+        else:
+            step_start = time.time()
+            begin_step("1. Extrayendo características SIFT...")
+            if os.path.exists("/data/database.db"):
+                os.remove("/data/database.db")
+            feature_store_info, camera_groups = extract_features(
+                images, max_image_size=preset["max_image_size"], timeout=timeout_for("1"))
+            print(f"Paso 1 completado en {time.time() - step_start:.2f} segundos "
+                  f"({feature_store_info['cached_images']} imágenes desde caché)")
+
+            step_start = time.time()
+            begin_step(
+                f"2. Emparejando características ({matching_info['strategy']})...")
+            prepare_matching(matching_info, "/data/images", sorted(images))
+            print(f"Estrategia de emparejamiento: {matching_info['strategy']} - "
+                  f"{matching_info['reason']} (~{matching_info['estimated_pairs']} pares)")
+            cmd = build_matching_command(matching_info)
+            result = run_command(cmd, timeout=timeout_for("2"))
+            print(
+                f"Paso 2 completado en {time.time() - step_start:.2f} segundos")
+            if not result["success"]:
+                raise Exception(
+                    f"Error en emparejamiento: {result.get('stderr', result.get('error'))}")
+            pair_counts = count_database_pairs("/data/database.db")
+            if pair_counts:
+                matching_info.update(pair_counts)
+
+            step_start = time.time()
+            begin_step("3. Ejecutando reconstrucción SfM...")
+            shutil.rmtree("/data/sparse")
+            os.makedirs("/data/sparse")
+            cmd = [
+                "colmap", "mapper",
+                "--database_path", "/data/database.db",
+                "--image_path", "/data/images",
+                "--output_path", "/data/sparse"
+            ]
+            result = run_command(cmd, timeout=timeout_for("3"), progress_total=len(images))
+            print(
+                f"Paso 3 completado en {time.time() - step_start:.2f} segundos")
+            if not result["success"]:
+                raise Exception(
+                    f"Error en reconstrucción SfM: {result.get('stderr', result.get('error'))}")
 
         step_start = time.time()
-        pipeline_steps.append("1. Extrayendo características SIFT...")
-        cmd = [
-            "colmap", "feature_extractor",
-            "--database_path", "/data/database.db",
-            "--image_path", "/data/images",
-            "--SiftExtraction.use_gpu", "1"
-        ]
-        result = run_command(cmd, timeout=600)
-        print(f"Paso 1 completado en {time.time() - step_start:.2f} segundos")
-        if not result["success"]:
-            raise Exception(
-                f"Error en extracción de características: {result.get('stderr', result.get('error'))}")
-
-        step_start = time.time()
-        pipeline_steps.append("2. Emparejando características...")
-        cmd = [
-            "colmap", "exhaustive_matcher",
-            "--database_path", "/data/database.db",
-            "--SiftMatching.use_gpu", "1"
-        ]
-        result = run_command(cmd, timeout=600)
-        print(f"Paso 2 completado en {time.time() - step_start:.2f} segundos")
-        if not result["success"]:
-            raise Exception(
-                f"Error en emparejamiento: {result.get('stderr', result.get('error'))}")
-
-        step_start = time.time()
-        pipeline_steps.append("3. Ejecutando reconstrucción SfM...")
-        cmd = [
-            "colmap", "mapper",
-            "--database_path", "/data/database.db",
-            "--image_path", "/data/images",
-            "--output_path", "/data/sparse"
-        ]
-        result = run_command(cmd, timeout=1200)
-        print(f"Paso 3 completado en {time.time() - step_start:.2f} segundos")
-        if not result["success"]:
-            raise Exception(
-                f"Error en reconstrucción SfM: {result.get('stderr', result.get('error'))}")
+        begin_step("4. Verificando calidad de la reconstrucción dispersa...")
+        quality_gate = evaluate_sparse_quality(
+            "/data/sparse", len(images),
+            min_registration_ratio=min_registration_ratio,
+            min_points=min_sparse_points,
+            min_track_length=min_track_length)
+
+        # Previsualización de la nube dispersa, disponible aunque la verificación falle
+        sparse_preview = None
+        if quality_gate["best_model"] is not None:
+            try:
+                sparse_preview = export_sparse_preview(
+                    quality_gate["best_model_path"])
+            except Exception as e:
+                print(f"Error generando previsualización dispersa: {e}")
+            if sparse_preview:
+                sparse_preview["url"] = "/preview/sparse"
+                quality_gate["sparse_preview"] = sparse_preview
+        print(f"Paso 4 completado en {time.time() - step_start:.2f} segundos")
+        if not quality_gate["passed"]:
+            raise SparseQualityError(
+                "Reconstrucción dispersa insuficiente: " +
+                "; ".join(quality_gate["failures"]),
+                quality_gate)
+        sparse_model_path = quality_gate["best_model_path"]
+        sparse_stats = quality_gate["models"][0]
+        profile["dataset"]["sparse_points"] = sparse_stats["points3D"]
+        print(f"Modelo disperso {quality_gate['best_model']}: {sparse_stats['registered_images']} imágenes registradas, "
+              f"{sparse_stats['points3D']} puntos, track medio {sparse_stats['mean_track_length']}")
+
+        # Región de interés del objeto: por defecto solo si las imágenes están segmentadas
+        image_segmented = bool(load_image_source().get("segmented"))
+        roi_info = None
+        if object_roi if object_roi is not None else image_segmented:
+            step_start = time.time()
+            begin_step(
+                "4b. Calculando región de interés del objeto...")
+            roi_info = compute_object_roi(
+                sparse_model_path, "/data/images", use_masks=image_segmented)
+            if roi_info:
+                write_openmvs_roi(roi_info, "/data/scene_roi.txt")
+            print(
+                f"Paso 4b completado en {time.time() - step_start:.2f} segundos")
 
         step_start = time.time()
-        pipeline_steps.append("4. Creando imágenes sin distorsión...")
+        begin_step("5. Creando imágenes sin distorsión...")
         cmd = [
             "colmap", "image_undistorter",
             "--image_path", "/data/images",
-            "--input_path", "/data/sparse/0",
+            "--input_path", sparse_model_path,
             "--output_path", "/data/dense",
             "--output_type", "COLMAP"
         ]
-        result = run_command(cmd, timeout=600)
-        print(f"Paso 4 completado en {time.time() - step_start:.2f} segundos")
-        if not result["success"]:
-            raise Exception(
-                f"Error en undistorter: {result.get('stderr', result.get('error'))}")
-
-        step_start = time.time()
-        pipeline_steps.append("5. Convirtiendo modelo a texto...")
-        cmd = [
-            "colmap", "model_converter",
-            "--input_path", "/data/dense/sparse",
-            "--output_path", "/data/dense/sparse",
-            "--output_type", "TXT"
-        ]
-        result = run_command(cmd, timeout=300)
+        if preset["max_image_size"]:
+            cmd += ["--max_image_size", str(preset["max_image_size"])]
+        result = run_command(cmd, timeout=timeout_for("5"))
         print(f"Paso 5 completado en {time.time() - step_start:.2f} segundos")
         if not result["success"]:
             raise Exception(
-                f"Error en conversión: {result.get('stderr', result.get('error'))}")
+                f"Error en undistorter: {result.get('stderr', result.get('error'))}")
 
         step_start = time.time()
-        pipeline_steps.append("6. Convirtiendo COLMAP a MVS...")
+        begin_step("6. Convirtiendo COLMAP a MVS...")
         cmd = [
             "/usr/local/bin/OpenMVS/InterfaceCOLMAP",
             "-i", "/data/dense",
             "-o", "/data/scene.mvs",
             "--image-folder", "/data/dense/images"
         ]
-        result = run_command(cmd, timeout=300)
+        result = run_command(cmd, timeout=timeout_for("6"))
+        if not result["success"] and not os.path.exists("/data/dense/sparse/cameras.txt"):
+            # Versiones de OpenMVS que solo leen el modelo en texto: convertir y reintentar
+            begin_step(
+                "6b. Convirtiendo modelo a texto para InterfaceCOLMAP...")
+            convert_cmd = [
+                "colmap", "model_converter",
+                "--input_path", "/data/dense/sparse",
+                "--output_path", "/data/dense/sparse",
+                "--output_type", "TXT"
+            ]
+            convert_result = run_command(convert_cmd, timeout=timeout_for("6"))
+            if not convert_result["success"]:
+                raise Exception(
+                    f"Error en conversión: {convert_result.get('stderr', convert_result.get('error'))}")
+            result = run_command(cmd, timeout=timeout_for("6"))
         print(f"Paso 6 completado en {time.time() - step_start:.2f} segundos")
         if not result["success"]:
             raise Exception(
                 f"Error en InterfaceCOLMAP: {result.get('stderr', result.get('error'))}")
 
         step_start = time.time()
-        pipeline_steps.append("7. Densificando nube de puntos...")
+        densify_input = "/data/scene.mvs"
+        if roi_info:
+            # Con --import-roi-file DensifyPointCloud solo guarda la escena con
+            # la ROI y termina: la densificación se hace en una segunda llamada
+            begin_step("7a. Importando región de interés en la escena...")
+            cmd = [
+                "/usr/local/bin/OpenMVS/DensifyPointCloud",
+                "-i", "/data/scene.mvs",
+                "-o", "/data/scene_roi.mvs",
+                "--import-roi-file", "/data/scene_roi.txt"
+            ]
+            result = run_command(cmd, timeout=timeout_for("7"))
+            if not result["success"] or not os.path.exists("/data/scene_roi.mvs"):
+                raise Exception(
+                    f"Error importando la región de interés: {result.get('stderr', result.get('error'))}")
+            densify_input = "/data/scene_roi.mvs"
+
+        begin_step("7. Densificando nube de puntos...")
         cmd = [
             "/usr/local/bin/OpenMVS/DensifyPointCloud",
-            "-i", "/data/scene.mvs",
+            "-i", densify_input,
             "-o", "/data/scene_dense.mvs",
-            "--resolution-level", "2",
+            "--resolution-level", str(preset["densify_resolution_level"]),
+            "--max-threads", MAX_THREADS,
         ]
-        result = run_command(cmd, timeout=1800)
+        if roi_info:
+            cmd += ["--crop-to-roi", "1"]
+        result = run_command(cmd, timeout=timeout_for("7"))
         print(f"Paso 7 completado en {time.time() - step_start:.2f} segundos")
         if not result["success"]:
             raise Exception(
                 f"Error en densificación: {result.get('stderr', result.get('error'))}")
+        if os.path.exists("/data/scene_dense.ply"):
+            profile["dataset"]["dense_points"] = ply_element_count(
+                "/data/scene_dense.ply", "vertex")
+
+        # Limpieza de la nube densa: elimina puntos flotantes antes del mallado
+        dense_filter_info = None
+        if dense_filter and os.path.exists("/data/scene_dense.ply"):
+            step_start = time.time()
+            begin_step("7b. Filtrando nube de puntos densa...")
+            try:
+                dense_filter_info = filter_dense_point_cloud(
+                    "/data/scene_dense.ply", "/data/scene_dense_filtered.ply",
+                    voxel_factor=dense_voxel_factor)
+            except ValueError as e:
+                print(f"No se pudo filtrar la nube densa: {e}")
+            if dense_filter_info:
+                print(f"Nube densa: {dense_filter_info['points_before']} -> "
+                      f"{dense_filter_info['points_after']} puntos")
+            print(
+                f"Paso 7b completado en {time.time() - step_start:.2f} segundos")
 
         step_start = time.time()
-        pipeline_steps.append("8. Reconstruyendo malla...")
+        begin_step("8. Reconstruyendo malla...")
         cmd = [
             "/usr/local/bin/OpenMVS/ReconstructMesh",
             "-i", "/data/scene_dense.mvs",
             "-o", "/data/scene_mesh.mvs",
-            "--max-threads", "24",
-            "--decimate", "0.4",
-            "--target-face-num", "100000",
+            "--max-threads", MAX_THREADS,
+            "--decimate", str(preset["mesh_decimate"]),
+            "--target-face-num", str(mesh_face_budget),
         ]
-        result = run_command(cmd, timeout=100)
+        if dense_filter_info:
+            cmd += ["--pointcloud-file", "/data/scene_dense_filtered.ply"]
+        result = run_command(cmd, timeout=timeout_for("8"))
         print(f"Paso 8 completado en {time.time() - step_start:.2f} segundos")
         if not result["success"]:
             raise Exception(
                 f"Error en reconstrucción de malla: {result.get('stderr', result.get('error'))}")
 
+        # Limpieza de la malla: islas pequeñas y presupuesto de caras antes de texturizar
+        mesh_processing_info = None
+        mesh_path = "/data/scene_mesh.ply"
+        if mesh_postprocess and os.path.exists(mesh_path):
+            step_start = time.time()
+            begin_step("8b. Limpiando y simplificando malla...")
+            try:
+                mesh_processing_info = process_mesh(
+                    mesh_path, "/data/scene_mesh_clean.ply", face_budget=mesh_face_budget)
+            except ValueError as e:
+                print(f"No se pudo procesar la malla: {e}")
+            if mesh_processing_info:
+                mesh_path = "/data/scene_mesh_clean.ply"
+                profile["dataset"]["mesh_faces"] = mesh_processing_info["faces_after"]
+                print(f"Malla: {mesh_processing_info['faces_before']} -> "
+                      f"{mesh_processing_info['faces_after']} caras")
+            print(
+                f"Paso 8b completado en {time.time() - step_start:.2f} segundos")
+
+        if "mesh_faces" not in profile["dataset"] and os.path.exists(mesh_path):
+            profile["dataset"]["mesh_faces"] = ply_element_count(mesh_path, "face")
+
         step_start = time.time()
-        pipeline_steps.append("9. Texturizando malla...")
+        begin_step("9. Texturizando malla...")
         cmd = [
             "/usr/local/bin/OpenMVS/TextureMesh",
             "/data/scene_dense.mvs",
-            "-m", "/data/scene_mesh.ply",
+            "-m", mesh_path,
             "-o", "/data/scene_textured.mvs",
             "--export-type", "obj",
-            "--resolution-level", "1",
-            "--max-threads", "24",
+            "--resolution-level", str(preset["texture_resolution_level"]),
+            "--max-threads", MAX_THREADS,
         ]
-        result = run_command(cmd, timeout=60)
+        result = run_command(cmd, timeout=timeout_for("9"))
+        if mesh_processing_info:
+            mesh_processing_info["texture_time_seconds"] = round(
+                time.time() - step_start, 2)
         print(f"Paso 9 completado en {time.time() - step_start:.2f} segundos")
         if not result["success"]:
             raise Exception(
                 f"Error en texturización: {result.get('stderr', result.get('error'))}")
 
+        # Malla binaria con niveles de detalle para el visor web
+        glb_export_info = None
+        if export_glb and os.path.exists("/data/scene_textured.obj"):
+            step_start = time.time()
+            begin_step("9b. Exportando GLB con niveles de detalle...")
+            try:
+                glb_export_info = export_glb_lods("/data/scene_textured.obj")
+            except ValueError as e:
+                print(f"No se pudo exportar el GLB: {e}")
+            print(
+                f"Paso 9b completado en {time.time() - step_start:.2f} segundos")
+
         files_to_compress = []
         required_files = ["scene_textured.obj", "scene_textured.mtl"]
         for file in required_files:
@@ -397,44 +811,61 @@ async def run_photogrammetry_pipeline():
         texture_files = [f for f in os.listdir(
             "/data") if f.lower().endswith(('.jpg', '.jpeg', '.png')) and 'texture' in f.lower()]
         files_to_compress.extend(texture_files)
+        if glb_export_info:
+            files_to_compress.append(glb_export_info["lods"][0]["filename"])
 
-        zip_filename = "/data/photogrammetry_result.zip"
         if files_to_compress:
-            with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for file in files_to_compress:
-                    file_path = f"/data/{file}"
-                    if os.path.exists(file_path):
-                        zipf.write(file_path, file)
-            zip_size = os.path.getsize(zip_filename)
+            # Texturas sin recomprimir; solo OBJ/MTL con deflate
+            zip_size = write_result_zip(
+                "/data", files_to_compress, "/data/photogrammetry_result.zip")
         else:
             zip_size = 0
 
-        mesh_stats = extract_mesh_statistics("/data/scene_textured.obj")
+        try:
+            mesh_stats = mesh_statistics("/data/scene_textured.obj")
+        except (OSError, ValueError) as e:
+            print(f"Error leyendo estadísticas del mesh: {e}")
+            mesh_stats = None
         texture_info = get_texture_files_info("/data")
 
-        pipeline_steps.append("10. Limpiando archivos temporales...")
-        files_to_keep = ["images", "photogrammetry_result.zip"]
-        for item in os.listdir("/data"):
-            item_path = f"/data/{item}"
-            if item not in files_to_keep:
-                try:
-                    if os.path.isfile(item_path):
-                        os.remove(item_path)
-                    elif os.path.isdir(item_path):
-                        shutil.rmtree(item_path)
-                except Exception as e:
-                    print(f"Error eliminando {item}: {e}")
+        begin_step("10. Limpiando archivos temporales...")
+        save_scene_state("/data/database.db", sparse_model_path, images,
+                         quality=quality)
+        clean_data_folder(WORKSPACE_FILES +
+                          ["sparse_preview.glb", "photogrammetry_result.zip"] +
+                          [lod["filename"] for lod in (glb_export_info or {}).get("lods", [])])
 
+        profile_info = finish_profile(profile)
         total_time = time.time() - start_time
-        print(f"Pipeline completo en {total_time:.2f} segundos")
+        print(f"Pipeline completo en {total_time:.2f} segundos "
+              f"(etapa más lenta: {profile_info['bottleneck_stage']})")
 
         return {
             "success": True,
+            "job_id": job["id"] if job else None,
             "message": "Pipeline de fotogrametría completado exitosamente",
             "download_ready": True,
             "download_url": "/download/photogrammetry_result.zip",
             "steps_completed": pipeline_steps,
             "images_processed": len(images),
+            "quality": {
+                "preset": preset,
+                "reused_sparse": reuse_sparse,
+                "next_preset": next_quality_preset(quality),
+                "upgrade_url": f"/photogrammetry?quality={next_quality_preset(quality)}&reuse_sparse=true"
+                if next_quality_preset(quality) else None
+            },
+            "append": append_info,
+            "feature_store": feature_store_info,
+            "camera_groups": camera_groups,
+            "sparse_reconstruction": sparse_stats,
+            "quality_gate": quality_gate,
+            "sparse_preview": sparse_preview,
+            "object_roi": roi_info,
+            "dense_filter": dense_filter_info,
+            "mesh_processing": mesh_processing_info,
+            "glb_export": glb_export_info,
+            "matching": matching_info,
             "zip_file": {
                 "filename": "photogrammetry_result.zip",
                 "size_bytes": zip_size,
@@ -443,9 +874,35 @@ async def run_photogrammetry_pipeline():
             "mesh_statistics": mesh_stats,  # NUEVO
             "texture_info": texture_info,   # NUEVO
             "files_cleaned": True,
+            "profile": profile_info,
             "execution_time_seconds": round(total_time, 2)
         }
 
+    except JobCancelled as e:
+        clean_data_folder(WORKSPACE_FILES)
+        return JSONResponse(
+            status_code=409,
+            content={
+                "success": False,
+                "cancelled": True,
+                "error": str(e),
+                "steps_completed": pipeline_steps,
+                "profile": finish_profile(profile),
+                "message": "Pipeline cancelado. Se eliminaron los resultados parciales."
+            }
+        )
+    except SparseQualityError as e:
+        return JSONResponse(
+            status_code=422,
+            content={
+                "success": False,
+                "error": str(e),
+                "steps_completed": pipeline_steps,
+                "profile": finish_profile(profile),
+                "message": "La reconstrucción dispersa no es suficiente. Agrega más imágenes con mayor solapamiento o ajusta los umbrales.",
+                "quality_gate": e.diagnostics
+            }
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -453,6 +910,7 @@ async def run_photogrammetry_pipeline():
                 "success": False,
                 "error": str(e),
                 "steps_completed": pipeline_steps,
+                "profile": finish_profile(profile),
                 "message": "Pipeline falló durante la ejecución",
                 "error_details": {
                     "message": str(e),
@@ -462,14 +920,152 @@ async def run_photogrammetry_pipeline():
         )
 
 
+
+@app.post("/photogrammetry")
+async def run_photogrammetry_pipeline(quality: str = "standard", reuse_sparse: bool = False,
+                                      matching_strategy: str = "auto", append: bool = False,
+                                      object_roi: Optional[bool] = None,
+                                      min_registration_ratio: float = MIN_REGISTRATION_RATIO,
+                                      min_sparse_points: int = MIN_SPARSE_POINTS,
+                                      min_track_length: float = MIN_MEAN_TRACK_LENGTH,
+                                      dense_filter: bool = True,
+                                      dense_voxel_factor: float = 0.0,
+                                      mesh_postprocess: bool = True,
+                                      mesh_face_budget: Optional[int] = None,
+                                      export_glb: bool = True,
+                                      wait: bool = True):
+    if not os.path.exists("/data/images"):
+        raise HTTPException(
+            status_code=400,
+            detail="Directorio /data/images no encontrado. Sube las imágenes primero."
+        )
+
+    images = [f for f in os.listdir(
+        "/data/images") if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+    if not images:
+        raise HTTPException(
+            status_code=400,
+            detail="No se encontraron imágenes en /data/images"
+        )
+
+    try:
+        preset = get_quality_preset(quality)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if mesh_face_budget is None:
+        mesh_face_budget = preset["mesh_face_budget"]
+    if matching_strategy == "auto" and preset["matching_strategy"]:
+        matching_strategy = preset["matching_strategy"]
+
+    append_info = None
+    scene_state = None
+    new_images = None
+    if reuse_sparse:
+        if append:
+            raise HTTPException(
+                status_code=400,
+                detail="reuse_sparse y append no se pueden combinar"
+            )
+        scene_state = load_scene_state()
+        if scene_state is None or set(scene_state["images"]) != set(images):
+            raise HTTPException(
+                status_code=400,
+                detail="No hay una reconstrucción dispersa de estas imágenes para reutilizar. Ejecuta el pipeline completo primero."
+            )
+        matching_info = None
+    elif append:
+        scene_state = load_scene_state()
+        if scene_state is None:
+            raise HTTPException(
+                status_code=400,
+                detail="No hay una escena reconstruida a la que añadir imágenes. Ejecuta el pipeline completo primero."
+            )
+        scene_images = set(scene_state["images"])
+        missing_scene_images = sorted(scene_images - set(images))
+        if missing_scene_images:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Faltan {len(missing_scene_images)} imágenes de la escena original. Ejecuta el pipeline completo."
+            )
+        new_images = sorted(set(images) - scene_images)
+        if not new_images:
+            raise HTTPException(
+                status_code=400,
+                detail="No hay imágenes nuevas para añadir a la escena"
+            )
+        append_info = {
+            "scene_images": len(scene_images),
+            "new_images": len(new_images)
+        }
+        # La estrategia de emparejado de las imágenes nuevas se elige en el pipeline
+        # (prepare_append_matching)
+        matching_info = None
+    else:
+        try:
+            matching_info = choose_matching_strategy(
+                "/data/images", sorted(images),
+                image_source=load_image_source()["source"],
+                requested=matching_strategy)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    job = create_job("photogrammetry")
+    future = submit_job(
+        job, execute_photogrammetry_pipeline,
+        images=images, preset=preset, quality=quality, reuse_sparse=reuse_sparse,
+        append=append, scene_state=scene_state, new_images=new_images,
+        append_info=append_info, matching_info=matching_info, object_roi=object_roi,
+        min_registration_ratio=min_registration_ratio, min_sparse_points=min_sparse_points,
+        min_track_length=min_track_length, dense_filter=dense_filter,
+        dense_voxel_factor=dense_voxel_factor, mesh_postprocess=mesh_postprocess,
+        mesh_face_budget=mesh_face_budget, export_glb=export_glb)
+
+    if not wait:
+        return JSONResponse(
+            status_code=202,
+            content={
+                "success": True,
+                "job_id": job["id"],
+                "status_url": f"/jobs/{job['id']}",
+                "cancel_url": f"/jobs/{job['id']}/cancel"
+            }
+        )
+
+    try:
+        return await asyncio.wrap_future(future)
+    except JobCancelled as e:
+        return JSONResponse(
+            status_code=409,
+            content={"success": False, "cancelled": True, "error": str(e)}
+        )
+
+
+async def cancel_running_jobs():
+    """
+    Cancela el pipeline en curso antes de reemplazar las imágenes del espacio de trabajo
+    """
+    cancelled = await asyncio.get_running_loop().run_in_executor(None, cancel_active_jobs)
+    if cancelled:
+        print(f"{cancelled} trabajos cancelados por una nueva subida")
+
+
 @app.post("/extractframes")
-async def extract_frames_from_video(video: UploadFile = File(...), num_frames: int = 60, segment_objects: bool = False):
+async def extract_frames_from_video(video: UploadFile = File(...), num_frames: int = 60, segment_objects: bool = False, focal_length_35mm: float = 0,
+                                    quality: str = "standard", auto_resolution: bool = True):
+    try:
+        preset = get_quality_preset(quality)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await cancel_running_jobs()
     os.makedirs("/data", exist_ok=True)
 
     video_path = f"/data/{video.filename}"
+    upload_start = time.perf_counter()
     with open(video_path, "wb") as buffer:
         content = await video.read()
         buffer.write(content)
+    record_upload("extractframes", len(content), time.perf_counter() - upload_start)
 
     if os.path.exists("/data/images"):
         shutil.rmtree("/data/images")
@@ -477,10 +1073,16 @@ async def extract_frames_from_video(video: UploadFile = File(...), num_frames: i
         shutil.rmtree("/data/images_segmented")
     if os.path.exists("/data/images_masks"):
         shutil.rmtree("/data/images_masks")
+    clear_scene_state()
 
+    profile = new_profile(time.strftime("extractframes-%Y%m%d-%H%M%S"), "extractframes")
     try:
+        start_stage(profile, "Extracción de frames")
+        original_size = video_frame_size(video_path)
+        # Los frames se guardan ya reducidos según el presupuesto de píxeles del preset
         extracted_frames = extract_frames_smart(
-            video_path, "/data/frames_temp", target_frames=num_frames, debug=False)
+            video_path, "/data/frames_temp", target_frames=num_frames, debug=False,
+            quality_preset=preset if auto_resolution else None)
 
         if not extracted_frames:
             raise HTTPException(
@@ -491,6 +1093,7 @@ async def extract_frames_from_video(video: UploadFile = File(...), num_frames: i
         os.remove(video_path)
 
         if segment_objects:
+            start_stage(profile, "Segmentación")
             try:
                 from utils.segmentImages import segment_images_for_photogrammetry
                 segmented_paths, mask_paths = segment_images_for_photogrammetry(
@@ -537,8 +1140,22 @@ async def extract_frames_from_video(video: UploadFile = File(...), num_frames: i
                 "reason": "Segmentación deshabilitada por parámetro"
             }
 
-        images = [f for f in os.listdir(
-            "/data/images") if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+        images = list(directory_index("/data/images", ('.jpg', '.jpeg', '.png')))
+        schedule_thumbnails("/data/images", images)
+
+        save_image_source("video", frames=len(images),
+                          focal_length_35mm=focal_length_35mm or None,
+                          segmented=segmentation_info["segmented"])
+        policy = resolution_policy(preset, len(extracted_frames)) if auto_resolution else None
+        index = directory_index("/data/images")
+        working_images = {name: {
+            "original_width": original_size[0] if original_size else None,
+            "original_height": original_size[1] if original_size else None,
+            "scale": working_scale(*(original_size or (None, None)),
+                                   index[name]["width"], index[name]["height"])
+        } for name in images if name in index}
+        record_working_resolution(policy)
+        profile["dataset"] = describe_dataset("/data/images", images)
 
         return {
             "success": True,
@@ -546,7 +1163,9 @@ async def extract_frames_from_video(video: UploadFile = File(...), num_frames: i
             "frames_extracted": len(extracted_frames),
             "segmentation_info": segmentation_info,
             "images_processed": len(images),
-            "output_folder": "/data/images"
+            "working_resolution": summarize_working_resolution(policy, working_images),
+            "output_folder": "/data/images",
+            "profile": finish_profile(profile)
         }
 
     except Exception as e:
@@ -558,81 +1177,288 @@ async def extract_frames_from_video(video: UploadFile = File(...), num_frames: i
         )
 
 
+DOWNLOAD_MEDIA_TYPES = {".zip": "application/zip", ".glb": "model/gltf-binary"}
+
+
 @app.get("/download/{filename}")
-async def download_file(filename: str):
+async def download_file(filename: str, request: Request):
+    """
+    Descarga con ETag y peticiones Range (un intervalo) para poder reanudar
+    """
     file_path = f"/data/{filename}"
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
 
+    size = os.path.getsize(file_path)
+    etag = file_etag(file_path)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{filename}"'
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    # If-Range: si el archivo cambió desde la descarga parcial se envía completo
+    byte_range = None
+    if request.headers.get("if-range", etag) == etag:
+        byte_range = parse_range(request.headers.get("range"), size)
+
+    if byte_range == "unsatisfiable":
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    media_type = DOWNLOAD_MEDIA_TYPES.get(
+        os.path.splitext(filename)[1].lower(), "application/octet-stream")
+    return StreamingResponse(iter_file_range(file_path, start, end), status_code=status_code,
+                             media_type=media_type, headers=headers)
+
+
+@app.get("/jobs")
+async def get_jobs():
+    return {
+        "success": True,
+        "jobs": [job_summary(job) for job in list_jobs()]
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+
+    summary = job_summary(job)
+    result = job["result"]
+    if isinstance(result, JSONResponse):
+        result = json.loads(result.body)
+    summary["result"] = result
+    return summary
+
+
+# Intervalo con el que el stream SSE revisa los eventos del trabajo
+EVENT_POLL_SECONDS = 0.5
+
+
+def format_sse(event_name, data):
+    return f"event: {event_name}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Stream SSE con el progreso del trabajo: eventos "stage" al cambiar de
+    etapa, "progress" con el progreso de COLMAP/OpenMVS y "done" al terminar
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+
+    async def event_stream():
+        last_seq = 0
+        last_stage = None
+        while True:
+            stage = job["steps"][-1] if job["steps"] else None
+            if stage != last_stage:
+                last_stage = stage
+                yield format_sse("stage", {
+                    "stage": stage,
+                    "overall_percent": overall_progress(stage),
+                    "eta_seconds": job_summary(job)["eta_seconds"]
+                })
+
+            for event in events_since(job, last_seq):
+                last_seq = event["seq"]
+                event = dict(event, overall_percent=overall_progress(
+                    event["stage"], event.get("percent")))
+                yield format_sse("progress", event)
+
+            if job["status"] not in ACTIVE_STATUSES:
+                yield format_sse("done", job_summary(job))
+                break
+            await asyncio.sleep(EVENT_POLL_SECONDS)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job_endpoint(job_id: str):
+    job = cancel_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+
+    return job_summary(job)
+
+
+@app.get("/profiles")
+async def get_profiles(kind: Optional[str] = None):
+    """
+    Perfiles de recursos agregados por clase de dataset y etapa
+    """
+    return {
+        "success": True,
+        "classes": aggregate_profiles(kind)
+    }
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Métricas en formato de texto de Prometheus
+    """
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/preview/sparse")
+async def get_sparse_preview():
+    if not os.path.exists(SPARSE_PREVIEW_PATH):
+        raise HTTPException(
+            status_code=404, detail="Previsualización dispersa no disponible")
+
     return FileResponse(
-        path=file_path,
-        filename=filename,
-        media_type="application/zip"
+        path=SPARSE_PREVIEW_PATH,
+        filename="sparse_preview.glb",
+        media_type="model/gltf-binary"
     )
 
 
 @app.post("/uploadphotos")
-async def upload_photos_from_zip(photos_zip: UploadFile = File(...), segment_objects: bool = False, reduction_percentage: int = 0):
+async def upload_photos_from_zip(photos_zip: UploadFile = File(...), segment_objects: bool = False, reduction_percentage: int = 0, append: bool = False,
+                                 quality: str = "standard", auto_resolution: bool = True,
+                                 prune: bool = True,
+                                 near_duplicate_distance: int = NEAR_DUPLICATE_DISTANCE,
+                                 blur_ratio: float = BLUR_OUTLIER_RATIO):
     if not photos_zip.filename.lower().endswith('.zip'):
         raise HTTPException(
             status_code=400,
             detail="El archivo debe ser un ZIP"
         )
+    if not 0 <= blur_ratio < 1:
+        raise HTTPException(
+            status_code=400,
+            detail="blur_ratio debe estar entre 0 y 1"
+        )
+    try:
+        preset = get_quality_preset(quality)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if append and (load_scene_state() is None or not os.path.exists("/data/images")):
+        raise HTTPException(
+            status_code=400,
+            detail="No hay una escena reconstruida a la que añadir fotos"
+        )
 
+    await cancel_running_jobs()
     os.makedirs("/data", exist_ok=True)
 
-    if os.path.exists("/data/images"):
-        shutil.rmtree("/data/images")
+    # En modo append las fotos nuevas se preparan aparte y luego se añaden a /data/images
+    images_folder = "/data/images_append" if append else "/data/images"
+    first_index = next_image_index("/data/images") if append else 1
+
+    if os.path.exists(images_folder):
+        shutil.rmtree(images_folder)
+    if not append:
+        clear_scene_state()
     if os.path.exists("/data/images_segmented"):
         shutil.rmtree("/data/images_segmented")
     if os.path.exists("/data/images_masks"):
         shutil.rmtree("/data/images_masks")
 
     zip_path = f"/data/{photos_zip.filename}"
+    upload_start = time.perf_counter()
     with open(zip_path, "wb") as buffer:
-        content = await photos_zip.read()
-        buffer.write(content)
+        shutil.copyfileobj(photos_zip.file, buffer, 1024 * 1024)
+        upload_size = buffer.tell()
+    record_upload("uploadphotos", upload_size, time.perf_counter() - upload_start)
 
+    profile = new_profile(time.strftime("uploadphotos-%Y%m%d-%H%M%S"), "uploadphotos")
     try:
-        temp_extract_folder = "/data/photos_temp"
-        os.makedirs(temp_extract_folder, exist_ok=True)
-
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_extract_folder)
-
+        start_stage(profile, "Extracción del ZIP")
         valid_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif')
-        extracted_images = []
-
-        for root, dirs, files in os.walk(temp_extract_folder):
-            for file in files:
-                if file.lower().endswith(valid_extensions):
-                    extracted_images.append(os.path.join(root, file))
+        members = list_zip_images(zip_path, valid_extensions)
 
-        if not extracted_images:
+        if not members:
             raise HTTPException(
                 status_code=400,
                 detail="No se encontraron imágenes válidas en el ZIP"
             )
 
-        os.makedirs("/data/images", exist_ok=True)
-
-        copied_images = []
-        for i, img_path in enumerate(extracted_images):
-            _, ext = os.path.splitext(img_path)
-            new_name = f"image_{i+1:04d}{ext}"
-            dest_path = f"/data/images/{new_name}"
-            shutil.copy2(img_path, dest_path)
-            copied_images.append(new_name)
+        os.makedirs(images_folder, exist_ok=True)
 
+        # Resolución de trabajo: la reducción manual tiene prioridad; si no, el
+        # presupuesto de píxeles del preset repartido entre todas las imágenes.
+        # Al añadir fotos se mantienen los píxeles por imagen de la escena
+        if reduction_percentage > 0:
+            policy = {"reduction_percentage": reduction_percentage}
+        elif auto_resolution:
+            recorded = (load_image_source().get("working_resolution") or {}).get("policy") \
+                if append else None
+            existing = len(directory_index("/data/images")) if append else 0
+            policy = resolution_policy(preset, existing + len(members),
+                                       (recorded or {}).get("max_pixels"))
+        else:
+            policy = None
+
+        # Cada imagen se escribe una sola vez con su nombre final: los miembros
+        # se leen del ZIP y se giran/reducen en un pool de procesos
+        new_names = [f"image_{first_index + i:04d}{os.path.splitext(member)[1]}"
+                     for i, member in enumerate(members)]
+        ingest_results = await asyncio.get_running_loop().run_in_executor(
+            None, ingest_zip_images, zip_path, members,
+            [os.path.join(images_folder, name) for name in new_names], reduction_percentage,
+            policy)
+
+        copied_images = [name for name, result in zip(new_names, ingest_results)
+                         if "error" not in result]
+        failed_images = [{"filename": os.path.basename(result["member"]), "error": result["error"]}
+                         for result in ingest_results if "error" in result]
         os.remove(zip_path)
-        shutil.rmtree(temp_extract_folder)
 
-        if reduction_percentage > 0:
-            for img_file in copied_images:
-                img_path = os.path.join("/data/images", img_file)
-                reduce_image_resolution(img_path, reduction_percentage)
+        if not copied_images:
+            raise HTTPException(
+                status_code=400,
+                detail="No se pudo leer ninguna imagen del ZIP"
+            )
+
+        working_images = {name: {
+            "original_width": result["original_width"],
+            "original_height": result["original_height"],
+            "scale": working_scale(result["original_width"], result["original_height"],
+                                   result["width"], result["height"])
+        } for name, result in zip(new_names, ingest_results) if "error" not in result}
+        ingest_info = {
+            "images": len(copied_images),
+            "rotated": sum(1 for result in ingest_results if result.get("rotated")),
+            "resized": sum(1 for result in ingest_results if result.get("resized")),
+            "failed": failed_images
+        }
+
+        # Poda antes de segmentar: los duplicados exactos se eliminan y los casi
+        # duplicados y las borrosas quedan como sugerencias para el selector de fotos
+        pruning_report = None
+        if prune:
+            start_stage(profile, "Poda de fotos")
+            # Al añadir fotos se comparan también con las que ya están en la escena
+            pruning_report, pruning_analysis = await asyncio.get_running_loop().run_in_executor(
+                None, partial(prune_photos, images_folder, copied_images,
+                              near_duplicate_distance=near_duplicate_distance,
+                              blur_ratio=blur_ratio,
+                              reference_folder="/data/images" if append else None))
+            duplicates = {entry["filename"] for entry in pruning_report["exact_duplicates"]}
+            copied_images = [name for name in copied_images if name not in duplicates]
+            working_images = {name: info for name, info in working_images.items()
+                              if name not in duplicates}
 
         if segment_objects:
+            start_stage(profile, "Segmentación")
             try:
                 # from utils.segmentImages import segment_images_for_photogrammetry
                 # segmented_paths, mask_paths = segment_images_for_photogrammetry(
@@ -648,15 +1474,15 @@ async def upload_photos_from_zip(photos_zip: UploadFile = File(...), segment_obj
                 # )
                 from utils.segmentImages import segment_images_for_photogrammetry_improved
                 segmented_paths, mask_paths = segment_images_for_photogrammetry_improved(
-                    input_folder="/data/images",
+                    input_folder=images_folder,
                     output_folder_segmented="/data/images_segmented",
                     output_folder_mask="/data/images_masks",
                     model_path="/app/models/yolo11l-seg.pt",
                 )
 
                 if segmented_paths:
-                    shutil.rmtree("/data/images")
-                    os.rename("/data/images_segmented", "/data/images")
+                    shutil.rmtree(images_folder)
+                    os.rename("/data/images_segmented", images_folder)
                     if os.path.exists("/data/images_masks"):
                         shutil.rmtree("/data/images_masks")
 
@@ -683,8 +1509,31 @@ async def upload_photos_from_zip(photos_zip: UploadFile = File(...), segment_obj
                 "reason": "Segmentación deshabilitada por parámetro"
             }
 
-        final_images = [f for f in os.listdir("/data/images")
-                        if f.lower().endswith(valid_extensions)]
+        if append:
+            for img_file in os.listdir(images_folder):
+                shutil.move(os.path.join(images_folder, img_file),
+                            os.path.join("/data/images", img_file))
+            shutil.rmtree(images_folder)
+
+        final_images = list(directory_index("/data/images", valid_extensions))
+        schedule_thumbnails("/data/images", final_images)
+        if pruning_report:
+            # La segmentación guarda cada foto como <nombre>_seg.jpg
+            renamed = {}
+            if segmentation_info["segmented"]:
+                by_stem = {os.path.splitext(name)[0]: name for name in copied_images}
+                for name in final_images:
+                    stem = os.path.splitext(name)[0].removesuffix("_seg")
+                    if stem in by_stem:
+                        renamed[by_stem[stem]] = name
+            save_pruning_report(pruning_report, "/data/images", pruning_analysis, renamed,
+                                merge=append)
+
+        if not append:
+            save_image_source("photos", images=len(final_images),
+                              segmented=segmentation_info["segmented"])
+        record_working_resolution(policy)
+        profile["dataset"] = describe_dataset("/data/images", final_images)
 
         return {
             "success": True,
@@ -693,10 +1542,21 @@ async def upload_photos_from_zip(photos_zip: UploadFile = File(...), segment_obj
             "segmentation_info": segmentation_info,
             "images_processed": len(final_images),
             "reduction_percentage": reduction_percentage,
+            "ingest_info": ingest_info,
+            "working_resolution": summarize_working_resolution(policy, working_images),
+            "pruning": pruning_report,
+            "append": append,
             "output_folder": "/data/images",
-            "supported_formats": list(valid_extensions)
+            "supported_formats": list(valid_extensions),
+            "profile": finish_profile(profile)
         }
 
+    except HTTPException:
+        if os.path.exists(zip_path):
+            os.remove(zip_path)
+        if append and os.path.exists(images_folder):
+            shutil.rmtree(images_folder)
+        raise
     except zipfile.BadZipFile:
         if os.path.exists(zip_path):
             os.remove(zip_path)
@@ -707,8 +1567,8 @@ async def upload_photos_from_zip(photos_zip: UploadFile = File(...), segment_obj
     except Exception as e:
         if os.path.exists(zip_path):
             os.remove(zip_path)
-        if os.path.exists("/data/photos_temp"):
-            shutil.rmtree("/data/photos_temp")
+        if append and os.path.exists(images_folder):
+            shutil.rmtree(images_folder)
         raise HTTPException(
             status_code=500,
             detail=f"Error procesando el ZIP: {str(e)}"
@@ -2,9 +2,13 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/com
 import { Button } from '@/components/ui/button'
 import { Eye, X, CheckCircle, Trash2 } from 'lucide-react'
 import Image from 'next/image'
-import { useState, useEffect } from 'react'
 import { Photo } from '@/types/photogrammetry'
 
+const PRUNE_REASON_LABELS: Record<string, string> = {
+    near_duplicate: 'Casi duplicada',
+    blurry: 'Borrosa'
+}
+
 interface PhotoSelectorProps {
     photos: Photo[]
     selectedPhotos: Set<string>
@@ -24,13 +28,6 @@ export function PhotoSelector({
     onConfirm,
     onClose
 }: PhotoSelectorProps) {
-    const [imageTimestamp, setImageTimestamp] = useState(Date.now())
-
-    // Solo actualizar timestamp cuando cambia el array de fotos
-    useEffect(() => {
-        setImageTimestamp(Date.now())
-    }, [photos.length])
-
     return (
         <Card className="mb-6">
             <CardHeader>
@@ -42,6 +39,7 @@ export function PhotoSelector({
                         </CardTitle>
                         <CardDescription>
                             Marca las fotos que deseas usar para la fotogrametría. {selectedPhotos.size} de {photos.length} seleccionadas.
+                            {photos.some(photo => photo.suggested_deselect) && ' Las fotos casi duplicadas o borrosas aparecen deseleccionadas.'}
                         </CardDescription>
                     </div>
                     <Button variant="outline" size="sm" onClick={onClose}>
@@ -62,7 +60,7 @@ export function PhotoSelector({
                         >
                             <div className="aspect-square relative bg-gray-100">
                                 <Image
-                                    src={`http://localhost:8000${photo.url}?t=${imageTimestamp}`}
+                                    src={`http://localhost:8000${photo.thumbnail_url}`}
                                     alt={photo.filename}
                                     fill
                                     className="object-cover z-10 inset-0"
@@ -87,12 +85,21 @@ export function PhotoSelector({
                                     </div>
                                 )}
 
+                                {photo.prune_reason && (
+                                    <div className="absolute bottom-2 left-2 z-10 rounded bg-amber-500 px-2 py-0.5 text-xs text-white">
+                                        {PRUNE_REASON_LABELS[photo.prune_reason]}
+                                    </div>
+                                )}
+
                                 <div className="absolute inset-0 bg-black bg-opacity-0 group-hover:bg-opacity-20 transition-all" />
                             </div>
 
                             <div className="p-2">
                                 <p className="text-xs text-gray-600 truncate">{photo.filename}</p>
-                                <p className="text-xs text-gray-500">{(photo.size / 1024).toFixed(1)} KB</p>
+                                <p className="text-xs text-gray-500">
+                                    {(photo.size / 1024).toFixed(1)} KB
+                                    {photo.width && photo.height ? ` · ${photo.width}x${photo.height}` : ''}
+                                </p>
                             </div>
                         </div>
                     ))}
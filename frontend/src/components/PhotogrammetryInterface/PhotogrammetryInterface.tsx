@@ -61,7 +61,7 @@ export default function PhotogrammetryInterface() {
             <ProcessingStatus
                 progress={progress}
                 title="Procesando Fotogrametría"
-                description="Esto puede tomar varios minutos..."
+                description={message || "Esto puede tomar varios minutos..."}
             />
         )
     }
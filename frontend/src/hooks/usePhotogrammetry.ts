@@ -26,7 +26,10 @@ export function usePhotogrammetry() {
                 const result = await response.json()
                 if (result.success) {
                     setPhotos(result.photos)
-                    setSelectedPhotos(new Set(result.photos.map((p: Photo) => p.filename)))
+                    // Los casi duplicados y las fotos borrosas detectadas al subir empiezan deseleccionados
+                    setSelectedPhotos(new Set(result.photos
+                        .filter((p: Photo) => !p.suggested_deselect)
+                        .map((p: Photo) => p.filename)))
                 }
             }
         } catch (error) {
@@ -116,46 +119,70 @@ export function usePhotogrammetry() {
         setMessage('Ejecutando pipeline de fotogrametría...')
         setProgress(0)
 
-        const progressInterval = setInterval(() => {
-            setProgress(prev => {
-                if (prev >= 90) return prev
-                return prev + Math.random() * 10
-            })
-        }, 2000)
-
         try {
-            const response = await fetch('http://localhost:8000/photogrammetry', {
+            const response = await fetch('http://localhost:8000/photogrammetry?wait=false', {
                 method: 'POST'
             })
 
-            if (response.ok) {
-                const result = await response.json()
+            if (!response.ok) {
+                const errorData = await response.json()
+                throw new Error(errorData.detail || 'Error en fotogrametría')
+            }
 
-                if (result.success) {
-                    clearInterval(progressInterval)
-                    setProgress(100)
-                    setDownloadUrl(result.download_url)
+            const { job_id } = await response.json()
 
-                    // Guardar estadísticas del mesh
-                    if (result.mesh_statistics) {
-                        setMeshStats(result.mesh_statistics)
+            // Progreso en vivo del trabajo mediante Server-Sent Events
+            await new Promise<void>((resolve, reject) => {
+                const events = new EventSource(`http://localhost:8000/jobs/${job_id}/events`)
+
+                const updateProgress = (event: MessageEvent) => {
+                    const data = JSON.parse(event.data)
+                    if (data.overall_percent != null) {
+                        setProgress(prev => Math.max(prev, data.overall_percent))
                     }
-                    if (result.texture_info) {
-                        setTextureInfo(result.texture_info)
+                    if (data.stage) {
+                        setMessage(data.label && data.percent != null
+                            ? `${data.stage} ${data.label} (${Math.round(data.percent)}%)`
+                            : data.stage)
                     }
+                }
 
-                    setStep('completed')
-                    setMessage('¡Proceso completado! Tu modelo 3D está listo para descargar.')
-                } else {
-                    throw new Error(result.error || 'Error en fotogrametría')
+                events.addEventListener('stage', updateProgress)
+                events.addEventListener('progress', updateProgress)
+                events.addEventListener('done', async () => {
+                    events.close()
+                    try {
+                        const statusResponse = await fetch(`http://localhost:8000/jobs/${job_id}`)
+                        const { result } = await statusResponse.json()
+                        if (!result || !result.success) {
+                            throw new Error(result?.error || 'Error en fotogrametría')
+                        }
+
+                        setProgress(100)
+                        setDownloadUrl(result.download_url)
+
+                        // Guardar estadísticas del mesh
+                        if (result.mesh_statistics) {
+                            setMeshStats(result.mesh_statistics)
+                        }
+                        if (result.texture_info) {
+                            setTextureInfo(result.texture_info)
+                        }
+
+                        setStep('completed')
+                        setMessage('¡Proceso completado! Tu modelo 3D está listo para descargar.')
+                        resolve()
+                    } catch (error) {
+                        reject(error)
+                    }
+                })
+                events.onerror = () => {
+                    events.close()
+                    reject(new Error('Se perdió la conexión con el servidor'))
                 }
-            } else {
-                const errorData = await response.json()
-                throw new Error(errorData.detail || 'Error en fotogrametría')
-            }
+            })
         } catch (error) {
             console.error('Error:', error)
-            clearInterval(progressInterval)
             setMessage(`Error en fotogrametría: ${error instanceof Error ? error.message : 'Error desconocido'}`)
             setStep('idle')
             setProgress(0)
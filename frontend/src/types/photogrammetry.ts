@@ -4,7 +4,13 @@ export type ProcessStep = 'idle' | 'uploading' | 'processing' | 'selecting' | 'p
 export interface Photo {
     filename: string
     size: number
+    width: number | null
+    height: number | null
     url: string
+    thumbnail_url: string
+    thumbnails: Record<string, string>
+    suggested_deselect: boolean
+    prune_reason: 'near_duplicate' | 'blurry' | null
 }
 
 export interface Config {
@@ -0,0 +1,112 @@
+import struct
+import numpy as np
+from utils.colmapModel import (INVALID_POINT3D_ID, compute_model_statistics, model_exists,
+                               read_model, read_points3D_binary)
+
+UINT64_MAX = 2 ** 64 - 1
+
+
+def write_model(folder, points):
+    """
+    Modelo mínimo: una cámara PINHOLE, dos imágenes y los puntos indicados
+    como (id, xyz, rgb, error, track)
+    """
+    with open(folder / "cameras.bin", "wb") as file:
+        file.write(struct.pack("<Q", 1))
+        file.write(struct.pack("<iiQQ", 1, 1, 640, 480))
+        file.write(struct.pack("<4d", 500.0, 500.0, 320.0, 240.0))
+
+    images = [
+        (1, "a.jpg", [(10.0, 20.0, 1), (30.0, 40.0, UINT64_MAX)]),
+        (2, "b.jpg", [(11.0, 21.0, 1), (31.0, 41.0, 2), (50.0, 60.0, UINT64_MAX)]),
+    ]
+    with open(folder / "images.bin", "wb") as file:
+        file.write(struct.pack("<Q", len(images)))
+        for image_id, name, observations in images:
+            file.write(struct.pack("<i7di", image_id, 1, 0, 0, 0, 0.1 * image_id, 0, 0, 1))
+            file.write(name.encode("utf-8") + b"\x00")
+            file.write(struct.pack("<Q", len(observations)))
+            for x, y, point3D_id in observations:
+                file.write(struct.pack("<ddQ", x, y, point3D_id))
+
+    with open(folder / "points3D.bin", "wb") as file:
+        file.write(struct.pack("<Q", len(points)))
+        for point3D_id, xyz, rgb, error, track in points:
+            file.write(struct.pack("<Q3d3BdQ", point3D_id, *xyz, *rgb, error, len(track)))
+            for image_id, point2D_idx in track:
+                file.write(struct.pack("<ii", image_id, point2D_idx))
+
+
+POINTS = [
+    (1, (0.0, 1.0, 2.0), (255, 0, 0), 0.5, [(1, 0), (2, 0)]),
+    (2, (3.0, 4.0, 5.0), (0, 255, 0), 1.5, [(2, 1)]),
+]
+
+
+def test_model_round_trip(tmp_path):
+    write_model(tmp_path, POINTS)
+
+    model = read_model(str(tmp_path))
+
+    assert model["cameras"]["camera_id"].tolist() == [1]
+    assert model["cameras"][0]["width"] == 640 and model["cameras"][0]["height"] == 480
+    np.testing.assert_array_equal(model["camera_params"][1], [500.0, 500.0, 320.0, 240.0])
+
+    assert model["image_names"] == ["a.jpg", "b.jpg"]
+    np.testing.assert_allclose(model["images"]["tvec"][1], [0.2, 0.0, 0.0])
+    assert model["points2D"][1]["point3D_id"].tolist() == [1, INVALID_POINT3D_ID]
+    assert model["points2D"][2]["point3D_id"].tolist() == [1, 2, INVALID_POINT3D_ID]
+    np.testing.assert_array_equal(model["points2D"][2]["xy"][1], [31.0, 41.0])
+    # Las observaciones sin punto 3D no cuentan como triangulados
+    assert model["images"]["num_points2D"].tolist() == [2, 3]
+    assert model["images"]["num_points3D"].tolist() == [1, 2]
+
+    points3D = model["points3D"]
+    assert points3D["point3D_id"].tolist() == [1, 2]
+    np.testing.assert_array_equal(points3D["xyz"], [[0, 1, 2], [3, 4, 5]])
+    assert points3D["rgb"].tolist() == [[255, 0, 0], [0, 255, 0]]
+    assert points3D["track_length"].tolist() == [2, 1]
+
+
+def test_points_with_tracks(tmp_path):
+    write_model(tmp_path, POINTS)
+
+    points3D, tracks = read_points3D_binary(str(tmp_path / "points3D.bin"), with_tracks=True)
+
+    assert points3D["error"].tolist() == [0.5, 1.5]
+    assert tracks["image_id"].tolist() == [1, 2, 2]
+    assert tracks["point2D_idx"].tolist() == [0, 0, 1]
+
+
+def test_empty_points_file(tmp_path):
+    write_model(tmp_path, [])
+
+    points3D, tracks = read_points3D_binary(str(tmp_path / "points3D.bin"), with_tracks=True)
+
+    assert len(points3D) == 0 and len(tracks) == 0
+    stats = compute_model_statistics(str(tmp_path))
+    assert stats["points3D"] == 0
+    assert stats["mean_track_length"] == 0.0
+
+
+def test_model_statistics(tmp_path):
+    write_model(tmp_path, POINTS)
+
+    stats = compute_model_statistics(str(tmp_path), total_images=4)
+
+    assert stats == {
+        "cameras": 1,
+        "registered_images": 2,
+        "points3D": 2,
+        "observations": 3,
+        "mean_track_length": 1.5,
+        "mean_reprojection_error": 1.0,
+        "mean_observations_per_image": 1.5,
+        "total_images": 4,
+        "registration_ratio": 0.5
+    }
+
+
+def test_missing_model(tmp_path):
+    assert not model_exists(str(tmp_path))
+    assert compute_model_statistics(str(tmp_path)) is None
@@ -0,0 +1,91 @@
+import numpy as np
+from utils.meshExport import read_textured_obj, decimate_textured_mesh, unweld_vertices
+
+
+GRID = 60
+
+
+def chart_uv(x, y):
+    """
+    Dos cartas en zonas separadas de la textura: x < 0.5 y x >= 0.5
+    """
+    u = np.where(x < 0.5, 0.05 + 0.8 * x, 0.6 + 0.8 * (x - 0.5))
+    return np.column_stack([u, 0.1 + 0.8 * y])
+
+
+def write_textured_grid(path, size=GRID):
+    """
+    Plano ondulado de size x size celdas con coordenadas de textura propias en
+    cada cara, como las escribe TextureMesh de OpenMVS
+    """
+    coords = np.linspace(0.0, 1.0, size + 1)
+    x, y = np.meshgrid(coords, coords, indexing="ij")
+    positions = np.column_stack([x.ravel(), y.ravel(),
+                                 0.05 * np.sin(4 * x.ravel()) * np.cos(3 * y.ravel())])
+    index = np.arange((size + 1) ** 2).reshape(size + 1, size + 1)
+    a, b = index[:-1, :-1].ravel(), index[1:, :-1].ravel()
+    c, d = index[1:, 1:].ravel(), index[:-1, 1:].ravel()
+    faces = np.concatenate([np.column_stack([a, b, c]), np.column_stack([a, c, d])])
+
+    # La carta de cada cara la decide su centro; en la costura se repiten posiciones
+    centers = positions[faces].mean(axis=1)
+    left = centers[:, 0] < 0.5
+    corner_positions = positions[faces.reshape(-1)]
+    corner_x = np.where(np.repeat(left, 3), np.minimum(corner_positions[:, 0], 0.4999),
+                        np.maximum(corner_positions[:, 0], 0.5))
+    uvs = chart_uv(corner_x, corner_positions[:, 1])
+
+    with open(path, "w") as file:
+        file.write("mtllib scene.mtl\n")
+        file.writelines(f"v {px:.6f} {py:.6f} {pz:.6f}\n" for px, py, pz in positions)
+        file.writelines(f"vt {u:.6f} {v:.6f}\n" for u, v in uvs)
+        file.write("usemtl material_0\n")
+        for face_index, face in enumerate(faces + 1):
+            corners = [f"{vertex}/{3 * face_index + corner + 1}" for corner, vertex in enumerate(face)]
+            file.write("f " + " ".join(corners) + "\n")
+    return len(faces)
+
+
+def test_decimation_reduces_faces_and_vertices(tmp_path):
+    path = tmp_path / "scene.obj"
+    total_faces = write_textured_grid(path)
+    mesh = read_textured_obj(str(path))
+    full_vertices = len(unweld_vertices(mesh)[0])
+
+    lod = decimate_textured_mesh(mesh, total_faces // 4)
+    positions, uvs, indices = unweld_vertices(lod)
+
+    assert len(lod["faces"]) <= total_faces // 4
+    assert len(lod["faces"]) >= total_faces // 8
+    # Los vértices bajan en proporción a las caras: en una malla cerrada de
+    # triángulos hay unos F / 2 y la costura solo duplica una columna
+    assert len(positions) < full_vertices // 4
+    assert len(positions) <= len(lod["faces"])
+    assert indices.max() < len(positions)
+
+
+def test_decimated_uvs_stay_in_their_chart(tmp_path):
+    path = tmp_path / "scene.obj"
+    total_faces = write_textured_grid(path)
+    lod = decimate_textured_mesh(read_textured_obj(str(path)), total_faces // 4)
+
+    uvs = lod["uvs"][lod["uv_faces"]]
+    assert uvs.min() >= 0.0 and uvs.max() <= 1.0
+    # Ninguna cara mezcla las dos cartas (separadas entre u = 0.45 y u = 0.6)
+    left = uvs[:, :, 0] <= 0.45 + 1e-6
+    right = uvs[:, :, 0] >= 0.6 - 1e-6
+    assert np.all(left.all(axis=1) | right.all(axis=1))
+
+    # Cada esquina conserva la coordenada que corresponde a su posición
+    positions = lod["positions"][lod["faces"]].reshape(-1, 3)
+    cell = 1.0 / np.sqrt(total_faces / 4 / 2)
+    expected_v = 0.1 + 0.8 * positions[:, 1]
+    assert np.abs(uvs.reshape(-1, 2)[:, 1] - expected_v).max() <= 0.8 * cell
+
+
+def test_small_meshes_are_not_decimated(tmp_path):
+    path = tmp_path / "scene.obj"
+    total_faces = write_textured_grid(path, size=4)
+    mesh = read_textured_obj(str(path))
+
+    assert decimate_textured_mesh(mesh, total_faces) is mesh
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from utils.meshProcessing import write_ply_mesh
+from utils.meshStatistics import mesh_statistics, parse_numbers, triangulate_faces
+
+
+CUBE_VERTICES = np.array([[0, 0, 0], [2, 0, 0], [2, 2, 0], [0, 2, 0],
+                          [0, 0, 2], [2, 0, 2], [2, 2, 2], [0, 2, 2]], dtype=np.float64)
+# Caras cuadradas (índices desde 1, como en OBJ)
+CUBE_QUADS = [(1, 4, 3, 2), (5, 6, 7, 8), (1, 2, 6, 5), (2, 3, 7, 6), (3, 4, 8, 7), (4, 1, 5, 8)]
+
+
+def write_cube_obj(path, face_format="{v}"):
+    lines = ["# cubo", "mtllib cube.mtl"]
+    lines += [f"v {x} {y} {z}" for x, y, z in CUBE_VERTICES]
+    lines += ["vt 0 0", "vt 1 0", "vt 1 1", "vn 0 0 1"]
+    for quad in CUBE_QUADS:
+        lines.append("f " + " ".join(face_format.format(v=v, t=1 + i % 3)
+                                     for i, v in enumerate(quad)))
+    path.write_text("\n".join(lines) + "\n")
+
+
+@pytest.mark.parametrize("face_format", ["{v}", "{v}/{t}", "{v}/{t}/1", "{v}//1"])
+def test_obj_cube_statistics(tmp_path, face_format):
+    path = tmp_path / "cube.obj"
+    write_cube_obj(path, face_format)
+
+    stats = mesh_statistics(str(path))
+
+    assert stats["vertices"] == 8
+    assert stats["faces"] == 6
+    assert stats["triangles"] == 12
+    assert stats["non_triangular_faces"] == 6
+    assert stats["texture_coordinates"] == 3
+    assert stats["vertex_normals"] == 1
+    assert stats["surface_area"] == pytest.approx(24.0)
+    assert stats["bounding_box"]["size"] == [2.0, 2.0, 2.0]
+    assert stats["watertight"] is True
+
+
+def test_obj_negative_indices_and_open_mesh(tmp_path):
+    path = tmp_path / "quad.obj"
+    path.write_text("v 0 0 0\nv 1 0 0\nv 1 1 0\nv 0 1 0\nf -4 -3 -2\nf 1/1 3/1 4/1\n")
+
+    stats = mesh_statistics(str(path))
+
+    assert stats["triangles"] == 2
+    assert stats["surface_area"] == pytest.approx(1.0)
+    assert stats["boundary_edges"] == 4
+    assert stats["watertight"] is False
+
+
+def test_ply_statistics_match_obj(tmp_path):
+    triangles = triangulate_faces(np.array([v - 1 for quad in CUBE_QUADS for v in quad]),
+                                  np.full(len(CUBE_QUADS), 4))
+    path = tmp_path / "cube.ply"
+    write_ply_mesh(str(path), CUBE_VERTICES, triangles)
+
+    stats = mesh_statistics(str(path))
+
+    assert stats["vertices"] == 8
+    assert stats["triangles"] == 12
+    assert stats["surface_area"] == pytest.approx(24.0)
+    assert stats["non_manifold_edges"] == 0
+    assert stats["watertight"] is True
+
+
+def test_missing_mesh_returns_none(tmp_path):
+    assert mesh_statistics(str(tmp_path / "missing.obj")) is None
+
+
+def test_parse_numbers_rejects_malformed_text():
+    assert parse_numbers(np.frombuffer(b" 1 -2.5e1\n3 ", dtype=np.uint8)).tolist() == [1, -25, 3]
+    with pytest.raises(ValueError):
+        parse_numbers(np.frombuffer(b"1 x 3", dtype=np.uint8))
@@ -0,0 +1,132 @@
+import cv2
+import numpy as np
+from utils.pairPreselection import (compute_global_descriptor, compute_global_descriptors,
+                                    build_knn_pairs, build_query_pairs, write_pairs_file,
+                                    preselect_image_pairs, load_thumbnail)
+import utils.pairPreselection as pairPreselection
+
+
+def scene(seed, shift=0):
+    """
+    Imagen sintética con rectángulos de colores; `shift` la desplaza un poco
+    para simular una foto vecina de la misma escena
+    """
+    rng = np.random.default_rng(seed)
+    img = np.zeros((240, 320, 3), dtype=np.uint8)
+    for _ in range(12):
+        x, y = rng.integers(0, 280), rng.integers(0, 200)
+        w, h = rng.integers(20, 80), rng.integers(20, 80)
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.rectangle(img, (int(x), int(y)), (int(x + w), int(y + h)), color, -1)
+    return np.roll(img, shift, axis=1)
+
+
+def unit_rows(rows):
+    rows = np.asarray(rows, dtype=np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_descriptor_is_normalized_and_tolerates_exposure():
+    img = scene(0)
+
+    descriptor = compute_global_descriptor(cv2.resize(img, (64, 64)))
+    brighter = compute_global_descriptor(cv2.resize(cv2.convertScaleAbs(img, beta=20), (64, 64)))
+    other = compute_global_descriptor(cv2.resize(scene(1), (64, 64)))
+
+    assert descriptor.dtype == np.float32
+    assert abs(np.linalg.norm(descriptor) - 1) < 1e-5
+    assert descriptor @ brighter > descriptor @ other
+
+
+def test_knn_pairs_are_unique_and_ordered():
+    descriptors = unit_rows([[1, 0], [0.9, 0.1], [0, 1], [0.1, 0.9]])
+
+    pairs = build_knn_pairs(descriptors, num_neighbors=1)
+
+    assert pairs.tolist() == [[0, 1], [2, 3]]
+
+
+def test_knn_pairs_for_query_images():
+    descriptors = unit_rows([[1, 0], [0.9, 0.1], [0, 1], [0.1, 0.9], [0.5, 0.5]])
+
+    pairs = build_knn_pairs(descriptors, num_neighbors=2, query_indices=[4])
+
+    assert len(pairs) == 2
+    assert all(4 in pair for pair in pairs.tolist())
+    assert (pairs[:, 0] < pairs[:, 1]).all()
+
+
+def test_knn_pairs_with_too_few_images():
+    assert build_knn_pairs(unit_rows([[1, 0]]), num_neighbors=5).shape == (0, 2)
+    # k se limita a N - 1: con tres imágenes salen todos los pares
+    assert build_knn_pairs(unit_rows([[1, 0], [0, 1], [1, 1]]), 10).tolist() == \
+        [[0, 1], [0, 2], [1, 2]]
+
+
+def test_knn_pairs_match_across_similarity_blocks(monkeypatch):
+    descriptors = unit_rows(np.random.default_rng(0).normal(size=(40, 8)))
+    expected = build_knn_pairs(descriptors, num_neighbors=3)
+
+    monkeypatch.setattr(pairPreselection, "SIMILARITY_BLOCK_SIZE", 7)
+    np.testing.assert_array_equal(build_knn_pairs(descriptors, num_neighbors=3), expected)
+
+
+def test_query_pairs():
+    pairs = build_query_pairs(4, [1])
+
+    assert pairs.tolist() == [[0, 1], [1, 2], [1, 3]]
+    assert len(build_query_pairs(5, [0, 4])) == 7
+
+
+def test_write_pairs_file(tmp_path):
+    path = tmp_path / "pairs.txt"
+
+    write_pairs_file(["a.jpg", "b.jpg", "c.jpg"], np.array([[0, 1], [1, 2]]), str(path))
+
+    assert path.read_text() == "a.jpg b.jpg\nb.jpg c.jpg\n"
+
+
+def test_preselect_pairs_neighbouring_photos(tmp_path):
+    names = []
+    for seed in range(3):
+        for shift in (0, 8):
+            name = f"scene{seed}_{shift}.jpg"
+            cv2.imwrite(str(tmp_path / name), scene(seed, shift))
+            names.append(name)
+    (tmp_path / "broken.jpg").write_bytes(b"not an image")
+    output = tmp_path / "pairs.txt"
+
+    result = preselect_image_pairs(str(tmp_path), names + ["broken.jpg"], str(output),
+                                   num_neighbors=1)
+
+    assert load_thumbnail(str(tmp_path / "broken.jpg")) is None
+    assert result["described_images"] == len(names)
+    pairs = {tuple(line.split()) for line in output.read_text().splitlines()}
+    assert pairs == {(f"scene{seed}_0.jpg", f"scene{seed}_8.jpg") for seed in range(3)}
+    assert result["preselected_pairs"] == 3
+
+
+def test_preselect_only_for_query_images(tmp_path):
+    names = [f"{i}.jpg" for i in range(4)]
+    for i, name in enumerate(names):
+        cv2.imwrite(str(tmp_path / name), scene(i))
+    output = tmp_path / "pairs.txt"
+
+    result = preselect_image_pairs(str(tmp_path), names, str(output), num_neighbors=2,
+                                   query_names=["3.jpg"])
+
+    assert result["preselected_pairs"] == 2
+    assert all("3.jpg" in line.split() for line in output.read_text().splitlines())
+
+    empty = preselect_image_pairs(str(tmp_path), names, str(output), query_names=["x.jpg"])
+    assert empty["preselected_pairs"] == 0
+    assert output.read_text() == ""
+
+
+def test_descriptors_skip_unreadable_images(tmp_path):
+    cv2.imwrite(str(tmp_path / "a.jpg"), scene(0))
+
+    descriptors, names = compute_global_descriptors(str(tmp_path), ["a.jpg", "missing.jpg"])
+
+    assert names == ["a.jpg"]
+    assert descriptors.shape[0] == 1
@@ -0,0 +1,93 @@
+import json
+from utils.photoPruning import find_prunable_photos, save_pruning_report, load_pruning_suggestions
+from utils.imageProbe import directory_index
+
+
+def photo(content, dhash, quality=0.5, sharpness=100.0):
+    return {"content_hash": content * 64, "dhash": dhash, "quality_score": quality,
+            "sharpness": sharpness}
+
+
+def test_exact_duplicates_keep_the_first_name():
+    analysis = {"b.jpg": photo("a", 0b1111), "a.jpg": photo("a", 0b1111),
+                "c.jpg": photo("c", 0xFFFF0000)}
+
+    exact, near, _ = find_prunable_photos(analysis, blur_ratio=0)
+
+    assert exact == [{"filename": "b.jpg", "duplicate_of": "a.jpg"}]
+    assert near == []
+
+
+def test_near_duplicates_keep_the_best_photo():
+    analysis = {"a.jpg": photo("a", 0b0000, quality=0.4),
+                "b.jpg": photo("b", 0b0011, quality=0.9),
+                "c.jpg": photo("c", 0xFFFF, quality=0.5)}
+
+    _, near, _ = find_prunable_photos(analysis, near_duplicate_distance=2, blur_ratio=0)
+
+    assert near == [{"filename": "a.jpg", "duplicate_of": "b.jpg", "distance": 2}]
+
+
+def test_near_duplicates_do_not_chain():
+    # Cada foto está a 2 bits de la siguiente: solo se descartan las que están
+    # cerca de una que se conserva
+    hashes = [0b0, 0b11, 0b1111, 0b111111, 0b11111111]
+    analysis = {f"{i}.jpg": photo(str(i), value, quality=1 - i / 10)
+                for i, value in enumerate(hashes)}
+
+    _, near, _ = find_prunable_photos(analysis, near_duplicate_distance=2, blur_ratio=0)
+
+    assert sorted(entry["filename"] for entry in near) == ["1.jpg", "3.jpg"]
+
+
+def test_negative_distance_disables_near_duplicates():
+    analysis = {"a.jpg": photo("a", 0), "b.jpg": photo("b", 0)}
+
+    assert find_prunable_photos(analysis, near_duplicate_distance=-1, blur_ratio=0)[1] == []
+
+
+def test_blurry_photos_relative_to_the_median():
+    analysis = {f"{i}.jpg": photo(str(i), 0xFF << (8 * i), sharpness=100.0) for i in range(5)}
+    analysis["blur.jpg"] = photo("z", 0xF0F0F0F0F0F0F0F0, sharpness=20.0)
+
+    _, _, blurry = find_prunable_photos(analysis, near_duplicate_distance=0, blur_ratio=0.3)
+
+    assert [entry["filename"] for entry in blurry] == ["blur.jpg"]
+    assert blurry[0]["median_sharpness"] == 100.0
+
+
+def test_blur_needs_enough_photos():
+    analysis = {"a.jpg": photo("a", 0, sharpness=100.0), "b.jpg": photo("b", 0xFFFF, sharpness=1.0)}
+
+    assert find_prunable_photos(analysis, blur_ratio=0.3)[2] == []
+
+
+def test_reference_photos_are_always_kept():
+    reference = {"old.jpg": photo("o", 0b0000, quality=0.1)}
+    analysis = {"dup.jpg": photo("o", 0b0000, quality=0.9),
+                "near.jpg": photo("n", 0b0001, quality=0.9)}
+
+    exact, near, _ = find_prunable_photos(analysis, near_duplicate_distance=2, blur_ratio=0,
+                                          reference=reference)
+
+    assert exact == [{"filename": "dup.jpg", "duplicate_of": "old.jpg"}]
+    assert near == [{"filename": "near.jpg", "duplicate_of": "old.jpg", "distance": 1}]
+
+
+def test_saved_suggestions_expire_when_the_photo_changes(tmp_path):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    (folder / "a.jpg").write_bytes(b"a")
+    (folder / "b.jpg").write_bytes(b"b")
+    report_path = str(tmp_path / "report.json")
+    report = {"suggestions": {"a.jpg": "blurry", "b.jpg": "near_duplicate"}}
+    save_pruning_report(report, str(folder), {"a.jpg": photo("a", 1)}, path=report_path)
+
+    assert load_pruning_suggestions(directory_index(str(folder)), report_path) == \
+        report["suggestions"]
+    assert "analysis" in json.load(open(report_path))
+
+    (folder / "a.jpg").write_bytes(b"changed")
+    (folder / "c.jpg").write_bytes(b"c")
+    assert load_pruning_suggestions(directory_index(str(folder)), report_path) == \
+        {"b.jpg": "near_duplicate"}
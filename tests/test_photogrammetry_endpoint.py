@@ -0,0 +1,50 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+import app
+
+
+SCENE_IMAGES = ["image_0001.jpg", "image_0002.jpg"]
+NEW_IMAGES = ["image_0003.jpg"]
+
+
+@pytest.fixture
+def workspace(monkeypatch):
+    """
+    /data/images simulado: la escena conservada más una foto nueva
+    """
+    listdir, exists = os.listdir, os.path.exists
+    monkeypatch.setattr(app.os, "listdir", lambda path=".": SCENE_IMAGES + NEW_IMAGES
+                        if path == "/data/images" else listdir(path))
+    monkeypatch.setattr(app.os.path, "exists", lambda path: path == "/data/images" or exists(path))
+    monkeypatch.setattr(app, "load_scene_state", lambda: {"images": SCENE_IMAGES})
+
+    calls = []
+
+    def pipeline(**kwargs):
+        calls.append(kwargs)
+        return {"success": True}
+
+    monkeypatch.setattr(app, "execute_photogrammetry_pipeline", pipeline)
+    return calls
+
+
+def test_append_queues_the_pipeline(workspace):
+    response = TestClient(app.app).post("/photogrammetry?append=true")
+
+    assert response.status_code == 200
+    assert response.json() == {"success": True}
+    assert workspace[0]["append"] is True
+    assert workspace[0]["new_images"] == NEW_IMAGES
+    # La estrategia de emparejado la decide el pipeline en modo append
+    assert workspace[0]["matching_info"] is None
+
+
+def test_append_without_new_images_is_rejected(workspace, monkeypatch):
+    monkeypatch.setattr(app, "load_scene_state",
+                        lambda: {"images": SCENE_IMAGES + NEW_IMAGES})
+
+    response = TestClient(app.app).post("/photogrammetry?append=true")
+
+    assert response.status_code == 400
+    assert workspace == []
@@ -0,0 +1,168 @@
+import numpy as np
+import pytest
+from scipy.spatial import cKDTree
+from utils.pointCloudFilter import (load_ply_vertices, list_record_offsets, ply_element_count,
+                                    statistical_outlier_mask, radius_outlier_mask,
+                                    voxel_downsample_mask, write_filtered_ply,
+                                    filter_dense_point_cloud)
+
+# Cola tras los vértices, que debe conservarse sin cambios
+FACE_ELEMENT = b"\x03" + np.array([0, 1, 2], dtype="<i4").tobytes()
+
+
+def write_ply(path, xyz, views=None, length_type="uchar"):
+    """
+    PLY binario como el de DensifyPointCloud: coordenadas, color y, si se
+    indican, las listas de vistas y pesos de cada punto, seguido de una cara
+    """
+    length_dtype = {"uchar": "u1", "uint": "<u4"}[length_type]
+    lines = ["ply", "format binary_little_endian 1.0", f"element vertex {len(xyz)}",
+             "property float x", "property float y", "property float z"]
+    if views is not None:
+        lines += [f"property list {length_type} uint view_indices",
+                  f"property list {length_type} float view_weights"]
+    lines += ["property uchar red", "property uchar green", "property uchar blue",
+              "element face 1", "property list uchar int vertex_indices", "end_header"]
+
+    with open(path, "wb") as file:
+        file.write(("\n".join(lines) + "\n").encode("ascii"))
+        for i, point in enumerate(xyz):
+            file.write(np.asarray(point, dtype="<f4").tobytes())
+            if views is not None:
+                file.write(np.array([len(views[i])], dtype=length_dtype).tobytes())
+                file.write(np.asarray(views[i], dtype="<u4").tobytes())
+                file.write(np.array([len(views[i])], dtype=length_dtype).tobytes())
+                file.write(np.full(len(views[i]), 0.5, dtype="<f4").tobytes())
+            file.write(bytes([i % 256, 0, 255]))
+        file.write(FACE_ELEMENT)
+
+
+def noisy_cloud(seed=0):
+    """
+    Rejilla densa de 20 x 20 con tres puntos aislados lejos de ella
+    """
+    grid = np.stack(np.meshgrid(np.arange(20), np.arange(20)), axis=-1).reshape(-1, 2) * 0.1
+    rng = np.random.default_rng(seed)
+    surface = np.column_stack([grid, rng.normal(0, 0.005, len(grid))])
+    outliers = np.array([[10.0, 10.0, 10.0], [-8.0, 5.0, 3.0], [4.0, -9.0, -6.0]])
+    return np.vstack([surface, outliers])
+
+
+def test_load_vertices_without_lists(tmp_path):
+    xyz = np.arange(12, dtype=np.float64).reshape(4, 3)
+    path = tmp_path / "dense.ply"
+    write_ply(path, xyz)
+
+    info = load_ply_vertices(str(path))
+
+    assert info["offsets"] is None
+    np.testing.assert_array_equal(info["xyz"], xyz)
+    assert info["vertices"]["red"].tolist() == [0, 1, 2, 3]
+    assert ply_element_count(str(path), "face") == 1
+
+
+@pytest.mark.parametrize("length_type", ["uchar", "uint"])
+def test_load_vertices_with_view_lists(tmp_path, length_type):
+    xyz = np.arange(12, dtype=np.float64).reshape(4, 3)
+    views = [[0], [1, 2, 3], [], [4, 5]]
+    path = tmp_path / "dense.ply"
+    write_ply(path, xyz, views, length_type)
+
+    info = load_ply_vertices(str(path))
+
+    np.testing.assert_array_equal(info["xyz"], xyz)
+    length_size = 1 if length_type == "uchar" else 4
+    record_sizes = [12 + 2 * (length_size + 4 * len(v)) + 3 for v in views]
+    np.testing.assert_array_equal(
+        info["offsets"], info["header_size"] + np.concatenate([[0], np.cumsum(record_sizes)]))
+    assert info["end"] == path.stat().st_size - len(FACE_ELEMENT)
+
+
+def test_list_offsets_match_between_length_sizes(tmp_path):
+    xyz = np.zeros((3, 3))
+    views = [[1, 2], [3], [4, 5, 6]]
+    sizes = {}
+    for length_type in ("uchar", "uint"):
+        path = tmp_path / f"{length_type}.ply"
+        write_ply(path, xyz, views, length_type)
+        info = load_ply_vertices(str(path))
+        offsets = list_record_offsets(info["raw"], info["header_size"], info["count"],
+                                      info["properties"])
+        sizes[length_type] = np.diff(offsets)
+
+    # Cada registro con longitudes uint ocupa 6 bytes más (dos listas)
+    np.testing.assert_array_equal(sizes["uint"] - sizes["uchar"], [6, 6, 6])
+
+
+def test_rejects_ascii_ply(tmp_path):
+    path = tmp_path / "ascii.ply"
+    path.write_text("ply\nformat ascii 1.0\nelement vertex 0\nproperty float x\nend_header\n")
+
+    with pytest.raises(ValueError):
+        load_ply_vertices(str(path))
+
+
+def test_outlier_masks_drop_isolated_points():
+    xyz = noisy_cloud()
+    tree = cKDTree(xyz)
+
+    statistical, spacing = statistical_outlier_mask(tree, xyz)
+    radius = radius_outlier_mask(tree, xyz, 4.0 * spacing)
+
+    assert spacing == pytest.approx(0.1, rel=0.2)
+    assert not statistical[-3:].any()
+    assert not radius[-3:].any()
+    assert radius[:-3].all()
+
+
+def test_voxel_downsample_keeps_one_point_per_voxel():
+    xyz = np.array([[0.0, 0, 0], [0.1, 0.1, 0], [1.2, 0, 0], [1.3, 0.2, 0.1], [3.0, 3, 3]])
+
+    mask = voxel_downsample_mask(xyz, 1.0)
+
+    assert mask.tolist() == [True, False, True, False, True]
+
+
+@pytest.mark.parametrize("with_views", [False, True])
+def test_write_filtered_ply_round_trip(tmp_path, with_views):
+    xyz = np.arange(18, dtype=np.float64).reshape(6, 3)
+    views = [[i] * (i % 3) for i in range(6)] if with_views else None
+    source, output = tmp_path / "dense.ply", tmp_path / "filtered.ply"
+    write_ply(source, xyz, views)
+    keep = np.array([True, False, True, True, False, True])
+
+    write_filtered_ply(load_ply_vertices(str(source)), keep, str(output))
+
+    filtered = load_ply_vertices(str(output))
+    np.testing.assert_array_equal(filtered["xyz"], xyz[keep])
+    assert ply_element_count(str(output), "face") == 1
+    assert output.read_bytes().endswith(FACE_ELEMENT)
+    if with_views:
+        kept = [view for view, flag in zip(views, keep) if flag]
+        raw = filtered["raw"]
+        first_list = filtered["offsets"][:-1] + 12
+        assert [int(raw[offset]) for offset in first_list] == [len(view) for view in kept]
+
+
+def test_filter_dense_point_cloud(tmp_path):
+    xyz = noisy_cloud()
+    views = [[i % 7, (i + 1) % 7] for i in range(len(xyz))]
+    source, output = tmp_path / "dense.ply", tmp_path / "filtered.ply"
+    write_ply(source, xyz, views)
+
+    stats = filter_dense_point_cloud(str(source), str(output))
+
+    assert stats["points_before"] == len(xyz)
+    assert stats["points_after"] == len(xyz) - 3
+    np.testing.assert_allclose(load_ply_vertices(str(output))["xyz"], xyz[:-3], atol=1e-6)
+
+    downsampled = filter_dense_point_cloud(str(source), str(output), voxel_factor=2.0)
+    assert downsampled["points_after"] < stats["points_after"]
+    assert ply_element_count(str(output), "vertex") == downsampled["points_after"]
+
+
+def test_small_clouds_are_not_filtered(tmp_path):
+    source = tmp_path / "dense.ply"
+    write_ply(source, np.zeros((5, 3)))
+
+    assert filter_dense_point_cloud(str(source), str(tmp_path / "filtered.ply")) is None
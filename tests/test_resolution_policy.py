@@ -0,0 +1,25 @@
+from utils.qualityPresets import get_quality_preset
+from utils.resolutionPolicy import resolution_policy, target_size, MIN_WORKING_IMAGE_SIZE
+
+
+def test_preview_ingest_keeps_images_within_the_pixel_budget():
+    # 150 MP / 10 imágenes = 15 MP: una foto de 12 MP no se reduce aunque
+    # supere el lado máximo de preview, que se aplica en el pipeline
+    policy = resolution_policy(get_quality_preset("preview"), 10)
+
+    assert target_size(4000, 3000, policy) == (4000, 3000)
+
+
+def test_pixel_budget_is_shared_between_images():
+    policy = resolution_policy(get_quality_preset("standard"), 400)
+    width, height = target_size(4000, 3000, policy)
+
+    assert width * height <= policy["max_pixels"] * 1.01
+    assert abs(width / height - 4 / 3) < 0.01
+
+
+def test_budget_never_goes_below_the_minimum_side():
+    policy = resolution_policy(get_quality_preset("preview"), 100000)
+
+    assert max(target_size(4000, 3000, policy)) == MIN_WORKING_IMAGE_SIZE
+    assert target_size(800, 600, policy) == (800, 600)
@@ -0,0 +1,123 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+import app
+from utils.resultPackage import parse_range, etag_matches, file_etag, iter_file_range
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    ("bytes=-24", (1000, 1023)),
+    ("bytes=-5000", (0, 1023)),
+    (" bytes=5-5 ", (5, 5)),
+    ("bytes=1024-", "unsatisfiable"),
+    ("bytes=-0", "unsatisfiable"),
+    # Sin rango utilizable se envía el archivo completo
+    (None, None),
+    ("", None),
+    ("bytes=-", None),
+    ("bytes=10-5", None),
+    ("bytes=0-10,20-30", None),
+    ("items=0-10", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, len(CONTENT)) == expected
+
+
+def test_etag_matches():
+    etag = '"400-1"'
+
+    assert etag_matches(etag, etag)
+    assert etag_matches('"other", "400-1"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"400-2"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_file_etag_changes_with_the_file(tmp_path):
+    path = tmp_path / "result.zip"
+    path.write_bytes(CONTENT)
+    etag = file_etag(str(path))
+
+    assert etag == file_etag(str(path))
+    path.write_bytes(CONTENT + b"x")
+    assert etag != file_etag(str(path))
+
+
+def test_iter_file_range(tmp_path):
+    path = tmp_path / "result.zip"
+    path.write_bytes(CONTENT)
+
+    chunks = list(iter_file_range(str(path), 10, 299, chunk_size=100))
+
+    assert [len(chunk) for chunk in chunks] == [100, 100, 90]
+    assert b"".join(chunks) == CONTENT[10:300]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """
+    /download sirviendo los archivos de tmp_path en lugar de /data
+    """
+    (tmp_path / "result.zip").write_bytes(CONTENT)
+
+    def local(path):
+        return str(tmp_path / os.path.relpath(path, "/data")) if path.startswith("/data/") else path
+
+    exists, getsize = os.path.exists, os.path.getsize
+    monkeypatch.setattr(app.os.path, "exists", lambda path: exists(local(path)))
+    monkeypatch.setattr(app.os.path, "getsize", lambda path: getsize(local(path)))
+    monkeypatch.setattr(app, "file_etag", lambda path: file_etag(local(path)))
+    monkeypatch.setattr(app, "iter_file_range",
+                        lambda path, start, end: iter_file_range(local(path), start, end))
+    return TestClient(app.app)
+
+
+def test_download_full_file(client):
+    response = client.get("/download/result.zip")
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-type"] == "application/zip"
+    assert response.headers["content-length"] == str(len(CONTENT))
+
+
+def test_download_range(client):
+    response = client.get("/download/result.zip", headers={"Range": "bytes=100-199"})
+
+    assert response.status_code == 206
+    assert response.content == CONTENT[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(CONTENT)}"
+
+
+def test_download_unsatisfiable_range(client):
+    response = client.get("/download/result.zip", headers={"Range": "bytes=5000-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_download_if_none_match(client):
+    etag = client.get("/download/result.zip").headers["etag"]
+
+    response = client.get("/download/result.zip", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_download_stale_if_range_sends_the_whole_file(client):
+    response = client.get("/download/result.zip",
+                          headers={"Range": "bytes=100-199", "If-Range": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_download_missing_file(client):
+    assert client.get("/download/missing.zip").status_code == 404
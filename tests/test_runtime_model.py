@@ -0,0 +1,50 @@
+from utils.runtimeModel import (fit_runtime_model, predict_stage_seconds, stage_timeout,
+                                DEFAULT_STAGE_TIMEOUTS, MIN_STAGE_TIMEOUT, MAX_STAGE_TIMEOUT,
+                                TIMEOUT_FACTOR)
+
+
+def make_profile(quality, images, seconds_per_image):
+    dataset = {"images": images, "megapixels": images * 12.0, "sparse_points": images * 500}
+    return {
+        "quality": quality,
+        "dataset": dataset,
+        "stages": [{"stage": "7", "wall_seconds": images * seconds_per_image},
+                   {"stage": "10", "wall_seconds": 1.0}]
+    }
+
+
+def preview_model():
+    return fit_runtime_model([make_profile("preview", images, 2.0)
+                              for images in (10, 20, 40, 80, 160, 320)])
+
+
+FEATURES = {"images": 50, "megapixels": 600.0, "sparse_points": 25000}
+
+
+def test_timeout_without_history_uses_the_default():
+    assert stage_timeout({}, "7", FEATURES, "high") == DEFAULT_STAGE_TIMEOUTS["7"]
+
+
+def test_timeout_scales_the_prediction_of_the_same_preset():
+    model = preview_model()
+    predicted = predict_stage_seconds(model, "7", FEATURES, "preview")
+
+    assert predicted is not None
+    assert stage_timeout(model, "7", FEATURES, "preview") == int(
+        min(MAX_STAGE_TIMEOUT, max(MIN_STAGE_TIMEOUT, TIMEOUT_FACTOR * predicted)))
+
+
+def test_timeout_ignores_the_history_of_other_presets():
+    model = preview_model()
+
+    # El ETA puede usar el modelo común, pero el timeout de "high" no
+    assert predict_stage_seconds(model, "7", FEATURES, "high") is not None
+    assert predict_stage_seconds(model, "7", FEATURES, "high", pooled=False) is None
+    assert stage_timeout(model, "7", FEATURES, "high") == DEFAULT_STAGE_TIMEOUTS["7"]
+
+
+def test_timeout_is_clamped():
+    model = fit_runtime_model([make_profile("preview", images, 0.001)
+                               for images in (10, 20, 40, 80, 160, 320)])
+
+    assert stage_timeout(model, "7", FEATURES, "preview") == MIN_STAGE_TIMEOUT
@@ -0,0 +1,161 @@
+import os
+import sqlite3
+from PIL import Image
+
+
+EXIF_IFD_TAG = 0x8769
+MAKE_TAG = 0x010F
+MODEL_TAG = 0x0110
+FOCAL_LENGTH_TAG = 0x920A
+FOCAL_LENGTH_35MM_TAG = 0xA405
+
+# Ancho del fotograma de 35 mm usado para convertir la focal equivalente a píxeles
+FILM_35MM_WIDTH = 36.0
+
+CAMERA_MODEL = "SIMPLE_RADIAL"
+
+
+def read_camera_signature(image_path):
+    """
+    Lee de la cabecera (sin decodificar píxeles) los datos que identifican la
+    cámara con la que se tomó una imagen
+
+    Returns:
+        dict con tamaño, fabricante, modelo y focales EXIF (None si no existen)
+    """
+    try:
+        with Image.open(image_path) as img:
+            width, height = img.size
+            exif = img.getexif()
+            exif_ifd = exif.get_ifd(EXIF_IFD_TAG)
+    except Exception:
+        return None
+
+    focal_length = exif_ifd.get(FOCAL_LENGTH_TAG)
+    focal_length_35mm = exif_ifd.get(FOCAL_LENGTH_35MM_TAG)
+
+    return {
+        "width": width,
+        "height": height,
+        "make": str(exif.get(MAKE_TAG, "")).strip("\x00 ") or None,
+        "model": str(exif.get(MODEL_TAG, "")).strip("\x00 ") or None,
+        "focal_length": float(focal_length) if focal_length else None,
+        "focal_length_35mm": float(focal_length_35mm) if focal_length_35mm else None
+    }
+
+
+def focal_35mm_to_pixels(focal_length_35mm, width, height):
+    """
+    Convierte una focal equivalente a 35 mm en una focal en píxeles
+    """
+    return focal_length_35mm / FILM_35MM_WIDTH * max(width, height)
+
+
+def group_images_by_camera(image_folder, image_names, image_source=None):
+    """
+    Agrupa las imágenes que comparten cámara e intrínsecos.
+    Los frames de video forman un único grupo; las fotos se agrupan por
+    fabricante, modelo, focal y resolución EXIF. Las fotos sin EXIF quedan en
+    un grupo con una cámara por imagen (comportamiento por defecto de COLMAP)
+
+    Returns:
+        Lista de grupos con sus imágenes, si comparten cámara y la focal a priori
+    """
+    image_source = image_source or {"source": "unknown"}
+    signatures = {name: read_camera_signature(os.path.join(image_folder, name))
+                  for name in image_names}
+
+    if image_source.get("source") == "video":
+        sizes = {(sig["width"], sig["height"])
+                 for sig in signatures.values() if sig}
+        if len(sizes) == 1:
+            width, height = sizes.pop()
+            focal_35mm = image_source.get("focal_length_35mm")
+            return [{
+                "images": sorted(image_names),
+                "shared_camera": True,
+                "origin": "video",
+                "width": width,
+                "height": height,
+                "focal_prior_px": focal_35mm_to_pixels(focal_35mm, width, height)
+                if focal_35mm else None
+            }]
+
+    groups = {}
+    individual = []
+    for name in sorted(image_names):
+        sig = signatures[name]
+        if not sig or not (sig["make"] or sig["model"]) or not sig["focal_length"]:
+            individual.append(name)
+            continue
+
+        key = (sig["make"], sig["model"], sig["focal_length"],
+               sig["width"], sig["height"])
+        group = groups.setdefault(key, {
+            "images": [],
+            "shared_camera": True,
+            "origin": "exif",
+            "camera": " ".join(filter(None, [sig["make"], sig["model"]])),
+            "width": sig["width"],
+            "height": sig["height"],
+            "focal_prior_px": focal_35mm_to_pixels(
+                sig["focal_length_35mm"], sig["width"], sig["height"])
+            if sig["focal_length_35mm"] else None
+        })
+        group["images"].append(name)
+
+    result = list(groups.values())
+    if individual:
+        result.append({
+            "images": individual,
+            "shared_camera": False,
+            "origin": "per_image",
+            "focal_prior_px": None
+        })
+    return result
+
+
+def camera_reader_options(group):
+    """
+    Opciones de ImageReader de COLMAP para un grupo de cámara
+    """
+    if not group["shared_camera"]:
+        return []
+
+    options = [
+        "--ImageReader.single_camera", "1",
+        "--ImageReader.camera_model", CAMERA_MODEL
+    ]
+    if group.get("focal_prior_px"):
+        # SIMPLE_RADIAL: f, cx, cy, k. Con parámetros explícitos COLMAP marca la focal como prior
+        params = [group["focal_prior_px"], group["width"] / 2,
+                  group["height"] / 2, 0.0]
+        options += ["--ImageReader.camera_params",
+                    ",".join(f"{value:.6f}" for value in params)]
+    return options
+
+
+def read_camera_id(database_path, image_name):
+    """
+    Cámara asignada a una imagen en la base de datos de COLMAP
+    """
+    connection = sqlite3.connect(database_path)
+    try:
+        row = connection.execute(
+            "SELECT camera_id FROM images WHERE name = ?", (image_name,)).fetchone()
+    finally:
+        connection.close()
+    return row[0] if row else None
+
+
+def summarize_camera_groups(groups):
+    """
+    Resumen de los grupos de cámara para la respuesta de la API
+    """
+    return [{
+        "images": len(group["images"]),
+        "shared_camera": group["shared_camera"],
+        "origin": group["origin"],
+        "focal_prior_px": round(group["focal_prior_px"], 2)
+        if group.get("focal_prior_px") else None
+    } for group in groups]
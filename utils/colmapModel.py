@@ -0,0 +1,231 @@
+import mmap
+import os
+import struct
+import numpy as np
+
+
+# Número de parámetros por modelo de cámara de COLMAP (indexado por model_id)
+CAMERA_MODEL_PARAMS = {
+    0: ("SIMPLE_PINHOLE", 3),
+    1: ("PINHOLE", 4),
+    2: ("SIMPLE_RADIAL", 4),
+    3: ("RADIAL", 5),
+    4: ("OPENCV", 8),
+    5: ("OPENCV_FISHEYE", 8),
+    6: ("FULL_OPENCV", 12),
+    7: ("FOV", 5),
+    8: ("SIMPLE_RADIAL_FISHEYE", 4),
+    9: ("RADIAL_FISHEYE", 5),
+    10: ("THIN_PRISM_FISHEYE", 12),
+    11: ("RAD_TAN_THIN_PRISM_FISHEYE", 16),
+}
+
+CAMERA_HEADER = struct.Struct("<iiQQ")
+IMAGE_HEADER = struct.Struct("<i7di")
+
+POINT2D_DTYPE = np.dtype([("xy", "<f8", 2), ("point3D_id", "<i8")])
+
+POINT3D_HEADER_DTYPE = np.dtype([
+    ("point3D_id", "<u8"),
+    ("xyz", "<f8", 3),
+    ("rgb", "u1", 3),
+    ("error", "<f8"),
+    ("track_length", "<u8"),
+])
+TRACK_ELEMENT_DTYPE = np.dtype([("image_id", "<i4"), ("point2D_idx", "<i4")])
+
+IMAGE_DTYPE = np.dtype([
+    ("image_id", "<i4"),
+    ("qvec", "<f8", 4),
+    ("tvec", "<f8", 3),
+    ("camera_id", "<i4"),
+    ("num_points2D", "<u8"),
+    ("num_points3D", "<u8"),
+])
+
+CAMERA_DTYPE = np.dtype([
+    ("camera_id", "<i4"),
+    ("model_id", "<i4"),
+    ("width", "<u8"),
+    ("height", "<u8"),
+])
+
+# COLMAP marca las observaciones sin punto 3D con el máximo de uint64
+# (kInvalidPoint3DId), que leído como "<i8" es -1
+INVALID_POINT3D_ID = -1
+
+
+def _map_file(path):
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_cameras_binary(path):
+    """
+    Lee cameras.bin
+
+    Returns:
+        (array estructurado con id, modelo y tamaño de cada cámara,
+         dict camera_id -> array de parámetros)
+    """
+    buffer = _map_file(path)
+    num_cameras = struct.unpack_from("<Q", buffer, 0)[0]
+    cameras = np.empty(num_cameras, dtype=CAMERA_DTYPE)
+    params = {}
+
+    offset = 8
+    for i in range(num_cameras):
+        camera_id, model_id, width, height = CAMERA_HEADER.unpack_from(
+            buffer, offset)
+        offset += CAMERA_HEADER.size
+        num_params = CAMERA_MODEL_PARAMS[model_id][1]
+        params[camera_id] = np.frombuffer(
+            buffer, dtype="<f8", count=num_params, offset=offset)
+        offset += 8 * num_params
+        cameras[i] = (camera_id, model_id, width, height)
+
+    return cameras, params
+
+
+def read_images_binary(path):
+    """
+    Lee images.bin. Las observaciones 2D de cada imagen son vistas sin copia
+    (np.frombuffer) sobre el archivo mapeado en memoria
+
+    Returns:
+        (array estructurado de imágenes, lista de nombres,
+         dict image_id -> array estructurado de puntos 2D)
+    """
+    buffer = _map_file(path)
+    num_images = struct.unpack_from("<Q", buffer, 0)[0]
+    images = np.empty(num_images, dtype=IMAGE_DTYPE)
+    names = []
+    points2D = {}
+
+    offset = 8
+    for i in range(num_images):
+        header = IMAGE_HEADER.unpack_from(buffer, offset)
+        offset += IMAGE_HEADER.size
+
+        name_end = buffer.find(b"\x00", offset)
+        names.append(bytes(buffer[offset:name_end]).decode("utf-8"))
+        offset = name_end + 1
+
+        num_points2D = struct.unpack_from("<Q", buffer, offset)[0]
+        offset += 8
+        observations = np.frombuffer(
+            buffer, dtype=POINT2D_DTYPE, count=num_points2D, offset=offset)
+        offset += POINT2D_DTYPE.itemsize * num_points2D
+
+        image_id = header[0]
+        points2D[image_id] = observations
+        images[i] = (image_id, header[1:5], header[5:8], header[8], num_points2D,
+                     np.count_nonzero(observations["point3D_id"] != INVALID_POINT3D_ID)
+                     if num_points2D else 0)
+
+    return images, names, points2D
+
+
+def read_points3D_binary(path, with_tracks=False):
+    """
+    Lee points3D.bin. Se recorre el archivo una sola vez para localizar el
+    inicio de cada registro (los tracks tienen longitud variable) y después
+    las cabeceras se extraen de forma vectorizada
+
+    Returns:
+        array estructurado (id, xyz, rgb, error, track_length) y, si se pide,
+        el array concatenado de tracks (image_id, point2D_idx)
+    """
+    buffer = _map_file(path)
+    num_points = struct.unpack_from("<Q", buffer, 0)[0] if len(buffer) else 0
+    if num_points == 0:
+        empty = np.empty(0, dtype=POINT3D_HEADER_DTYPE)
+        return (empty, np.empty(0, dtype=TRACK_ELEMENT_DTYPE)) if with_tracks else empty
+
+    header_size = POINT3D_HEADER_DTYPE.itemsize
+    track_length_offset = POINT3D_HEADER_DTYPE.fields["track_length"][1]
+    element_size = TRACK_ELEMENT_DTYPE.itemsize
+    unpack_length = struct.Struct("<Q").unpack_from
+
+    offsets = np.empty(num_points, dtype=np.int64)
+    offset = 8
+    for i in range(num_points):
+        offsets[i] = offset
+        track_length = unpack_length(buffer, offset + track_length_offset)[0]
+        offset += header_size + element_size * track_length
+
+    raw = np.frombuffer(buffer, dtype=np.uint8)
+    header_bytes = raw[offsets[:, None] + np.arange(header_size)]
+    points = header_bytes.view(POINT3D_HEADER_DTYPE).reshape(num_points)
+
+    if not with_tracks:
+        return points
+
+    lengths = points["track_length"].astype(np.int64)
+    starts = np.repeat(offsets + header_size, lengths)
+    within = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    element_offsets = starts + within * element_size
+    track_bytes = raw[element_offsets[:, None] + np.arange(element_size)]
+    tracks = track_bytes.view(TRACK_ELEMENT_DTYPE).reshape(-1)
+
+    return points, tracks
+
+
+def read_model(model_path):
+    """
+    Lee un modelo binario de COLMAP (cameras.bin, images.bin, points3D.bin)
+    """
+    cameras, camera_params = read_cameras_binary(
+        os.path.join(model_path, "cameras.bin"))
+    images, image_names, points2D = read_images_binary(
+        os.path.join(model_path, "images.bin"))
+    points3D = read_points3D_binary(os.path.join(model_path, "points3D.bin"))
+
+    return {
+        "cameras": cameras,
+        "camera_params": camera_params,
+        "images": images,
+        "image_names": image_names,
+        "points2D": points2D,
+        "points3D": points3D
+    }
+
+
+def model_exists(model_path):
+    return all(os.path.exists(os.path.join(model_path, name))
+               for name in ("cameras.bin", "images.bin", "points3D.bin"))
+
+
+def compute_model_statistics(model_path, total_images=None):
+    """
+    Estadísticas de una reconstrucción dispersa: imágenes registradas,
+    puntos 3D, longitud media de track y error medio de reproyección
+    """
+    if not model_exists(model_path):
+        return None
+
+    cameras, _ = read_cameras_binary(os.path.join(model_path, "cameras.bin"))
+    images, _, _ = read_images_binary(os.path.join(model_path, "images.bin"))
+    points3D = read_points3D_binary(os.path.join(model_path, "points3D.bin"))
+
+    num_points = len(points3D)
+    track_lengths = points3D["track_length"]
+    registered = len(images)
+
+    stats = {
+        "cameras": len(cameras),
+        "registered_images": registered,
+        "points3D": num_points,
+        "observations": int(track_lengths.sum()) if num_points else 0,
+        "mean_track_length": round(float(track_lengths.mean()), 3) if num_points else 0.0,
+        "mean_reprojection_error": round(float(points3D["error"].mean()), 4) if num_points else 0.0,
+        "mean_observations_per_image": round(float(images["num_points3D"].mean()), 1)
+        if registered else 0.0
+    }
+    if total_images:
+        stats["total_images"] = total_images
+        stats["registration_ratio"] = round(registered / total_images, 3)
+
+    return stats
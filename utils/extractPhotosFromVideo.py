@@ -1,8 +1,11 @@
 import cv2
 import os
+import time
 import numpy as np
 from shutil import rmtree
 from tqdm import tqdm
+from utils.metrics import inc_counter
+from utils.resolutionPolicy import resolution_policy, target_size
 
 
 def calculate_frame_sharpness(frame):
@@ -60,6 +63,30 @@ def calculate_frame_quality_score(frame):
     }
 
 
+def read_frame(video, frame_idx):
+    """
+    Decodifica el frame indicado y registra el tiempo de decodificación
+    """
+    start = time.perf_counter()
+    video.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+    success, frame = video.read()
+    inc_counter("video_frame_decode_seconds_total", time.perf_counter() - start)
+    if success:
+        inc_counter("video_frames_decoded_total")
+    return success, frame
+
+
+def score_frame(frame):
+    """
+    calculate_frame_quality_score con registro de métricas
+    """
+    start = time.perf_counter()
+    result = calculate_frame_quality_score(frame)
+    inc_counter("video_frame_score_seconds_total", time.perf_counter() - start)
+    inc_counter("video_frames_scored_total")
+    return result
+
+
 def calculate_frame_similarity(frame1, frame2):
     """
     Calcula la similitud entre dos frames usando histogramas
@@ -103,10 +130,26 @@ def calculate_optimal_frame_count(duration_seconds, fps, min_frames=10, max_fram
     return int(optimal)
 
 
+def video_frame_size(video_path, force_vertical=True):
+    """
+    Tamaño (ancho, alto) de los frames tal como se guardan, o None si el
+    video no se puede abrir
+    """
+    video = cv2.VideoCapture(video_path)
+    if not video.isOpened():
+        return None
+    width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    video.release()
+    if force_vertical and width > height:
+        width, height = height, width
+    return width, height
+
+
 def extract_frames_from_video_smart(video_path, output_folder="images", num_frames=None,
                                     quality=95, min_sharpness=None, max_similarity=0.85,
                                     quality_threshold=None, force_vertical=True,
-                                    analysis_sample=0.1, debug_mode=False):
+                                    analysis_sample=0.1, debug_mode=False, quality_preset=None):
     """
     Extrae frames de un video con filtrado inteligente de calidad
 
@@ -121,6 +164,8 @@ def extract_frames_from_video_smart(video_path, output_folder="images", num_fram
         force_vertical: Forzar orientación vertical
         analysis_sample: Fracción del video a analizar para estadísticas (0.1 = 10%)
         debug_mode: Mostrar información detallada de debug
+        quality_preset: Preset de calidad cuya política de resolución se aplica
+            al guardar los frames (None para resolución completa)
     """
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
@@ -163,15 +208,14 @@ def extract_frames_from_video_smart(video_path, output_folder="images", num_fram
     quality_scores = []
 
     for frame_idx in tqdm(sample_indices, desc="Analizando muestra"):
-        video.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-        success, frame = video.read()
+        success, frame = read_frame(video, frame_idx)
 
         if success:
             if force_vertical and frame.shape[1] > frame.shape[0]:
                 frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
 
             sharpness = calculate_frame_sharpness(frame)
-            quality_score, _ = calculate_frame_quality_score(frame)
+            quality_score, _ = score_frame(frame)
 
             sharpness_values.append(sharpness)
             quality_scores.append(quality_score)
@@ -231,8 +275,7 @@ def extract_frames_from_video_smart(video_path, output_folder="images", num_fram
     frame_candidates = []
 
     for i, frame_idx in enumerate(tqdm(candidate_indices, desc="Evaluando candidatos")):
-        video.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-        success, frame = video.read()
+        success, frame = read_frame(video, frame_idx)
 
         if not success:
             continue
@@ -242,7 +285,7 @@ def extract_frames_from_video_smart(video_path, output_folder="images", num_fram
 
         # Calcular métricas de calidad
         sharpness = calculate_frame_sharpness(frame)
-        quality_score, quality_metrics = calculate_frame_quality_score(frame)
+        quality_score, quality_metrics = score_frame(frame)
 
         # Filtrar por umbrales mínimos
         if sharpness >= adaptive_min_sharpness and quality_score >= adaptive_quality_threshold:
@@ -272,8 +315,7 @@ def extract_frames_from_video_smart(video_path, output_folder="images", num_fram
             f"   🚨 Umbrales de emergencia - Nitidez: {emergency_min_sharpness:.1f}, Calidad: {emergency_quality_threshold:.3f}")
 
         for i, frame_idx in enumerate(tqdm(candidate_indices, desc="Re-evaluando con umbrales de emergencia")):
-            video.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-            success, frame = video.read()
+            success, frame = read_frame(video, frame_idx)
 
             if not success:
                 continue
@@ -282,8 +324,7 @@ def extract_frames_from_video_smart(video_path, output_folder="images", num_fram
                 frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
 
             sharpness = calculate_frame_sharpness(frame)
-            quality_score, quality_metrics = calculate_frame_quality_score(
-                frame)
+            quality_score, quality_metrics = score_frame(frame)
 
             if debug_mode and i < 10:  # Solo mostrar los primeros 10 para debug
                 print(
@@ -313,8 +354,7 @@ def extract_frames_from_video_smart(video_path, output_folder="images", num_fram
             0, total_frames - 1, min(500, total_frames), dtype=int)
 
         for frame_idx in tqdm(sample_indices_large, desc="Evaluando todos los frames disponibles"):
-            video.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-            success, frame = video.read()
+            success, frame = read_frame(video, frame_idx)
 
             if not success:
                 continue
@@ -323,8 +363,7 @@ def extract_frames_from_video_smart(video_path, output_folder="images", num_fram
                 frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
 
             sharpness = calculate_frame_sharpness(frame)
-            quality_score, quality_metrics = calculate_frame_quality_score(
-                frame)
+            quality_score, quality_metrics = score_frame(frame)
             timestamp = frame_idx / fps if fps > 0 else 0
 
             all_candidates.append({
@@ -391,6 +430,7 @@ def extract_frames_from_video_smart(video_path, output_folder="images", num_fram
 
     extracted_frames = []
     encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+    policy = resolution_policy(quality_preset, len(selected_frames)) if quality_preset else None
 
     for i, frame_data in enumerate(tqdm(selected_frames, desc="Guardando frames")):
         output_path = os.path.join(
@@ -398,7 +438,14 @@ def extract_frames_from_video_smart(video_path, output_folder="images", num_fram
             f"frame_{i+1:03d}_{frame_data['timestamp']:.2f}s_q{frame_data['quality_score']:.3f}.jpg"
         )
 
-        cv2.imwrite(output_path, frame_data['frame'], encode_params)
+        # Reducción según el presupuesto de píxeles antes de escribir el frame
+        frame = frame_data['frame']
+        frame_height, frame_width = frame.shape[:2]
+        target = target_size(frame_width, frame_height, policy)
+        if target != (frame_width, frame_height):
+            frame = cv2.resize(frame, target, interpolation=cv2.INTER_AREA)
+
+        cv2.imwrite(output_path, frame, encode_params)
         extracted_frames.append(output_path)
 
         # Debug info
@@ -421,7 +468,8 @@ def extract_frames_from_video_smart(video_path, output_folder="images", num_fram
 # Función simplificada para uso básico
 
 
-def extract_frames_smart(video_path, output_folder="images", target_frames=None, debug=False):
+def extract_frames_smart(video_path, output_folder="images", target_frames=None, debug=False,
+                         quality_preset=None):
     """
     Versión simplificada con configuración automática y más permisiva
     """
@@ -434,7 +482,8 @@ def extract_frames_smart(video_path, output_folder="images", target_frames=None,
         max_similarity=0.9,  # Permitir frames más similares
         quality_threshold=None,  # Cálculo automático
         force_vertical=True,
-        debug_mode=debug
+        debug_mode=debug,
+        quality_preset=quality_preset
     )
 
 # Función para casos problemáticos
@@ -0,0 +1,312 @@
+import os
+import sqlite3
+from PIL import Image
+from utils.pairPreselection import (preselect_image_pairs, build_query_pairs,
+                                    write_pairs_file)
+
+
+MATCHING_STRATEGIES = ("auto", "exhaustive", "sequential", "spatial", "vocab_tree",
+                       "retrieval")
+
+# Por debajo de este número de imágenes el emparejamiento exhaustivo es barato
+EXHAUSTIVE_MAX_IMAGES = 100
+
+# Ventana de vecinos temporales para frames de video
+SEQUENTIAL_OVERLAP = 10
+
+# Parámetros de cierre de lazo (loop closure) del matcher secuencial
+LOOP_DETECTION_PERIOD = 10
+LOOP_DETECTION_NUM_IMAGES = 50
+
+# Vecinos recuperados por imagen con el árbol de vocabulario
+VOCAB_TREE_NUM_IMAGES = 50
+
+# Fracción mínima de imágenes con GPS para usar emparejamiento espacial
+SPATIAL_MIN_GPS_RATIO = 0.8
+SPATIAL_MAX_NEIGHBORS = 50
+
+# Vecinos por imagen de la preselección por descriptores globales
+RETRIEVAL_NUM_NEIGHBORS = 20
+RETRIEVAL_PAIRS_PATH = "/data/match_pairs.txt"
+
+# Al añadir imágenes a una escena, por encima de este número de pares
+# nuevas x existentes se usa la preselección k-NN en lugar de todos los pares
+APPEND_MAX_QUERY_PAIRS = 5000
+
+VOCAB_TREE_PATH = os.environ.get(
+    "COLMAP_VOCAB_TREE_PATH", "/app/models/vocab_tree.bin")
+
+GPS_IFD_TAG = 0x8825
+
+
+def count_exhaustive_pairs(num_images):
+    """
+    Número de pares de un emparejamiento exhaustivo: n(n-1)/2
+    """
+    return num_images * (num_images - 1) // 2
+
+
+def count_sequential_pairs(num_images, overlap=SEQUENTIAL_OVERLAP, quadratic_overlap=True,
+                           loop_detection=False):
+    """
+    Estima el número de pares que genera el matcher secuencial de COLMAP.
+    Cada imagen se empareja con sus `overlap` sucesores y, con solapamiento
+    cuadrático, también con los sucesores a distancia 2^k
+    """
+    pairs = set()
+    for i in range(num_images):
+        for k in range(overlap):
+            j = i + k + 1
+            if j < num_images:
+                pairs.add((i, j))
+            if quadratic_overlap:
+                j = i + (1 << k)
+                if j < num_images:
+                    pairs.add((i, j))
+
+    total = len(pairs)
+    if loop_detection:
+        loop_queries = num_images // LOOP_DETECTION_PERIOD
+        total += loop_queries * min(LOOP_DETECTION_NUM_IMAGES, num_images - 1)
+
+    return min(total, count_exhaustive_pairs(num_images))
+
+
+def count_neighbor_pairs(num_images, num_neighbors):
+    """
+    Cota superior de pares cuando cada imagen se empareja con sus k vecinos más cercanos
+    """
+    return min(num_images * min(num_neighbors, max(num_images - 1, 0)),
+               count_exhaustive_pairs(num_images))
+
+
+def image_has_gps(image_path):
+    """
+    Verifica si una imagen tiene coordenadas GPS en su EXIF (sin decodificar píxeles)
+    """
+    try:
+        with Image.open(image_path) as img:
+            gps_info = img.getexif().get_ifd(GPS_IFD_TAG)
+            return bool(gps_info)
+    except Exception:
+        return False
+
+
+def calculate_gps_ratio(image_folder, image_names):
+    """
+    Fracción de imágenes del conjunto que tienen GPS en su EXIF
+    """
+    if not image_names:
+        return 0.0
+
+    with_gps = sum(1 for name in image_names
+                   if image_has_gps(os.path.join(image_folder, name)))
+    return with_gps / len(image_names)
+
+
+def choose_matching_strategy(image_folder, image_names, image_source="unknown",
+                             requested="auto"):
+    """
+    Selecciona la estrategia de emparejamiento de COLMAP para el conjunto de imágenes
+
+    Args:
+        image_folder: Carpeta con las imágenes
+        image_names: Lista de nombres de imagen del conjunto
+        image_source: Origen del conjunto ("video", "photos" o "unknown")
+        requested: Estrategia forzada por el usuario o "auto"
+
+    Returns:
+        dict con la estrategia, el motivo de la elección y los pares estimados
+    """
+    num_images = len(image_names)
+    has_vocab_tree = os.path.exists(VOCAB_TREE_PATH)
+
+    if requested not in MATCHING_STRATEGIES:
+        raise ValueError(
+            f"Estrategia de emparejamiento no válida: {requested}. "
+            f"Opciones: {', '.join(MATCHING_STRATEGIES)}")
+
+    if requested != "auto":
+        strategy = requested
+        reason = "Estrategia especificada por parámetro"
+    elif image_source == "video":
+        strategy = "sequential"
+        reason = "Frames de video con orden temporal conocido"
+    elif num_images <= EXHAUSTIVE_MAX_IMAGES:
+        strategy = "exhaustive"
+        reason = f"Conjunto pequeño ({num_images} <= {EXHAUSTIVE_MAX_IMAGES} imágenes)"
+    elif calculate_gps_ratio(image_folder, image_names) >= SPATIAL_MIN_GPS_RATIO:
+        strategy = "spatial"
+        reason = "Conjunto grande sin orden con coordenadas GPS en EXIF"
+    elif has_vocab_tree:
+        strategy = "vocab_tree"
+        reason = "Conjunto grande sin orden, recuperación por árbol de vocabulario"
+    else:
+        strategy = "retrieval"
+        reason = "Conjunto grande sin orden, preselección de pares por descriptores globales"
+
+    if strategy == "vocab_tree" and not has_vocab_tree:
+        raise ValueError(
+            f"No se encontró el árbol de vocabulario en {VOCAB_TREE_PATH}")
+
+    loop_detection = strategy == "sequential" and has_vocab_tree
+
+    if strategy == "sequential":
+        estimated_pairs = count_sequential_pairs(
+            num_images, loop_detection=loop_detection)
+    elif strategy == "vocab_tree":
+        estimated_pairs = count_neighbor_pairs(
+            num_images, VOCAB_TREE_NUM_IMAGES)
+    elif strategy == "spatial":
+        estimated_pairs = count_neighbor_pairs(
+            num_images, SPATIAL_MAX_NEIGHBORS)
+    elif strategy == "retrieval":
+        estimated_pairs = count_neighbor_pairs(
+            num_images, RETRIEVAL_NUM_NEIGHBORS)
+    else:
+        estimated_pairs = count_exhaustive_pairs(num_images)
+
+    return {
+        "strategy": strategy,
+        "reason": reason,
+        "loop_detection": loop_detection,
+        "num_images": num_images,
+        "estimated_pairs": estimated_pairs,
+        "exhaustive_pairs": count_exhaustive_pairs(num_images)
+    }
+
+
+def prepare_matching(matching_info, image_folder, image_names):
+    """
+    Ejecuta los pasos previos que necesita la estrategia elegida.
+    Para "retrieval" genera la lista de pares k-NN que consume matches_importer
+    """
+    if matching_info["strategy"] == "retrieval":
+        preselection = preselect_image_pairs(
+            image_folder, image_names, RETRIEVAL_PAIRS_PATH,
+            num_neighbors=RETRIEVAL_NUM_NEIGHBORS)
+        matching_info.update(preselection)
+        matching_info["estimated_pairs"] = preselection["preselected_pairs"]
+
+    return matching_info
+
+
+def prepare_append_matching(image_folder, image_names, new_image_names,
+                            pairs_path=RETRIEVAL_PAIRS_PATH):
+    """
+    Genera la lista de pares para emparejar solo las imágenes nuevas de una
+    escena contra el resto (y entre sí), sin repetir los pares ya emparejados
+
+    Returns:
+        dict de emparejamiento con estrategia "append" (usa matches_importer)
+    """
+    image_names = sorted(image_names)
+    new_set = set(new_image_names)
+    query_indices = [i for i, name in enumerate(
+        image_names) if name in new_set]
+    all_query_pairs = build_query_pairs(len(image_names), query_indices)
+
+    if len(all_query_pairs) <= APPEND_MAX_QUERY_PAIRS:
+        write_pairs_file(image_names, all_query_pairs, pairs_path)
+        num_pairs = int(len(all_query_pairs))
+        reason = "Imágenes nuevas contra todas las de la escena"
+    else:
+        preselection = preselect_image_pairs(
+            image_folder, image_names, pairs_path,
+            num_neighbors=RETRIEVAL_NUM_NEIGHBORS, query_names=new_image_names)
+        num_pairs = preselection["preselected_pairs"]
+        reason = "Imágenes nuevas contra sus vecinos por descriptores globales"
+
+    return {
+        "strategy": "append",
+        "reason": reason,
+        "loop_detection": False,
+        "num_images": len(image_names),
+        "new_images": len(query_indices),
+        "estimated_pairs": num_pairs,
+        "exhaustive_pairs": count_exhaustive_pairs(len(image_names)),
+        "pairs_path": pairs_path
+    }
+
+
+def build_matching_command(matching_info, database_path="/data/database.db"):
+    """
+    Construye el comando de COLMAP para la estrategia de emparejamiento elegida
+    """
+    strategy = matching_info["strategy"]
+
+    if strategy == "sequential":
+        cmd = [
+            "colmap", "sequential_matcher",
+            "--database_path", database_path,
+            "--SiftMatching.use_gpu", "1",
+            "--SequentialMatching.overlap", str(SEQUENTIAL_OVERLAP),
+            "--SequentialMatching.quadratic_overlap", "1"
+        ]
+        if matching_info.get("loop_detection"):
+            cmd += [
+                "--SequentialMatching.loop_detection", "1",
+                "--SequentialMatching.loop_detection_period", str(
+                    LOOP_DETECTION_PERIOD),
+                "--SequentialMatching.loop_detection_num_images", str(
+                    LOOP_DETECTION_NUM_IMAGES),
+                "--SequentialMatching.vocab_tree_path", VOCAB_TREE_PATH
+            ]
+    elif strategy == "vocab_tree":
+        cmd = [
+            "colmap", "vocab_tree_matcher",
+            "--database_path", database_path,
+            "--SiftMatching.use_gpu", "1",
+            "--VocabTreeMatching.vocab_tree_path", VOCAB_TREE_PATH,
+            "--VocabTreeMatching.num_images", str(VOCAB_TREE_NUM_IMAGES)
+        ]
+    elif strategy == "spatial":
+        cmd = [
+            "colmap", "spatial_matcher",
+            "--database_path", database_path,
+            "--SiftMatching.use_gpu", "1",
+            "--SpatialMatching.max_num_neighbors", str(SPATIAL_MAX_NEIGHBORS)
+        ]
+    elif strategy in ("retrieval", "append"):
+        cmd = [
+            "colmap", "matches_importer",
+            "--database_path", database_path,
+            "--match_list_path", matching_info.get(
+                "pairs_path", RETRIEVAL_PAIRS_PATH),
+            "--match_type", "pairs",
+            "--SiftMatching.use_gpu", "1"
+        ]
+    else:
+        cmd = [
+            "colmap", "exhaustive_matcher",
+            "--database_path", database_path,
+            "--SiftMatching.use_gpu", "1"
+        ]
+
+    return cmd
+
+
+def count_database_pairs(database_path="/data/database.db"):
+    """
+    Cuenta los pares emparejados y verificados geométricamente en la base de datos de COLMAP
+    """
+    if not os.path.exists(database_path):
+        return None
+
+    try:
+        connection = sqlite3.connect(database_path)
+        try:
+            matched = connection.execute(
+                "SELECT COUNT(*) FROM matches WHERE rows > 0").fetchone()[0]
+            verified = connection.execute(
+                "SELECT COUNT(*) FROM two_view_geometries WHERE rows > 0").fetchone()[0]
+        finally:
+            connection.close()
+    except sqlite3.Error as e:
+        print(f"Error leyendo pares de la base de datos: {e}")
+        return None
+
+    return {
+        "matched_pairs": matched,
+        "verified_pairs": verified
+    }
@@ -0,0 +1,217 @@
+import hashlib
+import os
+import sqlite3
+import numpy as np
+
+
+FEATURE_STORE_DIR = os.environ.get("FEATURE_STORE_DIR", "/data/cache/features")
+
+# Tamaño máximo del almacén antes de expulsar las entradas menos usadas
+FEATURE_STORE_MAX_BYTES = int(os.environ.get(
+    "FEATURE_STORE_MAX_MB", "2048")) * 1024 * 1024
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_image_content(image_path):
+    """
+    Calcula el hash SHA-256 del contenido de una imagen
+    """
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extraction_options_key(extraction_options):
+    """
+    Clave estable para un conjunto de opciones de extracción de COLMAP.
+    Features extraídas con opciones distintas nunca se mezclan
+    """
+    joined = "\0".join(str(option) for option in extraction_options)
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()[:16]
+
+
+def feature_entry_path(content_hash, options_key, store_dir=FEATURE_STORE_DIR):
+    return os.path.join(store_dir, options_key, content_hash[:2], f"{content_hash}.npz")
+
+
+def plan_feature_extraction(image_folder, image_names, extraction_options,
+                            store_dir=FEATURE_STORE_DIR):
+    """
+    Separa las imágenes en las que ya tienen features en el almacén y las que
+    hay que extraer con COLMAP
+
+    Returns:
+        dict con la clave de opciones, el hash de cada imagen y las listas
+        "cached" y "missing"
+    """
+    options_key = extraction_options_key(extraction_options)
+    hashes = {}
+    cached = []
+    missing = []
+
+    for name in image_names:
+        content_hash = hash_image_content(os.path.join(image_folder, name))
+        hashes[name] = content_hash
+        if os.path.exists(feature_entry_path(content_hash, options_key, store_dir)):
+            cached.append(name)
+        else:
+            missing.append(name)
+
+    return {
+        "options_key": options_key,
+        "store_dir": store_dir,
+        "hashes": hashes,
+        "cached": cached,
+        "missing": missing
+    }
+
+
+def write_import_stubs(image_names, import_folder):
+    """
+    Escribe archivos de features vacíos para las imágenes en caché.
+    `colmap feature_importer` los usa para registrar cámaras e imágenes en la
+    base de datos; los keypoints y descriptores reales se escriben después
+    directamente con write_cached_features
+    """
+    os.makedirs(import_folder, exist_ok=True)
+    for name in image_names:
+        stub_path = os.path.join(import_folder, f"{name}.txt")
+        os.makedirs(os.path.dirname(stub_path), exist_ok=True)
+        with open(stub_path, "w") as file:
+            file.write("0 128\n")
+
+
+def _read_image_ids(connection):
+    return {name: image_id for image_id, name in
+            connection.execute("SELECT image_id, name FROM images")}
+
+
+def _write_blob(connection, table, image_id, array):
+    rows, cols = array.shape
+    data = np.ascontiguousarray(array).tobytes()
+    updated = connection.execute(
+        f"UPDATE {table} SET rows = ?, cols = ?, data = ? WHERE image_id = ?",
+        (rows, cols, data, image_id)).rowcount
+    if updated == 0:
+        connection.execute(
+            f"INSERT INTO {table} (image_id, rows, cols, data) VALUES (?, ?, ?, ?)",
+            (image_id, rows, cols, data))
+
+
+def write_cached_features(database_path, plan):
+    """
+    Copia keypoints y descriptores del almacén a la base de datos de COLMAP
+
+    Returns:
+        Número de imágenes restauradas desde el almacén
+    """
+    restored = 0
+    connection = sqlite3.connect(database_path)
+    try:
+        image_ids = _read_image_ids(connection)
+        for name in plan["cached"]:
+            image_id = image_ids.get(name)
+            entry_path = feature_entry_path(
+                plan["hashes"][name], plan["options_key"], plan["store_dir"])
+            if image_id is None or not os.path.exists(entry_path):
+                continue
+
+            with np.load(entry_path) as entry:
+                _write_blob(connection, "keypoints",
+                            image_id, entry["keypoints"])
+                _write_blob(connection, "descriptors",
+                            image_id, entry["descriptors"])
+
+            # Marcar la entrada como usada recientemente para la expulsión LRU
+            os.utime(entry_path)
+            restored += 1
+
+        connection.commit()
+    finally:
+        connection.close()
+
+    return restored
+
+
+def store_extracted_features(database_path, plan):
+    """
+    Guarda en el almacén las features recién extraídas por COLMAP
+
+    Returns:
+        Número de imágenes añadidas al almacén
+    """
+    stored = 0
+    connection = sqlite3.connect(database_path)
+    try:
+        image_ids = _read_image_ids(connection)
+        for name in plan["missing"]:
+            image_id = image_ids.get(name)
+            if image_id is None:
+                continue
+
+            keypoints_row = connection.execute(
+                "SELECT rows, cols, data FROM keypoints WHERE image_id = ?", (image_id,)).fetchone()
+            descriptors_row = connection.execute(
+                "SELECT rows, cols, data FROM descriptors WHERE image_id = ?", (image_id,)).fetchone()
+            if keypoints_row is None or descriptors_row is None or keypoints_row[0] == 0:
+                continue
+
+            rows, cols, data = keypoints_row
+            keypoints = np.frombuffer(
+                data, dtype=np.float32).reshape(rows, cols)
+            rows, cols, data = descriptors_row
+            descriptors = np.frombuffer(
+                data, dtype=np.uint8).reshape(rows, cols)
+
+            entry_path = feature_entry_path(
+                plan["hashes"][name], plan["options_key"], plan["store_dir"])
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            temp_path = f"{entry_path}.tmp"
+            with open(temp_path, "wb") as file:
+                np.savez(file, keypoints=keypoints, descriptors=descriptors)
+            os.replace(temp_path, entry_path)
+            stored += 1
+    finally:
+        connection.close()
+
+    return stored
+
+
+def evict_feature_store(store_dir=FEATURE_STORE_DIR, max_bytes=FEATURE_STORE_MAX_BYTES):
+    """
+    Elimina las entradas usadas hace más tiempo hasta que el almacén quede bajo el límite
+
+    Returns:
+        dict con el tamaño final del almacén y las entradas eliminadas
+    """
+    entries = []
+    for root, _, files in os.walk(store_dir):
+        for file in files:
+            path = os.path.join(root, file)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    evicted = 0
+
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total_bytes -= size
+            evicted += 1
+        except OSError as e:
+            print(f"Error eliminando entrada del almacén de features {path}: {e}")
+
+    return {
+        "store_size_bytes": total_bytes,
+        "store_size_mb": round(total_bytes / (1024 * 1024), 2),
+        "evicted_entries": evicted
+    }
@@ -0,0 +1,208 @@
+import os
+import struct
+import threading
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif')
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Marcadores SOF de JPEG (C4, C8 y CC no son SOF: DHT, JPG y DAC)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Marcadores sin segmento de longitud: TEM, RST0-7 y SOI
+JPEG_STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+
+# Etiquetas TIFF / EXIF
+TIFF_IMAGE_WIDTH = 0x0100
+TIFF_IMAGE_LENGTH = 0x0101
+TIFF_ORIENTATION = 0x0112
+TIFF_SHORT = 3
+TIFF_LONG = 4
+
+_lock = threading.Lock()
+_indexes = {}
+
+
+def _read_exact(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("Cabecera de imagen truncada")
+    return data
+
+
+def _read_tiff_tags(file, base):
+    """
+    Lee las etiquetas de tipo SHORT/LONG del primer IFD de una estructura TIFF
+    que empieza en la posición base del archivo (un TIFF o el bloque EXIF de un JPEG)
+    """
+    file.seek(base)
+    header = _read_exact(file, 8)
+    if header[:4] == b"II*\x00":
+        order = "<"
+    elif header[:4] == b"MM\x00*":
+        order = ">"
+    else:
+        raise ValueError("Cabecera TIFF no reconocida")
+
+    file.seek(base + struct.unpack(order + "I", header[4:])[0])
+    count = struct.unpack(order + "H", _read_exact(file, 2))[0]
+    entries = _read_exact(file, 12 * count)
+    tags = {}
+    for i in range(count):
+        tag, kind, values, value = struct.unpack(order + "HHI4s", entries[12 * i:12 * i + 12])
+        if values != 1:
+            continue
+        if kind == TIFF_SHORT:
+            tags[tag] = struct.unpack(order + "H", value[:2])[0]
+        elif kind == TIFF_LONG:
+            tags[tag] = struct.unpack(order + "I", value)[0]
+    return tags
+
+
+def _probe_jpeg(file):
+    width = height = None
+    orientation = 1
+    file.seek(2)
+    while True:
+        # Los marcadores pueden ir precedidos de bytes de relleno 0xFF
+        byte = _read_exact(file, 1)
+        if byte != b"\xff":
+            continue
+        marker = _read_exact(file, 1)[0]
+        while marker == 0xFF:
+            marker = _read_exact(file, 1)[0]
+        if marker in JPEG_STANDALONE_MARKERS or marker == 0x00:
+            continue
+        if marker in (0xD9, 0xDA):
+            # Fin de imagen o inicio de los datos comprimidos: no hay más cabeceras
+            break
+
+        length = struct.unpack(">H", _read_exact(file, 2))[0]
+        segment_end = file.tell() + length - 2
+        if marker in JPEG_SOF_MARKERS:
+            _, height, width = struct.unpack(">BHH", _read_exact(file, 5))
+            break
+        if marker == 0xE1 and _read_exact(file, 6) == b"Exif\x00\x00":
+            try:
+                orientation = _read_tiff_tags(file, file.tell()).get(TIFF_ORIENTATION, 1)
+            except (ValueError, struct.error):
+                pass
+        file.seek(segment_end)
+
+    if not width or not height:
+        return None
+    return {"format": "jpeg", "width": width, "height": height, "orientation": orientation}
+
+
+def _probe_png(file):
+    file.seek(8)
+    length, chunk, width, height = struct.unpack(">I4sII", _read_exact(file, 16))
+    if chunk != b"IHDR":
+        return None
+    return {"format": "png", "width": width, "height": height, "orientation": 1}
+
+
+def _probe_tiff(file):
+    tags = _read_tiff_tags(file, 0)
+    if TIFF_IMAGE_WIDTH not in tags or TIFF_IMAGE_LENGTH not in tags:
+        return None
+    return {"format": "tiff", "width": tags[TIFF_IMAGE_WIDTH],
+            "height": tags[TIFF_IMAGE_LENGTH], "orientation": tags.get(TIFF_ORIENTATION, 1)}
+
+
+def _probe_bmp(file):
+    file.seek(14)
+    header_size = struct.unpack("<I", _read_exact(file, 4))[0]
+    if header_size == 12:
+        width, height = struct.unpack("<HH", _read_exact(file, 4))
+    else:
+        width, height = struct.unpack("<ii", _read_exact(file, 8))
+    # Altura negativa: filas almacenadas de arriba abajo
+    return {"format": "bmp", "width": width, "height": abs(height), "orientation": 1}
+
+
+def probe_image_stream(file):
+    """
+    Como probe_image, sobre un archivo binario ya abierto y posicionable
+    (p. ej. un io.BytesIO con un miembro de un ZIP)
+    """
+    try:
+        file.seek(0)
+        signature = file.read(8)
+        if signature[:2] == b"\xff\xd8":
+            return _probe_jpeg(file)
+        if signature == PNG_SIGNATURE:
+            return _probe_png(file)
+        if signature[:4] in (b"II*\x00", b"MM\x00*"):
+            return _probe_tiff(file)
+        if signature[:2] == b"BM":
+            return _probe_bmp(file)
+    except (OSError, ValueError, struct.error):
+        pass
+    return None
+
+
+def probe_image(path):
+    """
+    Formato, dimensiones y orientación EXIF de una imagen leyendo solo sus
+    cabeceras (SOF de JPEG, IHDR de PNG, IFD de TIFF), sin decodificarla.
+    Las dimensiones son las almacenadas, sin aplicar la orientación
+
+    Returns:
+        dict con format, width, height y orientation, o None si no se reconoce
+    """
+    try:
+        with open(path, "rb") as file:
+            return probe_image_stream(file)
+    except OSError:
+        return None
+
+
+def directory_index(folder, extensions=IMAGE_EXTENSIONS):
+    """
+    Metadatos (tamaño, fecha de modificación, formato y dimensiones) de las
+    imágenes de una carpeta. El índice se conserva en memoria mientras no
+    cambie la fecha de modificación de la carpeta; al cambiar solo se vuelven
+    a leer los archivos nuevos o con otro tamaño o fecha
+
+    Reescribir una imagen en su sitio no cambia la fecha de la carpeta y no se
+    detecta: la ingesta y la poda siempre crean o borran archivos
+
+    Returns:
+        dict nombre -> metadatos, vacío si la carpeta no existe
+    """
+    try:
+        stat = os.stat(folder)
+    except OSError:
+        return {}
+    key = (stat.st_ino, stat.st_mtime_ns)
+
+    with _lock:
+        cached = _indexes.get(folder)
+        if cached is None or cached["key"] != key:
+            previous = cached["entries"] if cached else {}
+            entries = {}
+            with os.scandir(folder) as scan:
+                for entry in scan:
+                    if not entry.name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+                        continue
+                    file_stat = entry.stat()
+                    known = previous.get(entry.name)
+                    if known and known["size"] == file_stat.st_size and \
+                            known["mtime_ns"] == file_stat.st_mtime_ns:
+                        entries[entry.name] = known
+                        continue
+                    probe = probe_image(entry.path) or {}
+                    entries[entry.name] = {
+                        "size": file_stat.st_size,
+                        "mtime_ns": file_stat.st_mtime_ns,
+                        "format": probe.get("format"),
+                        "width": probe.get("width"),
+                        "height": probe.get("height"),
+                        "orientation": probe.get("orientation")
+                    }
+            cached = _indexes[folder] = {"key": key, "entries": entries}
+
+    return {name: dict(entry) for name, entry in cached["entries"].items()
+            if name.lower().endswith(extensions)}
+
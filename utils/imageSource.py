@@ -0,0 +1,64 @@
+import json
+import os
+
+
+IMAGE_SOURCE_PATH = "/data/images_source.json"
+
+
+def save_image_source(source, path=IMAGE_SOURCE_PATH, **metadata):
+    """
+    Registra el origen del conjunto de imágenes en /data/images
+
+    Args:
+        source: "video" (frames con orden temporal) o "photos" (colección sin orden)
+        path: Ruta del archivo de metadatos
+        **metadata: Información adicional del origen (fps, número de frames, etc.)
+    """
+    info = {"source": source}
+    info.update(metadata)
+
+    with open(path, "w") as file:
+        json.dump(info, file)
+
+    return info
+
+
+def load_image_source(path=IMAGE_SOURCE_PATH):
+    """
+    Lee el origen del conjunto de imágenes actual.
+    Retorna {"source": "unknown"} si no hay información registrada
+    """
+    if not os.path.exists(path):
+        return {"source": "unknown"}
+
+    try:
+        with open(path, "r") as file:
+            info = json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Error leyendo origen de imágenes: {e}")
+        return {"source": "unknown"}
+
+    if "source" not in info:
+        info["source"] = "unknown"
+    return info
+
+
+def record_working_resolution(policy, path=IMAGE_SOURCE_PATH):
+    """
+    Guarda junto al origen la política de resolución aplicada al ingerir. Al
+    añadir fotos a una escena se conserva la de la escena, para que las
+    nuevas se reduzcan igual
+
+    Args:
+        policy: Política de resolución (resolution_policy), o dict con la
+            reducción manual aplicada
+    """
+    info = load_image_source(path)
+    working_resolution = info.get("working_resolution") or {}
+    working_resolution.setdefault("policy", policy)
+    info["working_resolution"] = working_resolution
+
+    with open(path, "w") as file:
+        json.dump(info, file)
+
+    return working_resolution
@@ -0,0 +1,305 @@
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from utils.metrics import inc_counter, register_gauge
+
+
+# Todas las etapas comparten /data, así que solo se ejecuta un trabajo a la vez
+JOB_WORKERS = 1
+
+# Segundos entre SIGTERM y SIGKILL al cancelar un proceso
+CANCEL_GRACE_SECONDS = float(os.environ.get("JOB_CANCEL_GRACE_SECONDS", "10"))
+
+# Trabajos terminados que se conservan en el registro
+MAX_FINISHED_JOBS = 50
+
+# Eventos de progreso que se conservan por trabajo
+MAX_JOB_EVENTS = 500
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_jobs = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    """
+    El trabajo en curso fue cancelado por el usuario
+    """
+
+
+def _prune_finished_jobs():
+    finished = sorted((job for job in _jobs.values() if job["status"] not in ACTIVE_STATUSES),
+                      key=lambda job: job["finished_at"])
+    for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job["id"]]
+
+
+def create_job(kind):
+    """
+    Registra un trabajo nuevo en estado "queued"
+    """
+    job = {
+        "id": uuid.uuid4().hex[:12],
+        "kind": kind,
+        "status": "queued",
+        "steps": [],
+        "events": deque(maxlen=MAX_JOB_EVENTS),
+        "event_seq": 0,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "error": None,
+        "predicted_finish_at": None,
+        "result": None,
+        "cancel_requested": False,
+        "process": None,
+        "future": None
+    }
+    with _lock:
+        _prune_finished_jobs()
+        _jobs[job["id"]] = job
+    return job
+
+
+def result_outcome(result):
+    """
+    Estado final de un trabajo según lo que devuelve su función. Las
+    respuestas de error (p. ej. el JSONResponse 422 del control de calidad o
+    el 500 de un fallo del pipeline) cuentan como fallo, no como éxito
+
+    Returns:
+        (estado, mensaje de error o None)
+    """
+    status_code = getattr(result, "status_code", None)
+    if status_code is not None:
+        if status_code < 400:
+            return "succeeded", None
+        try:
+            content = json.loads(result.body)
+        except (AttributeError, ValueError):
+            content = {}
+    elif isinstance(result, dict):
+        content = result
+        if content.get("success", True):
+            return "succeeded", None
+    else:
+        return "succeeded", None
+
+    status = "cancelled" if content.get("cancelled") else "failed"
+    return status, content.get("error") or content.get("message") or "El trabajo terminó con errores"
+
+
+def submit_job(job, function, *args, **kwargs):
+    """
+    Encola la función en el worker de trabajos. Dentro de ella current_job()
+    devuelve el trabajo, lo que permite a run_command registrar sus procesos
+
+    Returns:
+        concurrent.futures.Future con el resultado de la función
+    """
+    def run():
+        with _lock:
+            if job["cancel_requested"]:
+                job["status"] = "cancelled"
+                job["finished_at"] = time.time()
+                inc_counter("jobs_finished_total", kind=job["kind"], status="cancelled")
+                raise JobCancelled("Trabajo cancelado antes de empezar")
+            job["status"] = "running"
+            job["started_at"] = time.time()
+
+        _local.job = job
+        try:
+            result = function(*args, **kwargs)
+            job["result"] = result
+            status, error = result_outcome(result)
+            if job["cancel_requested"]:
+                status = "cancelled"
+            job["error"] = error
+            return result
+        except JobCancelled:
+            status = "cancelled"
+            raise
+        except Exception as e:
+            status = "failed"
+            job["error"] = str(e)
+            raise
+        finally:
+            _local.job = None
+            with _lock:
+                job["status"] = status
+                job["finished_at"] = time.time()
+                job["process"] = None
+            inc_counter("jobs_finished_total", kind=job["kind"], status=status)
+
+    job["future"] = _executor.submit(run)
+    return job["future"]
+
+
+def current_job():
+    return getattr(_local, "job", None)
+
+
+def get_job(job_id):
+    return _jobs.get(job_id)
+
+
+def list_jobs():
+    with _lock:
+        return sorted(_jobs.values(), key=lambda job: job["created_at"], reverse=True)
+
+
+def job_summary(job):
+    """
+    Vista serializable del trabajo, con la etapa en curso
+    """
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "stage": job["steps"][-1] if job["steps"] else None,
+        "steps_completed": list(job["steps"]),
+        "cancel_requested": job["cancel_requested"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "elapsed_seconds": round((job["finished_at"] or time.time()) - job["started_at"], 2)
+        if job["started_at"] else None,
+        "eta_seconds": round(max(0.0, job["predicted_finish_at"] - time.time()))
+        if job["predicted_finish_at"] and job["status"] == "running" else None,
+        "error": job["error"]
+    }
+
+
+def publish_event(job, event):
+    """
+    Añade un evento de progreso al trabajo, numerado y con la etapa en curso
+    """
+    with _lock:
+        job["event_seq"] += 1
+        job["events"].append({
+            "seq": job["event_seq"],
+            "time": time.time(),
+            "stage": job["steps"][-1] if job["steps"] else None,
+            **event
+        })
+
+
+def events_since(job, seq):
+    """
+    Eventos del trabajo posteriores al número de secuencia indicado
+    """
+    with _lock:
+        return [event for event in job["events"] if event["seq"] > seq]
+
+
+def check_cancelled():
+    """
+    Lanza JobCancelled si se pidió cancelar el trabajo en curso
+    """
+    job = current_job()
+    if job is not None and job["cancel_requested"]:
+        raise JobCancelled("Trabajo cancelado por el usuario")
+
+
+def terminate_process_group(process, grace_seconds=CANCEL_GRACE_SECONDS):
+    """
+    Termina el grupo de procesos completo: SIGTERM y, si sigue vivo tras el
+    periodo de gracia, SIGKILL
+    """
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        process.wait(timeout=grace_seconds)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def attach_process(process):
+    """
+    Asocia el proceso al trabajo en curso. Si ya se pidió la cancelación,
+    el proceso se termina inmediatamente
+    """
+    job = current_job()
+    if job is None:
+        return
+    with _lock:
+        job["process"] = process
+        cancelled = job["cancel_requested"]
+    if cancelled:
+        terminate_process_group(process)
+
+
+def detach_process():
+    job = current_job()
+    if job is not None:
+        with _lock:
+            job["process"] = None
+
+
+def cancel_job(job_id):
+    """
+    Pide la cancelación de un trabajo. Si hay un proceso de COLMAP/OpenMVS en
+    curso se termina todo su grupo; el pipeline se detiene en cuanto vuelve
+
+    Returns:
+        El trabajo, o None si no existe
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        if job["status"] not in ACTIVE_STATUSES:
+            return job
+        job["cancel_requested"] = True
+        process = job["process"]
+
+    if process is not None:
+        threading.Thread(target=terminate_process_group, args=(process,),
+                         daemon=True).start()
+    return job
+
+
+def cancel_active_jobs(timeout=CANCEL_GRACE_SECONDS + 30):
+    """
+    Cancela todos los trabajos pendientes o en curso y espera a que terminen,
+    para que el espacio de trabajo quede libre
+
+    Returns:
+        Número de trabajos cancelados
+    """
+    active = [job for job in list_jobs() if job["status"] in ACTIVE_STATUSES]
+    for job in active:
+        cancel_job(job["id"])
+    futures = [job["future"] for job in active if job["future"] is not None]
+    if futures:
+        wait(futures, timeout=timeout)
+    return len(active)
+
+
+def _jobs_by_status(status):
+    with _lock:
+        counts = {}
+        for job in _jobs.values():
+            if job["status"] == status:
+                counts[job["kind"]] = counts.get(job["kind"], 0) + 1
+    return [({"kind": kind}, count) for kind, count in counts.items()] or [({}, 0)]
+
+
+register_gauge("jobs_queue_depth", "Trabajos en cola esperando al worker",
+               lambda: _jobs_by_status("queued"))
+register_gauge("jobs_active", "Trabajos en ejecución",
+               lambda: _jobs_by_status("running"))
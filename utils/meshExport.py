@@ -0,0 +1,353 @@
+import mmap
+import os
+import time
+import cv2
+import numpy as np
+from utils.meshProcessing import cluster_to_budget, label_connected_components
+from utils.meshStatistics import obj_line_table, parse_obj_lines, decode_line
+from utils.sparsePreview import write_glb_container, COLMAP_TO_GLTF
+
+
+# Niveles de detalle: (fracción de caras, escala de las texturas). El nivel 0
+# es la malla completa con las texturas originales
+LOD_LEVELS = [(1.0, 1.0), (0.25, 0.5), (0.0625, 0.25)]
+
+# No se generan niveles con menos caras que esto
+MIN_LOD_FACES = 2000
+
+# Calidad de las texturas reducidas
+TEXTURE_JPEG_QUALITY = 90
+
+LOD_PATH_TEMPLATE = "/data/scene_lod{level}.glb"
+
+QUANTIZATION_MAX = 65535
+
+# Tipos de componente y destinos de bufferView de glTF
+GLTF_UNSIGNED_SHORT = 5123
+GLTF_UNSIGNED_INT = 5125
+GLTF_ARRAY_BUFFER = 34962
+GLTF_ELEMENT_ARRAY_BUFFER = 34963
+
+
+def read_textured_obj(path):
+    """
+    Lee un OBJ texturizado (triángulos con coordenadas de textura) mapeando el
+    archivo en memoria y clasificando las líneas con operaciones vectorizadas
+
+    Returns:
+        dict con positions, uvs, faces, uv_faces, face_materials,
+        material_names y mtllib
+    """
+    with open(path, "rb") as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        data = np.frombuffer(mapped, dtype=np.uint8)
+        starts, ends = obj_line_table(data)
+        first = data[starts]
+        second = data[np.minimum(starts + 1, len(data) - 1)]
+        is_space = (second == ord(" ")) | (second == ord("\t"))
+
+        vertex_lines = (first == ord("v")) & is_space
+        uv_lines = (first == ord("v")) & (second == ord("t"))
+        face_lines = (first == ord("f")) & is_space
+        material_lines = np.flatnonzero(first == ord("u"))
+        library_lines = np.flatnonzero(first == ord("m"))
+
+        positions = parse_obj_lines(data, starts[vertex_lines], ends[vertex_lines], 1)
+        uvs = parse_obj_lines(data, starts[uv_lines], ends[uv_lines], 2)
+        if len(uvs):
+            # "vt u v" o "vt u v w"
+            uv_components = len(decode_line(
+                data, starts[uv_lines][0], ends[uv_lines][0]).split()) - 1
+            uvs = uvs.reshape(-1, uv_components)[:, :2]
+
+        face_starts = starts[face_lines]
+        if len(face_starts) == 0:
+            raise ValueError(f"El OBJ no tiene caras: {path}")
+        sample = decode_line(data, face_starts[0], ends[face_lines][0]).split()[1:]
+        if len(sample) != 3 or "/" not in sample[0] or "//" in sample[0]:
+            raise ValueError("Solo se admiten triángulos con coordenadas de textura (v/vt)")
+        per_corner = len(sample[0].split("/"))
+        values = parse_obj_lines(data, face_starts, ends[face_lines], 1)
+        if len(values) != len(face_starts) * 3 * per_corner:
+            raise ValueError("El OBJ tiene caras que no son triángulos")
+        corners = values.astype(np.int64).reshape(-1, 3, per_corner) - 1
+
+        # Material de cada cara: el último "usemtl" anterior
+        material_starts = starts[material_lines]
+        material_names = [decode_line(data, start, ends[line]).split(maxsplit=1)[-1]
+                          for start, line in zip(material_starts, material_lines)]
+        face_materials = np.searchsorted(material_starts, face_starts) - 1
+        mtllib = next((decode_line(data, starts[line], ends[line]).split(maxsplit=1)[-1]
+                       for line in library_lines
+                       if decode_line(data, starts[line], ends[line]).startswith("mtllib")), None)
+        del data
+
+    # Materiales repetidos en varios bloques "usemtl"
+    unique_names = list(dict.fromkeys(material_names))
+    remap = np.array([unique_names.index(name) for name in material_names] + [-1])
+    return {
+        "positions": positions.reshape(-1, 3),
+        "uvs": uvs.reshape(-1, 2),
+        "faces": corners[:, :, 0],
+        "uv_faces": corners[:, :, 1],
+        "face_materials": remap[face_materials],
+        "material_names": unique_names,
+        "mtllib": mtllib
+    }
+
+
+def read_mtl_textures(mtl_path):
+    """
+    Textura difusa (map_Kd) de cada material de un MTL
+    """
+    textures = {}
+    current = None
+    if not mtl_path or not os.path.exists(mtl_path):
+        return textures
+    folder = os.path.dirname(mtl_path)
+    with open(mtl_path, "r", errors="replace") as file:
+        for line in file:
+            tokens = line.strip().split(maxsplit=1)
+            if len(tokens) < 2:
+                continue
+            if tokens[0] == "newmtl":
+                current = tokens[1]
+            elif tokens[0] == "map_Kd" and current is not None:
+                textures[current] = os.path.join(folder, tokens[1].split()[-1])
+    return textures
+
+
+def texture_charts(mesh):
+    """
+    Carta de textura de cada cara: caras unidas por coordenadas de textura
+    iguales dentro del mismo material. OpenMVS escribe coordenadas propias
+    para cada cara, así que primero se sueldan las que coinciden
+
+    Returns:
+        array con la carta de cada cara
+    """
+    corner_keys = np.column_stack([np.repeat(mesh["face_materials"], 3),
+                                   mesh["uvs"][mesh["uv_faces"].reshape(-1)]])
+    _, welded = np.unique(corner_keys, axis=0, return_inverse=True)
+    welded = welded.reshape(-1, 3)
+    labels = label_connected_components(int(welded.max()) + 1, welded)
+    return labels[welded[:, 0]]
+
+
+def decimate_textured_mesh(mesh, face_budget):
+    """
+    Decima por agrupamiento de vértices. Cada celda de la rejilla tiene una
+    posición común (sin grietas) y una coordenada de textura por cada carta
+    que la toca: la media de las de esa carta en la celda, para no mezclar
+    zonas distintas de la textura
+    """
+    if len(mesh["faces"]) <= face_budget:
+        return mesh
+    cluster, positions, kept = cluster_to_budget(mesh["positions"], mesh["faces"], face_budget)
+    faces = cluster[mesh["faces"][kept]]
+
+    corner_charts = np.repeat(texture_charts(mesh)[kept], 3)
+    corner_uvs = mesh["uvs"][mesh["uv_faces"][kept].reshape(-1)]
+    _, texture_vertex = np.unique(np.column_stack([faces.reshape(-1), corner_charts]),
+                                  axis=0, return_inverse=True)
+    texture_vertex = texture_vertex.reshape(-1)
+    counts = np.bincount(texture_vertex)
+    uvs = np.stack([np.bincount(texture_vertex, weights=corner_uvs[:, axis])
+                    for axis in range(2)], axis=1) / counts[:, None]
+
+    return dict(mesh, positions=positions, faces=faces, uvs=uvs,
+                uv_faces=texture_vertex.reshape(-1, 3),
+                face_materials=mesh["face_materials"][kept])
+
+
+def unweld_vertices(mesh):
+    """
+    glTF usa un único índice por vértice: cada par (posición, coordenada de
+    textura) distinto se convierte en un vértice
+    """
+    uv_count = max(len(mesh["uvs"]), 1)
+    keys = mesh["faces"].astype(np.int64) * uv_count + mesh["uv_faces"]
+    unique_keys, indices = np.unique(keys.reshape(-1), return_inverse=True)
+    positions = mesh["positions"][unique_keys // uv_count]
+    uvs = mesh["uvs"][unique_keys % uv_count]
+    return positions, uvs, indices.reshape(-1, 3)
+
+
+def quantize_positions(positions):
+    """
+    Posiciones como enteros de 16 bits (KHR_mesh_quantization); la
+    traslación y escala del nodo las devuelven a su tamaño real
+
+    Returns:
+        (posiciones N x 4 uint16 con relleno para alinear a 4 bytes, traslación, escala)
+    """
+    low = positions.min(axis=0)
+    extent = positions.max(axis=0) - low
+    extent[extent == 0] = 1.0
+    quantized = np.zeros((len(positions), 4), dtype=np.uint16)
+    quantized[:, :3] = np.round((positions - low) / extent * QUANTIZATION_MAX)
+    return quantized, low, extent / QUANTIZATION_MAX
+
+
+def quantize_uvs(uvs):
+    """
+    Coordenadas de textura normalizadas en 16 bits, con v invertida (glTF
+    tiene el origen arriba a la izquierda)
+    """
+    flipped = np.column_stack([uvs[:, 0], 1.0 - uvs[:, 1]])
+    return np.round(np.clip(flipped, 0.0, 1.0) * QUANTIZATION_MAX).astype(np.uint16)
+
+
+def encode_texture(path, scale):
+    """
+    Bytes y tipo MIME de la textura; las reducidas se recodifican
+    """
+    mime_type = "image/png" if path.lower().endswith(".png") else "image/jpeg"
+    if scale >= 1.0:
+        with open(path, "rb") as file:
+            return file.read(), mime_type
+
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"No se pudo leer la textura: {path}")
+    height, width = image.shape[:2]
+    resized = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                         interpolation=cv2.INTER_AREA)
+    if mime_type == "image/png":
+        success, encoded = cv2.imencode(".png", resized)
+    else:
+        success, encoded = cv2.imencode(".jpg", resized,
+                                        [cv2.IMWRITE_JPEG_QUALITY, TEXTURE_JPEG_QUALITY])
+    if not success:
+        raise ValueError(f"No se pudo codificar la textura: {path}")
+    return encoded.tobytes(), mime_type
+
+
+def write_textured_glb(path, mesh, texture_paths, texture_scale):
+    """
+    Escribe la malla como GLB: posiciones y coordenadas de textura cuantizadas,
+    una primitiva por material y las texturas incrustadas
+    """
+    chunks = []
+    buffer_views = []
+    accessors = []
+    offset = 0
+
+    def add_view(data, target=None, stride=None):
+        nonlocal offset
+        view = {"buffer": 0, "byteOffset": offset, "byteLength": len(data)}
+        if target:
+            view["target"] = target
+        if stride:
+            view["byteStride"] = stride
+        buffer_views.append(view)
+        chunks.append(data + b"\x00" * (-len(data) % 4))
+        offset += len(chunks[-1])
+        return len(buffer_views) - 1
+
+    def add_accessor(view, component_type, count, accessor_type, **extra):
+        accessors.append({"bufferView": view, "componentType": component_type,
+                          "count": int(count), "type": accessor_type, **extra})
+        return len(accessors) - 1
+
+    positions, uvs, indices = unweld_vertices(mesh)
+    quantized, translation, scale = quantize_positions(positions * COLMAP_TO_GLTF)
+    position_accessor = add_accessor(
+        add_view(quantized.tobytes(), GLTF_ARRAY_BUFFER, stride=8),
+        GLTF_UNSIGNED_SHORT, len(quantized), "VEC3",
+        min=quantized[:, :3].min(axis=0).tolist(), max=quantized[:, :3].max(axis=0).tolist())
+    uv_accessor = add_accessor(
+        add_view(quantize_uvs(uvs).tobytes(), GLTF_ARRAY_BUFFER),
+        GLTF_UNSIGNED_SHORT, len(uvs), "VEC2", normalized=True)
+
+    index_type = np.uint16 if len(positions) <= QUANTIZATION_MAX else np.uint32
+    index_component = GLTF_UNSIGNED_SHORT if index_type == np.uint16 else GLTF_UNSIGNED_INT
+
+    images, textures, materials, primitives = [], [], [], []
+    texture_bytes = 0
+    for material_index, name in enumerate(mesh["material_names"] or ["default"]):
+        face_mask = mesh["face_materials"] == material_index
+        if not mesh["material_names"]:
+            face_mask = np.ones(len(indices), dtype=bool)
+        if not np.any(face_mask):
+            continue
+
+        material = {"name": name,
+                    "pbrMetallicRoughness": {"metallicFactor": 0.0, "roughnessFactor": 1.0},
+                    "extensions": {"KHR_materials_unlit": {}}}
+        texture_path = texture_paths.get(name)
+        if texture_path and os.path.exists(texture_path):
+            data, mime_type = encode_texture(texture_path, texture_scale)
+            texture_bytes += len(data)
+            images.append({"bufferView": add_view(data), "mimeType": mime_type})
+            textures.append({"source": len(images) - 1, "sampler": 0})
+            material["pbrMetallicRoughness"]["baseColorTexture"] = {"index": len(textures) - 1}
+        materials.append(material)
+
+        material_indices = indices[face_mask].reshape(-1).astype(index_type)
+        index_accessor = add_accessor(
+            add_view(material_indices.tobytes(), GLTF_ELEMENT_ARRAY_BUFFER),
+            index_component, len(material_indices), "SCALAR")
+        primitives.append({"attributes": {"POSITION": position_accessor,
+                                          "TEXCOORD_0": uv_accessor},
+                           "indices": index_accessor, "material": len(materials) - 1})
+
+    document = {
+        "asset": {"version": "2.0", "generator": "photogrammetry mesh export"},
+        "extensionsUsed": ["KHR_mesh_quantization", "KHR_materials_unlit"],
+        "extensionsRequired": ["KHR_mesh_quantization"],
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0, "translation": translation.tolist(), "scale": scale.tolist()}],
+        "meshes": [{"primitives": primitives}],
+        "materials": materials,
+        "accessors": accessors,
+        "bufferViews": buffer_views,
+        "buffers": [{"byteLength": offset}]
+    }
+    if images:
+        document.update({"images": images, "textures": textures,
+                         "samplers": [{"magFilter": 9729, "minFilter": 9987}]})
+
+    write_glb_container(path, document, b"".join(chunks))
+    return {"vertices": int(len(positions)), "texture_bytes": texture_bytes}
+
+
+def export_glb_lods(obj_path, path_template=LOD_PATH_TEMPLATE):
+    """
+    Convierte el OBJ texturizado en GLB con varios niveles de detalle, del
+    completo al más ligero, para que el visor cargue primero el más pequeño
+
+    Returns:
+        dict con la información de cada nivel y el tiempo de exportación
+    """
+    start_time = time.time()
+    mesh = read_textured_obj(obj_path)
+    mtl_path = os.path.join(os.path.dirname(obj_path), mesh["mtllib"]) if mesh["mtllib"] else None
+    texture_paths = read_mtl_textures(mtl_path)
+    total_faces = len(mesh["faces"])
+
+    lods = []
+    for level, (face_ratio, texture_scale) in enumerate(LOD_LEVELS):
+        face_budget = int(total_faces * face_ratio)
+        if level > 0 and face_budget < MIN_LOD_FACES:
+            break
+        lod_mesh = decimate_textured_mesh(mesh, face_budget)
+        path = path_template.format(level=level)
+        written = write_textured_glb(path, lod_mesh, texture_paths, texture_scale)
+        lods.append({
+            "level": level,
+            "filename": os.path.basename(path),
+            "url": f"/download/{os.path.basename(path)}",
+            "faces": int(len(lod_mesh["faces"])),
+            "vertices": written["vertices"],
+            "texture_scale": texture_scale,
+            "texture_bytes": written["texture_bytes"],
+            "size_bytes": os.path.getsize(path)
+        })
+
+    return {
+        "obj_size_bytes": os.path.getsize(obj_path),
+        "lods": lods,
+        "export_time_seconds": round(time.time() - start_time, 2)
+    }
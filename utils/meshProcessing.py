@@ -0,0 +1,276 @@
+import os
+import time
+import numpy as np
+from utils.pointCloudFilter import read_ply_header
+
+
+# Componentes con menos caras que esta fracción de la mayor se consideran islas
+MIN_COMPONENT_RATIO = 0.05
+
+# Presupuesto de caras por defecto antes de texturizar
+DEFAULT_FACE_BUDGET = 100000
+
+MAX_DECIMATION_ITERATIONS = 8
+
+
+def read_ply_mesh(path):
+    """
+    Lee una malla triangular de un PLY binario little-endian (como la que
+    escribe ReconstructMesh) mapeando el archivo en memoria
+
+    Returns:
+        (vértices N x 3 float64, caras M x 3 int64)
+    """
+    file_format, elements, header_size = read_ply_header(path)
+    if file_format != "binary_little_endian":
+        raise ValueError(f"Formato PLY no soportado: {file_format}")
+
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    offset = header_size
+    vertices = faces = None
+
+    for name, count, properties in elements:
+        if any(prop[1] == "list" for prop in properties):
+            if name != "face" or len(properties) != 1:
+                raise ValueError(f"Elemento PLY no soportado: {name}")
+            _, _, count_type, index_type = properties[0]
+            # Solo triángulos: todos los registros tienen el mismo tamaño
+            face_dtype = np.dtype([("n", count_type), ("v", index_type, 3)])
+            records = np.frombuffer(raw, dtype=face_dtype, count=count, offset=offset)
+            if count and np.any(records["n"] != 3):
+                raise ValueError("La malla contiene caras que no son triángulos")
+            faces = records["v"].astype(np.int64)
+            offset += face_dtype.itemsize * count
+        else:
+            record_dtype = np.dtype([(prop[0], prop[1]) for prop in properties])
+            records = np.frombuffer(raw, dtype=record_dtype, count=count, offset=offset)
+            if name == "vertex":
+                vertices = np.stack([records["x"], records["y"], records["z"]],
+                                    axis=1).astype(np.float64)
+            offset += record_dtype.itemsize * count
+
+    if vertices is None or faces is None:
+        raise ValueError("El PLY no contiene vértices y caras")
+    return vertices, faces
+
+
+def write_ply_mesh(path, vertices, faces):
+    """
+    Escribe una malla triangular en PLY binario
+    """
+    face_dtype = np.dtype([("n", "u1"), ("v", "<u4", 3)])
+    records = np.empty(len(faces), dtype=face_dtype)
+    records["n"] = 3
+    records["v"] = faces
+
+    header = (
+        "ply\n"
+        "format binary_little_endian 1.0\n"
+        f"element vertex {len(vertices)}\n"
+        "property float x\nproperty float y\nproperty float z\n"
+        f"element face {len(faces)}\n"
+        "property list uchar uint vertex_indices\n"
+        "end_header\n"
+    )
+    with open(path, "wb") as file:
+        file.write(header.encode("ascii"))
+        vertices.astype("<f4").tofile(file)
+        records.tofile(file)
+
+
+def compact_mesh(vertices, faces):
+    """
+    Elimina los vértices no referenciados y reindexa las caras
+    """
+    used, inverse = np.unique(faces, return_inverse=True)
+    return vertices[used], inverse.reshape(faces.shape)
+
+
+def label_connected_components(num_vertices, faces):
+    """
+    Etiqueta las componentes conexas con un union-find vectorizado
+    (enganche de raíces al mínimo y compresión de caminos por saltos de puntero)
+
+    Returns:
+        array con la raíz de la componente de cada vértice
+    """
+    parent = np.arange(num_vertices)
+    a = faces.ravel()
+    b = np.roll(faces, 1, axis=1).ravel()
+
+    while True:
+        root_a = parent[a]
+        root_b = parent[b]
+        differ = root_a != root_b
+        if not np.any(differ):
+            return parent
+        root_a = root_a[differ]
+        root_b = root_b[differ]
+        low = np.minimum(root_a, root_b)
+        np.minimum.at(parent, root_a, low)
+        np.minimum.at(parent, root_b, low)
+
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+
+def prune_small_components(vertices, faces, min_ratio=MIN_COMPONENT_RATIO):
+    """
+    Descarta las islas cuya cantidad de caras es menor que min_ratio de la componente mayor
+
+    Returns:
+        (vértices, caras, número de componentes, componentes eliminadas)
+    """
+    labels = label_connected_components(len(vertices), faces)
+    face_labels = labels[faces[:, 0]]
+    components, inverse, face_counts = np.unique(
+        face_labels, return_inverse=True, return_counts=True)
+
+    keep_component = face_counts >= min_ratio * face_counts.max()
+    keep = keep_component[inverse]
+    vertices, faces = compact_mesh(vertices, faces[keep])
+    return vertices, faces, len(components), int(np.count_nonzero(~keep_component))
+
+
+def compute_vertex_quadrics(vertices, faces):
+    """
+    Cuádricas de error por vértice: suma de los planos de las caras incidentes
+    ponderados por su área (4 x 4 por vértice)
+    """
+    v0, v1, v2 = (vertices[faces[:, i]] for i in range(3))
+    cross = np.cross(v1 - v0, v2 - v0)
+    double_area = np.linalg.norm(cross, axis=1)
+    normals = cross / np.maximum(double_area, 1e-30)[:, None]
+    planes = np.concatenate(
+        [normals, -np.einsum("ij,ij->i", normals, v0)[:, None]], axis=1)
+    face_quadrics = (planes[:, :, None] * planes[:, None, :]) * \
+        (double_area / 2)[:, None, None]
+
+    quadrics = np.zeros((len(vertices), 16))
+    flat = face_quadrics.reshape(-1, 16)
+    for corner in range(3):
+        np.add.at(quadrics, faces[:, corner], flat)
+    return quadrics, float(double_area.sum() / 2)
+
+
+def cluster_vertices(vertices, faces, quadrics, cell_size):
+    """
+    Simplificación por agrupamiento de vértices en una rejilla: cada celda se
+    colapsa al punto que minimiza la suma de sus cuádricas de error
+
+    Returns:
+        (celda de cada vértice, posición de cada celda, índices de las caras conservadas)
+    """
+    keys = np.floor((vertices - vertices.min(axis=0)) / cell_size).astype(np.int64)
+    _, cluster = np.unique(keys, axis=0, return_inverse=True)
+    cluster = cluster.reshape(-1)
+    num_clusters = cluster.max() + 1
+
+    counts = np.bincount(cluster, minlength=num_clusters)
+    mean = np.stack([np.bincount(cluster, weights=vertices[:, axis], minlength=num_clusters)
+                     for axis in range(3)], axis=1) / counts[:, None]
+    cluster_quadrics = np.stack([np.bincount(cluster, weights=quadrics[:, i], minlength=num_clusters)
+                                 for i in range(16)], axis=1).reshape(-1, 4, 4)
+
+    # Posición óptima: A x = -b; si el sistema está mal condicionado se usa la media
+    A = cluster_quadrics[:, :3, :3]
+    b = cluster_quadrics[:, :3, 3]
+    trace = np.trace(A, axis1=1, axis2=2)
+    determinant = np.linalg.det(A)
+    solvable = determinant > 1e-6 * np.maximum(trace, 1e-30) ** 3
+    positions = mean.copy()
+    if np.any(solvable):
+        optimal = np.linalg.solve(A[solvable], -b[solvable][:, :, None])[:, :, 0]
+        # Evitar que el punto se aleje de su celda
+        inside = np.all(np.abs(optimal - mean[solvable]) <= cell_size, axis=1)
+        positions[np.flatnonzero(solvable)[inside]] = optimal[inside]
+
+    new_faces = cluster[faces]
+    kept = np.flatnonzero((new_faces[:, 0] != new_faces[:, 1]) &
+                          (new_faces[:, 1] != new_faces[:, 2]) &
+                          (new_faces[:, 0] != new_faces[:, 2]))
+
+    # Eliminar caras duplicadas (mismos vértices en cualquier orden)
+    _, unique_index = np.unique(np.sort(new_faces[kept], axis=1), axis=0, return_index=True)
+    kept = kept[np.sort(unique_index)]
+
+    return cluster, positions, kept
+
+
+def cluster_to_budget(vertices, faces, face_budget):
+    """
+    Busca el tamaño de rejilla que deja la malla en face_budget caras, partiendo
+    de la superficie de la malla
+
+    Returns:
+        Igual que cluster_vertices
+    """
+    quadrics, surface_area = compute_vertex_quadrics(vertices, faces)
+    # Una celda sobre la superficie genera aproximadamente dos triángulos
+    cell_size = np.sqrt(2 * surface_area / face_budget)
+
+    for _ in range(MAX_DECIMATION_ITERATIONS):
+        cluster, positions, kept = cluster_vertices(vertices, faces, quadrics, cell_size)
+        if len(kept) <= face_budget:
+            break
+        cell_size *= np.sqrt(len(kept) / face_budget) * 1.05
+
+    return cluster, positions, kept
+
+
+def decimate_mesh(vertices, faces, face_budget):
+    """
+    Reduce la malla hasta face_budget caras
+    """
+    if len(faces) <= face_budget:
+        return vertices, faces
+
+    cluster, positions, kept = cluster_to_budget(vertices, faces, face_budget)
+    return compact_mesh(positions, cluster[faces[kept]])
+
+
+def process_mesh(input_path, output_path, face_budget=DEFAULT_FACE_BUDGET,
+                 min_component_ratio=MIN_COMPONENT_RATIO):
+    """
+    Limpia la malla antes de texturizar: elimina islas pequeñas y la decima
+    hasta el presupuesto de caras
+
+    Returns:
+        dict con caras y vértices en cada etapa y tiempos
+    """
+    start_time = time.time()
+    vertices, faces = read_ply_mesh(input_path)
+    faces_before = len(faces)
+    vertices_before = len(vertices)
+    if faces_before == 0:
+        return None
+
+    vertices, faces = compact_mesh(vertices, faces)
+    vertices, faces, num_components, removed_components = prune_small_components(
+        vertices, faces, min_component_ratio)
+    faces_after_pruning = len(faces)
+    pruning_time = time.time() - start_time
+
+    decimation_start = time.time()
+    vertices, faces = decimate_mesh(vertices, faces, face_budget)
+    decimation_time = time.time() - decimation_start
+
+    write_ply_mesh(output_path, vertices, faces)
+
+    return {
+        "faces_before": faces_before,
+        "vertices_before": vertices_before,
+        "components": num_components,
+        "components_removed": removed_components,
+        "faces_after_pruning": faces_after_pruning,
+        "face_budget": face_budget,
+        "faces_after": len(faces),
+        "vertices_after": len(vertices),
+        "face_reduction_ratio": round(1 - len(faces) / faces_before, 4),
+        "pruning_time_seconds": round(pruning_time, 2),
+        "decimation_time_seconds": round(decimation_time, 2),
+        "output_size_mb": round(os.path.getsize(output_path) / (1024 * 1024), 2)
+    }
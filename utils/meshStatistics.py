@@ -0,0 +1,260 @@
+import mmap
+import os
+import time
+import numpy as np
+from utils.pointCloudFilter import read_ply_header
+from utils.meshProcessing import read_ply_mesh
+
+# Bloques contiguos de líneas a partir de los cuales se concatena con una máscara
+MAX_CONTIGUOUS_RUNS = 1000
+
+
+def obj_line_table(data):
+    """
+    Inicio y fin (sin el salto de línea) de cada línea no vacía
+    """
+    newlines = np.flatnonzero(data == ord("\n"))
+    starts = np.concatenate([[0], newlines + 1])
+    ends = np.concatenate([newlines, [len(data)]])
+    non_empty = starts < ends
+    return starts[non_empty], ends[non_empty]
+
+
+def gather_lines(data, starts, ends, prefix_length):
+    """
+    Concatena los bytes de las líneas indicadas (cada una con su salto final)
+    y blanquea su prefijo ("v", "vt", "f")
+
+    Returns:
+        (bytes concatenados, posición de cada línea en ellos)
+    """
+    lengths = np.minimum(ends + 1, len(data)) - starts
+    # Las líneas de un mismo tipo suelen estar en pocos bloques contiguos
+    breaks = np.flatnonzero(starts[1:] != starts[:-1] + lengths[:-1]) + 1
+    if len(breaks) < MAX_CONTIGUOUS_RUNS:
+        run_starts = np.concatenate([[0], breaks])
+        run_ends = np.concatenate([breaks, [len(starts)]]) - 1
+        selected = np.concatenate([
+            data[starts[first]:starts[last] + lengths[last]]
+            for first, last in zip(run_starts, run_ends)])
+    else:
+        delta = np.zeros(len(data) + 1, dtype=np.int32)
+        delta[starts] += 1
+        delta[starts + lengths] -= 1
+        selected = data[np.cumsum(delta[:-1], dtype=np.int32) > 0]
+
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+    for i in range(prefix_length):
+        selected[offsets + i] = ord(" ")
+    return selected, offsets
+
+
+def parse_numbers(buffer):
+    """
+    Números separados por espacios de un bloque de bytes
+    """
+    return np.array(buffer.tobytes().split(), dtype=np.float64)
+
+
+def parse_obj_lines(data, starts, ends, prefix_length):
+    """
+    Convierte a números todas las líneas indicadas de una vez; las barras de
+    las caras se tratan como separadores
+    """
+    if len(starts) == 0:
+        return np.empty(0)
+    selected, _ = gather_lines(data, starts, ends, prefix_length)
+    selected[(selected == ord("/")) | (selected < ord(" "))] = ord(" ")
+    return parse_numbers(selected)
+
+
+def decode_line(data, start, end):
+    return bytes(data[start:end]).decode("utf-8", errors="replace").strip()
+
+
+def parse_obj_faces(data, starts, ends):
+    """
+    Índice de posición de cada esquina de las caras, admitiendo polígonos y
+    los formatos v, v/vt, v/vt/vn y v//vn
+
+    Returns:
+        (índices de posición de las esquinas, número de esquinas de cada cara)
+    """
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    selected, offsets = gather_lines(data, starts, ends, 1)
+
+    # Cada esquina empieza donde un separador va seguido de otro carácter
+    blank = selected <= ord(" ")
+    token_start = ~blank & np.concatenate([[True], blank[:-1]])
+    corners_per_face = np.add.reduceat(token_start, offsets, dtype=np.int64)
+    num_corners = int(corners_per_face.sum())
+
+    # Caso habitual: todas las esquinas con el formato de la primera
+    sample = decode_line(data, starts[0], ends[0]).split()[1]
+    numbers_per_corner = len([part for part in sample.split("/") if part])
+    slash = selected == ord("/")
+    values = parse_numbers(np.where(slash | blank, ord(" "), selected).astype(np.uint8))
+    if len(values) == num_corners * numbers_per_corner:
+        return values[::numbers_per_corner].astype(np.int64), corners_per_face
+
+    # Formatos mezclados: solo el primer número de cada esquina (antes de la primera "/")
+    slashes = np.cumsum(slash, dtype=np.int32)
+    token_id = np.cumsum(token_start, dtype=np.int32) - 1
+    slashes_at_start = slashes[token_start] - slash[token_start]
+    after_slash = ~blank & (slashes > slashes_at_start[np.maximum(token_id, 0)])
+    selected[blank | after_slash] = ord(" ")
+
+    indices = parse_numbers(selected).astype(np.int64)
+    if len(indices) != num_corners:
+        raise ValueError("Caras del OBJ con un formato no reconocido")
+    return indices, corners_per_face
+
+
+def triangulate_faces(corners, corners_per_face):
+    """
+    Triangula los polígonos en abanico: una cara de k esquinas da k - 2 triángulos
+    """
+    triangles_per_face = np.maximum(corners_per_face - 2, 0)
+    face_starts = np.concatenate([[0], np.cumsum(corners_per_face)[:-1]])
+    first_corner = np.repeat(face_starts, triangles_per_face)
+    # Posición de cada triángulo dentro de su cara (1, 2, ...)
+    local = np.arange(len(first_corner)) - np.repeat(
+        np.cumsum(triangles_per_face) - triangles_per_face, triangles_per_face) + 1
+    return np.stack([corners[first_corner], corners[first_corner + local],
+                     corners[first_corner + local + 1]], axis=1)
+
+
+def read_obj_geometry(path):
+    """
+    Lee posiciones y caras de un OBJ mapeando el archivo en memoria
+
+    Returns:
+        dict con positions, triangles, número de registros de cada tipo y de
+        caras que no son triángulos
+    """
+    with open(path, "rb") as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        data = np.frombuffer(mapped, dtype=np.uint8)
+        starts, ends = obj_line_table(data)
+        first = data[starts]
+        second = data[np.minimum(starts + 1, len(data) - 1)]
+        is_space = (second == ord(" ")) | (second == ord("\t"))
+
+        vertex_lines = (first == ord("v")) & is_space
+        face_lines = (first == ord("f")) & is_space
+        positions = parse_obj_lines(data, starts[vertex_lines], ends[vertex_lines], 1)
+        if len(positions):
+            # "v x y z", "v x y z w" o con color "v x y z r g b"
+            components = len(decode_line(
+                data, starts[vertex_lines][0], ends[vertex_lines][0]).split()) - 1
+            positions = positions.reshape(-1, components)[:, :3]
+        corners, corners_per_face = parse_obj_faces(data, starts[face_lines], ends[face_lines])
+
+        # Índices negativos: relativos a los vértices definidos antes de la cara
+        if np.any(corners < 0):
+            vertices_before = np.searchsorted(starts[vertex_lines], starts[face_lines])
+            corner_vertices_before = np.repeat(vertices_before, corners_per_face)
+            corners = np.where(corners < 0, corners + corner_vertices_before + 1, corners)
+
+        counts = {
+            "vertices": int(vertex_lines.sum()),
+            "faces": int(face_lines.sum()),
+            "texture_coordinates": int(((first == ord("v")) & (second == ord("t"))).sum()),
+            "vertex_normals": int(((first == ord("v")) & (second == ord("n"))).sum())
+        }
+        del data
+
+    return dict(counts, positions=positions.reshape(-1, 3),
+                triangles=triangulate_faces(corners - 1, corners_per_face),
+                non_triangular_faces=int((corners_per_face != 3).sum()))
+
+
+def read_ply_geometry(path):
+    """
+    Lee posiciones y triángulos de un PLY binario; si las caras no se pueden
+    leer (listas de tamaño variable, texcoords) solo se usan los conteos de la cabecera
+    """
+    _, elements, _ = read_ply_header(path)
+    counts = {name: count for name, count, _ in elements}
+    geometry = {
+        "vertices": counts.get("vertex", 0),
+        "faces": counts.get("face", 0),
+        "texture_coordinates": 0,
+        "vertex_normals": 0,
+        "non_triangular_faces": 0
+    }
+    for name, _, properties in elements:
+        if name == "vertex":
+            names = [prop[0] for prop in properties]
+            geometry["vertex_normals"] = counts["vertex"] if "nx" in names else 0
+    try:
+        geometry["positions"], geometry["triangles"] = read_ply_mesh(path)
+    except (ValueError, KeyError) as e:
+        print(f"Estadísticas del PLY solo desde la cabecera: {e}")
+    return geometry
+
+
+def edge_statistics(triangles):
+    """
+    Aristas de borde (una sola cara) y no variedad (más de dos caras)
+    """
+    edges = np.sort(np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]],
+                                    triangles[:, [2, 0]]]), axis=1)
+    keys = edges[:, 0] * (int(triangles.max()) + 1) + edges[:, 1]
+    _, uses = np.unique(keys, return_counts=True)
+    return {
+        "edges": int(len(uses)),
+        "boundary_edges": int((uses == 1).sum()),
+        "non_manifold_edges": int((uses > 2).sum())
+    }
+
+
+def mesh_statistics(path):
+    """
+    Estadísticas de una malla OBJ o PLY: conteos de registros, triángulos
+    reales, caja envolvente, superficie y aristas de borde y no variedad
+
+    Returns:
+        dict de estadísticas, o None si el archivo no existe
+    """
+    if not os.path.exists(path):
+        return None
+    start_time = time.time()
+
+    if path.lower().endswith(".ply"):
+        geometry = read_ply_geometry(path)
+    else:
+        geometry = read_obj_geometry(path)
+
+    file_size_bytes = os.path.getsize(path)
+    stats = {
+        "vertices": geometry["vertices"],
+        "faces": geometry["faces"],
+        "triangles": geometry["faces"],
+        "non_triangular_faces": geometry["non_triangular_faces"],
+        "texture_coordinates": geometry["texture_coordinates"],
+        "vertex_normals": geometry["vertex_normals"],
+        "file_size_bytes": file_size_bytes,
+        "file_size_mb": round(file_size_bytes / (1024 * 1024), 2)
+    }
+
+    triangles = geometry.get("triangles")
+    positions = geometry.get("positions")
+    if triangles is not None and len(triangles) and len(positions):
+        low, high = positions.min(axis=0), positions.max(axis=0)
+        corners = positions[triangles]
+        areas = 0.5 * np.linalg.norm(
+            np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1)
+        stats.update({
+            "triangles": int(len(triangles)),
+            "bounding_box": {"min": low.round(6).tolist(), "max": high.round(6).tolist(),
+                             "size": (high - low).round(6).tolist()},
+            "surface_area": round(float(areas.sum()), 6),
+            "degenerate_triangles": int((areas <= 1e-12).sum()),
+            **edge_statistics(triangles)
+        })
+        stats["watertight"] = stats["boundary_edges"] == 0 and stats["non_manifold_edges"] == 0
+
+    stats["stats_time_seconds"] = round(time.time() - start_time, 3)
+    return stats
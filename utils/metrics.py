@@ -0,0 +1,118 @@
+import threading
+
+
+# Buckets de histogramas (segundos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+STAGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+INFERENCE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+THROUGHPUT_BUCKETS = (1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8, 1e9)
+
+# nombre -> (tipo, descripción, buckets)
+METRIC_DEFINITIONS = {
+    "http_request_duration_seconds": (
+        "histogram", "Latencia de las peticiones HTTP por endpoint", LATENCY_BUCKETS),
+    "upload_bytes_total": (
+        "counter", "Bytes recibidos en subidas", None),
+    "upload_throughput_bytes_per_second": (
+        "histogram", "Velocidad de recepción de cada subida", THROUGHPUT_BUCKETS),
+    "video_frames_decoded_total": (
+        "counter", "Frames de video decodificados", None),
+    "video_frame_decode_seconds_total": (
+        "counter", "Tiempo total decodificando frames de video", None),
+    "video_frames_scored_total": (
+        "counter", "Frames de video evaluados (calidad)", None),
+    "video_frame_score_seconds_total": (
+        "counter", "Tiempo total evaluando la calidad de frames", None),
+    "yolo_inferences_total": (
+        "counter", "Inferencias de YOLO ejecutadas", None),
+    "yolo_inference_seconds": (
+        "histogram", "Duración de cada inferencia de YOLO", INFERENCE_BUCKETS),
+    "segmentation_postprocess_seconds": (
+        "histogram", "Post-procesado de máscaras por imagen", INFERENCE_BUCKETS),
+    "pipeline_stage_duration_seconds": (
+        "histogram", "Duración de cada etapa del pipeline", STAGE_BUCKETS),
+    "jobs_finished_total": (
+        "counter", "Trabajos terminados por estado", None),
+}
+
+_lock = threading.Lock()
+_values = {}
+_gauge_callbacks = {}
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc_counter(name, value=1.0, **labels):
+    key = (name, _label_key(labels))
+    with _lock:
+        _values[key] = _values.get(key, 0.0) + value
+
+
+def observe(name, value, **labels):
+    """
+    Registra una observación en un histograma
+    """
+    buckets = METRIC_DEFINITIONS[name][2]
+    key = (name, _label_key(labels))
+    with _lock:
+        entry = _values.get(key)
+        if entry is None:
+            entry = _values[key] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, limit in enumerate(buckets):
+            if value <= limit:
+                entry["buckets"][i] += 1
+        entry["sum"] += value
+        entry["count"] += 1
+
+
+def register_gauge(name, description, callback):
+    """
+    Registra un gauge calculado al exportar: callback devuelve [(labels, valor)]
+    """
+    _gauge_callbacks[name] = (description, callback)
+
+
+def _format_labels(label_key, extra=None):
+    pairs = list(label_key) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = ",".join(
+        '{}="{}"'.format(key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs)
+    return "{" + escaped + "}"
+
+
+def render_metrics():
+    """
+    Exporta todas las métricas en el formato de texto de Prometheus
+    """
+    with _lock:
+        snapshot = {key: (dict(value, buckets=list(value["buckets"]))
+                          if isinstance(value, dict) else value)
+                    for key, value in _values.items()}
+
+    lines = []
+    for name, (metric_type, description, buckets) in METRIC_DEFINITIONS.items():
+        series = [(labels, value) for (metric, labels), value in snapshot.items()
+                  if metric == name]
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in sorted(series):
+            if metric_type == "histogram":
+                for limit, count in zip(buckets, value["buckets"]):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', f'{limit:g}')])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    for name, (description, callback) in _gauge_callbacks.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in callback():
+            lines.append(f"{name}{_format_labels(_label_key(labels))} {value:g}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,173 @@
+import os
+import cv2
+import numpy as np
+from utils.colmapModel import read_images_binary, read_points3D_binary
+
+
+# Descarte de outliers: error de reproyección y distancia al centro (en MADs)
+MAX_ERROR_FACTOR = 2.0
+MAX_DISTANCE_MADS = 3.0
+
+# Percentiles usados para acotar el volumen en cada eje principal
+ROI_PERCENTILES = (2.0, 98.0)
+
+# Margen añadido al volumen (fracción de su tamaño en cada eje)
+ROI_BORDER = 0.1
+
+# Fracción mínima de observaciones que deben caer sobre la máscara del objeto
+MIN_FOREGROUND_RATIO = 0.5
+
+# Intensidad por encima de la cual un píxel de la imagen segmentada es objeto
+FOREGROUND_THRESHOLD = 8
+
+MIN_ROI_POINTS = 20
+
+
+def _weighted_percentile(values, weights, percentiles):
+    order = np.argsort(values)
+    values = values[order]
+    cumulative = np.cumsum(weights[order])
+    cumulative /= cumulative[-1]
+    return np.interp(np.asarray(percentiles) / 100.0, cumulative, values)
+
+
+def compute_foreground_ratio(model_path, image_folder, point_ids):
+    """
+    Para cada punto 3D, fracción de sus observaciones que caen sobre el objeto
+    en las imágenes segmentadas (fondo negro). Equivale a intersectar los rayos
+    de visión del punto con las máscaras de segmentación
+    """
+    _, names, points2D = read_images_binary(
+        os.path.join(model_path, "images.bin"))
+    image_ids = list(points2D.keys())
+
+    hits = np.zeros(len(point_ids), dtype=np.float64)
+    observations = np.zeros(len(point_ids), dtype=np.float64)
+
+    for image_id, name in zip(image_ids, names):
+        obs = points2D[image_id]
+        # Los ids inválidos se leen como -1 (INVALID_POINT3D_ID)
+        valid = obs["point3D_id"] >= 0
+        if not np.any(valid):
+            continue
+
+        # Decodificar a 1/4 de resolución basta para muestrear la máscara
+        mask = cv2.imread(os.path.join(image_folder, name),
+                          cv2.IMREAD_REDUCED_GRAYSCALE_4)
+        if mask is None:
+            continue
+        scale = 4.0
+
+        # Solo las observaciones de puntos que existen en points3D.bin
+        ids = obs["point3D_id"][valid].astype(np.uint64)
+        index = np.minimum(np.searchsorted(point_ids, ids), len(point_ids) - 1)
+        known = point_ids[index] == ids
+        if not np.any(known):
+            continue
+        index = index[known]
+
+        xy = obs["xy"][valid][known] / scale
+        cols = np.clip(xy[:, 0].astype(np.int64), 0, mask.shape[1] - 1)
+        rows = np.clip(xy[:, 1].astype(np.int64), 0, mask.shape[0] - 1)
+        foreground = mask[rows, cols] > FOREGROUND_THRESHOLD
+
+        np.add.at(hits, index, foreground)
+        np.add.at(observations, index, 1.0)
+
+    return np.divide(hits, observations, out=np.zeros_like(hits),
+                     where=observations > 0)
+
+
+def compute_object_roi(model_path, image_folder=None, use_masks=False, border=ROI_BORDER):
+    """
+    Calcula un volumen orientado (OBB) robusto que contiene el objeto a partir
+    de los puntos dispersos
+
+    Args:
+        model_path: Modelo binario de COLMAP
+        image_folder: Imágenes segmentadas (solo si use_masks=True)
+        use_masks: Ponderar los puntos por las máscaras de segmentación
+        border: Margen relativo añadido al volumen
+
+    Returns:
+        dict con centro, rotación (filas = ejes), semiejes y puntos usados, o None
+    """
+    points = read_points3D_binary(os.path.join(model_path, "points3D.bin"))
+    if len(points) < MIN_ROI_POINTS:
+        return None
+
+    order = np.argsort(points["point3D_id"])
+    points = points[order]
+    xyz = points["xyz"]
+    weights = points["track_length"].astype(np.float64)
+
+    # 1. Descartar puntos con error de reproyección alto
+    keep = points["error"] <= MAX_ERROR_FACTOR * \
+        max(np.median(points["error"]), 1e-6)
+
+    # 2. Ponderar por máscaras de segmentación
+    used_masks = False
+    if use_masks and image_folder:
+        foreground_ratio = compute_foreground_ratio(
+            model_path, image_folder, points["point3D_id"])
+        on_object = foreground_ratio >= MIN_FOREGROUND_RATIO
+        if np.count_nonzero(keep & on_object) >= MIN_ROI_POINTS:
+            keep &= on_object
+            weights = weights * foreground_ratio
+            used_masks = True
+
+    # 3. Descartar puntos lejanos al centro (mediana + MADs)
+    center = np.median(xyz[keep], axis=0)
+    distance = np.linalg.norm(xyz - center, axis=1)
+    median_distance = np.median(distance[keep])
+    mad = np.median(np.abs(distance[keep] - median_distance)) * 1.4826
+    keep &= distance <= median_distance + MAX_DISTANCE_MADS * max(mad, 1e-9)
+
+    if np.count_nonzero(keep) < MIN_ROI_POINTS:
+        return None
+
+    inliers = xyz[keep]
+    inlier_weights = weights[keep]
+
+    # 4. Ejes principales (PCA ponderado) y extensión por percentiles en cada eje
+    mean = np.average(inliers, axis=0, weights=inlier_weights)
+    centered = inliers - mean
+    covariance = (centered * inlier_weights[:, None]).T @ centered / inlier_weights.sum()
+    _, eigenvectors = np.linalg.eigh(covariance)
+    rotation = eigenvectors[:, ::-1].T
+    if np.linalg.det(rotation) < 0:
+        rotation[2] *= -1
+
+    projected = centered @ rotation.T
+    low = np.empty(3)
+    high = np.empty(3)
+    for axis in range(3):
+        low[axis], high[axis] = _weighted_percentile(
+            projected[:, axis], inlier_weights, ROI_PERCENTILES)
+
+    half_extents = (high - low) / 2 * (1 + border)
+    obb_center = mean + rotation.T @ ((high + low) / 2)
+
+    full_extent = np.ptp(xyz, axis=0)
+    full_volume = float(np.prod(np.maximum(full_extent, 1e-9)))
+
+    return {
+        "center": obb_center.tolist(),
+        "rotation": rotation.tolist(),
+        "half_extents": half_extents.tolist(),
+        "points_used": int(np.count_nonzero(keep)),
+        "points_total": int(len(points)),
+        "used_masks": used_masks,
+        "volume_ratio": round(float(np.prod(2 * half_extents)) / full_volume, 6)
+    }
+
+
+def write_openmvs_roi(roi, output_path):
+    """
+    Escribe el volumen en el formato de texto de OBB de OpenMVS
+    (rotación 3x3 por filas, posición y semiejes) para --import-roi-file
+    """
+    values = (list(np.asarray(roi["rotation"]).ravel()) +
+              list(roi["center"]) + list(roi["half_extents"]))
+    with open(output_path, "w") as file:
+        file.write(" ".join(f"{value:.9g}" for value in values) + "\n")
@@ -0,0 +1,210 @@
+import os
+import cv2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Tamaño de la miniatura usada para calcular el descriptor global
+THUMBNAIL_SIZE = 64
+
+# Parámetros de cada componente del descriptor
+GRAY_GRID = 16
+HSV_BINS = (8, 4, 4)
+GRADIENT_CELLS = 4
+GRADIENT_BINS = 8
+
+# Peso relativo de cada componente en el descriptor final
+GRAY_WEIGHT = 0.4
+COLOR_WEIGHT = 0.3
+GRADIENT_WEIGHT = 0.3
+
+# Filas de la matriz de similitud calculadas por bloque
+SIMILARITY_BLOCK_SIZE = 1024
+
+
+def load_thumbnail(image_path, size=THUMBNAIL_SIZE):
+    """
+    Carga una miniatura BGR de la imagen. Para JPEG se decodifica directamente
+    a 1/8 de resolución, lo que evita decodificar la imagen completa
+    """
+    img = cv2.imread(image_path, cv2.IMREAD_REDUCED_COLOR_8)
+    if img is None:
+        img = cv2.imread(image_path)
+    if img is None:
+        return None
+
+    return cv2.resize(img, (size, size), interpolation=cv2.INTER_AREA)
+
+
+def _normalize(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def compute_global_descriptor(thumbnail):
+    """
+    Calcula un descriptor global compacto de una miniatura:
+    intensidad reducida + histograma HSV + histograma de orientaciones de gradiente
+    """
+    gray = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY).astype(np.float32)
+
+    # 1. Intensidad en baja resolución (media cero para tolerar cambios de exposición)
+    tiny = cv2.resize(gray, (GRAY_GRID, GRAY_GRID),
+                      interpolation=cv2.INTER_AREA).ravel()
+    tiny = _normalize(tiny - tiny.mean())
+
+    # 2. Histograma de color HSV
+    hsv = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2HSV)
+    color_hist = cv2.calcHist([hsv], [0, 1, 2], None, list(HSV_BINS),
+                              [0, 180, 0, 256, 0, 256]).ravel()
+    color_hist = _normalize(np.sqrt(color_hist))
+
+    # 3. Histograma de orientaciones de gradiente por celdas
+    gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    magnitude, angle = cv2.cartToPolar(gx, gy)
+    orientation_bin = (angle * (GRADIENT_BINS / (2 * np.pi))).astype(np.int32)
+    orientation_bin = np.minimum(orientation_bin, GRADIENT_BINS - 1)
+
+    cell_size = thumbnail.shape[0] // GRADIENT_CELLS
+    rows, cols = np.indices(gray.shape)
+    cell_index = (np.minimum(rows // cell_size, GRADIENT_CELLS - 1) * GRADIENT_CELLS +
+                  np.minimum(cols // cell_size, GRADIENT_CELLS - 1))
+    flat_index = (cell_index * GRADIENT_BINS + orientation_bin).ravel()
+    gradient_hist = np.bincount(flat_index, weights=magnitude.ravel(),
+                                minlength=GRADIENT_CELLS * GRADIENT_CELLS * GRADIENT_BINS)
+    gradient_hist = _normalize(np.sqrt(gradient_hist).astype(np.float32))
+
+    descriptor = np.concatenate([
+        tiny * np.sqrt(GRAY_WEIGHT),
+        color_hist * np.sqrt(COLOR_WEIGHT),
+        gradient_hist * np.sqrt(GRADIENT_WEIGHT)
+    ]).astype(np.float32)
+
+    return _normalize(descriptor)
+
+
+def compute_global_descriptors(image_folder, image_names, max_workers=None):
+    """
+    Calcula los descriptores globales de todas las imágenes en paralelo
+
+    Returns:
+        (matriz de descriptores N x D, lista de nombres válidos)
+    """
+    if max_workers is None:
+        max_workers = min(8, os.cpu_count() or 1)
+
+    def describe(name):
+        thumbnail = load_thumbnail(os.path.join(image_folder, name))
+        if thumbnail is None:
+            return None
+        return compute_global_descriptor(thumbnail)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        descriptors = list(executor.map(describe, image_names))
+
+    valid_names = [name for name, desc in zip(
+        image_names, descriptors) if desc is not None]
+    valid_descriptors = [desc for desc in descriptors if desc is not None]
+
+    if not valid_descriptors:
+        return np.empty((0, 0), dtype=np.float32), []
+
+    return np.stack(valid_descriptors), valid_names
+
+
+def build_knn_pairs(descriptors, num_neighbors, query_indices=None):
+    """
+    Construye la lista de pares (i, j) con i < j uniendo los k vecinos más
+    similares (similitud coseno) de cada imagen de consulta. La matriz de
+    similitud se calcula por bloques para acotar la memoria en conjuntos grandes
+
+    Args:
+        descriptors: Matriz N x D de descriptores normalizados
+        num_neighbors: Vecinos por imagen (k)
+        query_indices: Imágenes para las que se buscan vecinos (None = todas)
+    """
+    num_images = descriptors.shape[0]
+    k = min(num_neighbors, num_images - 1)
+    if k <= 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    if query_indices is None:
+        query_indices = np.arange(num_images)
+    query_indices = np.asarray(query_indices, dtype=np.int64)
+
+    neighbor_blocks = []
+    for start in range(0, len(query_indices), SIMILARITY_BLOCK_SIZE):
+        block = query_indices[start:start + SIMILARITY_BLOCK_SIZE]
+        similarity = descriptors[block] @ descriptors.T
+        similarity[np.arange(len(block)), block] = -np.inf
+        neighbor_blocks.append(
+            np.argpartition(-similarity, k - 1, axis=1)[:, :k])
+
+    neighbors = np.concatenate(neighbor_blocks)
+    queries = np.repeat(query_indices, k)
+    candidates = neighbors.ravel()
+
+    pairs = np.stack([np.minimum(queries, candidates),
+                      np.maximum(queries, candidates)], axis=1)
+    return np.unique(pairs, axis=0)
+
+
+def build_query_pairs(num_images, query_indices):
+    """
+    Todos los pares (i, j) con i < j en los que participa al menos una imagen de consulta
+    """
+    is_query = np.zeros(num_images, dtype=bool)
+    is_query[np.asarray(query_indices, dtype=np.int64)] = True
+
+    i, j = np.triu_indices(num_images, k=1)
+    keep = is_query[i] | is_query[j]
+    return np.stack([i[keep], j[keep]], axis=1)
+
+
+def write_pairs_file(image_names, pairs, output_path):
+    """
+    Escribe la lista de pares en el formato de `colmap matches_importer --match_type pairs`
+    """
+    with open(output_path, "w") as file:
+        for i, j in pairs:
+            file.write(f"{image_names[i]} {image_names[j]}\n")
+
+
+def preselect_image_pairs(image_folder, image_names, output_path, num_neighbors=20,
+                          query_names=None):
+    """
+    Preselecciona pares candidatos por vecindad de descriptores globales
+
+    Args:
+        image_folder: Carpeta con las imágenes
+        image_names: Nombres de las imágenes (como los registra COLMAP)
+        output_path: Archivo de pares para matches_importer
+        num_neighbors: Vecinos por imagen (k); el coste de emparejamiento crece como O(n·k)
+        query_names: Si se indica, solo se buscan vecinos para estas imágenes
+
+    Returns:
+        dict con el número de pares escritos y las imágenes descritas
+    """
+    descriptors, valid_names = compute_global_descriptors(
+        image_folder, image_names)
+
+    query_indices = None
+    if query_names is not None:
+        query_set = set(query_names)
+        query_indices = [i for i, name in enumerate(
+            valid_names) if name in query_set]
+
+    if valid_names and (query_indices is None or query_indices):
+        pairs = build_knn_pairs(descriptors, num_neighbors, query_indices)
+    else:
+        pairs = np.empty((0, 2), dtype=np.int64)
+
+    write_pairs_file(valid_names, pairs, output_path)
+
+    return {
+        "pairs_path": output_path,
+        "preselected_pairs": int(len(pairs)),
+        "described_images": len(valid_names),
+        "num_neighbors": num_neighbors
+    }
@@ -0,0 +1,171 @@
+import io
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from utils.imageProbe import probe_image_stream
+from utils.resolutionPolicy import target_size
+
+
+# Procesos que decodifican, orientan y redimensionan las imágenes del ZIP
+INGEST_WORKERS = min(8, os.cpu_count() or 1)
+
+# Por debajo de este número de imágenes no compensa arrancar el pool
+MIN_IMAGES_FOR_POOL = 4
+
+# Calidad al recodificar JPEG (la misma que usaba cv2.imwrite por defecto)
+INGEST_JPEG_QUALITY = 95
+
+# Transformación que deja derecha una imagen con cada orientación EXIF
+EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90
+}
+
+# Entradas que añaden algunos compresores y no son fotos
+IGNORED_MEMBER_PREFIXES = ("__MACOSX/",)
+
+_archives = {}
+
+
+def list_zip_images(zip_path, extensions):
+    """
+    Miembros del ZIP que son imágenes, ordenados por nombre para que la
+    numeración de las imágenes sea estable
+    """
+    with zipfile.ZipFile(zip_path) as archive:
+        members = [info.filename for info in archive.infolist()
+                   if not info.is_dir() and info.filename.lower().endswith(extensions)
+                   and not info.filename.startswith(IGNORED_MEMBER_PREFIXES)
+                   and not os.path.basename(info.filename).startswith("._")]
+    return sorted(members)
+
+
+def _open_archive(zip_path):
+    """
+    Cada proceso abre el ZIP una vez y lee de él sus miembros directamente,
+    sin que el proceso principal tenga que enviarle los bytes
+    """
+    archive = _archives.get(zip_path)
+    if archive is None:
+        archive = _archives[zip_path] = zipfile.ZipFile(zip_path)
+    return archive
+
+
+def scaled_size(width, height, reduction_percentage):
+    scale_factor = 1 - (reduction_percentage / 100)
+    return int(width * scale_factor), int(height * scale_factor)
+
+
+def ingest_target_size(width, height, reduction_percentage=0, policy=None):
+    """
+    Tamaño final: la reducción manual tiene prioridad sobre la política
+    automática de resolución
+    """
+    if reduction_percentage > 0:
+        target = scaled_size(width, height, reduction_percentage)
+        return target if min(target) > 0 else (width, height)
+    return target_size(width, height, policy)
+
+
+def ingest_member(zip_path, member, dest_path, reduction_percentage=0, policy=None):
+    """
+    Escribe un miembro del ZIP en dest_path una sola vez. Si no hay que
+    girarlo (orientación EXIF) ni reducirlo se copian los bytes tal cual;
+    si no, se decodifica, se aplica la orientación, se redimensiona y se
+    recodifica conservando los metadatos EXIF
+
+    Returns:
+        dict con dimensiones originales y finales y las operaciones aplicadas
+    """
+    data = _open_archive(zip_path).read(member)
+    probe = probe_image_stream(io.BytesIO(data))
+    if probe is None:
+        raise ValueError("Formato de imagen no reconocido")
+    orientation = probe.get("orientation") if probe.get("orientation") in EXIF_TRANSPOSE else 1
+    width, height = probe.get("width"), probe.get("height")
+    target = ingest_target_size(width, height, reduction_percentage, policy)
+    result = {"member": member, "original_width": width, "original_height": height,
+              "rotated": orientation != 1, "resized": target != (width, height)}
+
+    if orientation == 1 and not result["resized"]:
+        with open(dest_path, "wb") as file:
+            file.write(data)
+        return dict(result, width=width, height=height, bytes=len(data))
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.size != (width, height):
+                # Cabecera no fiable: manda el tamaño decodificado
+                width, height = image.size
+                target = ingest_target_size(width, height, reduction_percentage, policy)
+                result.update(original_width=width, original_height=height,
+                              resized=target != (width, height))
+            if result["resized"]:
+                # En JPEG la reducción gruesa se hace en la propia decodificación
+                image.draft(image.mode, target)
+            exif = image.getexif()
+            icc_profile = image.info.get("icc_profile")
+            image_format = image.format
+
+            if result["resized"]:
+                # BOX promedia áreas como el INTER_AREA de OpenCV
+                image = image.resize(target, Image.Resampling.BOX)
+            if orientation in EXIF_TRANSPOSE:
+                image = image.transpose(EXIF_TRANSPOSE[orientation])
+            # Los píxeles ya están girados: la orientación EXIF pasa a ser la normal
+            if exif:
+                exif[0x0112] = 1
+
+            options = {"icc_profile": icc_profile} if icc_profile else {}
+            if image_format == "JPEG":
+                options.update(quality=INGEST_JPEG_QUALITY, exif=exif.tobytes())
+            elif image_format in ("PNG", "TIFF") and exif:
+                options["exif"] = exif.tobytes()
+            image.save(dest_path, format=image_format, **options)
+            width, height = image.size
+    except Exception:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+
+    return dict(result, width=width, height=height, bytes=os.path.getsize(dest_path))
+
+
+def _ingest_task(zip_path, member, dest_path, reduction_percentage, policy):
+    try:
+        return ingest_member(zip_path, member, dest_path, reduction_percentage, policy)
+    except Exception as e:
+        return {"member": member, "error": str(e)}
+
+
+def ingest_zip_images(zip_path, members, dest_paths, reduction_percentage=0, policy=None,
+                      max_workers=INGEST_WORKERS):
+    """
+    Extrae y normaliza las imágenes del ZIP en paralelo, cada una directamente
+    en su ruta final. Los procesos se crean con spawn para no heredar los
+    hilos ni los locks del servidor
+
+    Returns:
+        Lista de resultados en el orden de members; los fallidos llevan "error"
+    """
+    tasks = [(zip_path, member, dest_path, reduction_percentage, policy)
+             for member, dest_path in zip(members, dest_paths)]
+    if len(tasks) < MIN_IMAGES_FOR_POOL or max_workers <= 1:
+        try:
+            return [_ingest_task(*task) for task in tasks]
+        finally:
+            archive = _archives.pop(zip_path, None)
+            if archive:
+                archive.close()
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks)),
+                             mp_context=context) as executor:
+        return list(executor.map(_ingest_task, *zip(*tasks), chunksize=4))
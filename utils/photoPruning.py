@@ -0,0 +1,292 @@
+import json
+import os
+import time
+import cv2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from utils.extractPhotosFromVideo import calculate_frame_quality_score
+from utils.featureStore import hash_image_content
+from utils.imageProbe import directory_index
+
+
+PRUNING_REPORT_PATH = "/data/photo_pruning.json"
+
+# Lado mayor al que se reducen las fotos antes de medirlas, para que la
+# nitidez sea comparable entre fotos de distinta resolución
+ANALYSIS_SIZE = 1024
+
+# Distancia de Hamming máxima (de 64 bits) entre hashes perceptuales para
+# considerar dos fotos casi duplicadas (ráfagas, la misma toma repetida)
+NEAR_DUPLICATE_DISTANCE = int(os.environ.get("PRUNE_NEAR_DUPLICATE_DISTANCE", "3"))
+
+# Una foto es borrosa si su nitidez no llega a esta fracción de la mediana del conjunto
+BLUR_OUTLIER_RATIO = float(os.environ.get("PRUNE_BLUR_RATIO", "0.3"))
+
+# Fotos mínimas para que la mediana de nitidez sea representativa
+MIN_IMAGES_FOR_BLUR = 5
+
+# El hash de contenido es el SHA-256 del almacén de features; los análisis
+# guardados con otro hash se recalculan
+SHA256_HEX_LENGTH = 64
+
+
+def difference_hash(gray):
+    """
+    Hash perceptual dHash de 64 bits: gradiente horizontal de una miniatura 9x8
+    """
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def load_for_analysis(image_path, size=ANALYSIS_SIZE):
+    """
+    Carga la foto reducida a size píxeles de lado mayor (en JPEG se decodifica
+    directamente a menor escala)
+    """
+    image = None
+    for flag in (cv2.IMREAD_REDUCED_COLOR_4, cv2.IMREAD_REDUCED_COLOR_2):
+        candidate = cv2.imread(image_path, flag)
+        if candidate is not None and max(candidate.shape[:2]) >= size:
+            image = candidate
+            break
+    if image is None:
+        image = cv2.imread(image_path)
+    if image is None:
+        return None
+
+    scale = size / max(image.shape[:2])
+    if scale < 1:
+        image = cv2.resize(image, (round(image.shape[1] * scale), round(image.shape[0] * scale)),
+                           interpolation=cv2.INTER_AREA)
+    return image
+
+
+def analyze_photo(image_path):
+    """
+    Hash de contenido, hash perceptual y métricas de calidad de una foto
+
+    Returns:
+        dict de análisis, o None si no se puede decodificar
+    """
+    image = load_for_analysis(image_path)
+    if image is None:
+        return None
+    quality_score, metrics = calculate_frame_quality_score(image)
+    return {
+        "content_hash": hash_image_content(image_path),
+        "dhash": difference_hash(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)),
+        "quality_score": round(float(quality_score), 4),
+        "sharpness": round(float(metrics["sharpness"]), 2)
+    }
+
+
+def analyze_photos(image_folder, image_names, max_workers=None):
+    """
+    Analiza las fotos en paralelo (OpenCV libera el GIL al decodificar)
+
+    Returns:
+        dict nombre -> análisis (solo las fotos que se pudieron leer)
+    """
+    if max_workers is None:
+        max_workers = min(8, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(analyze_photo, [os.path.join(image_folder, name)
+                                               for name in image_names])
+        return {name: result for name, result in zip(image_names, results) if result}
+
+
+def find_prunable_photos(analysis, near_duplicate_distance=NEAR_DUPLICATE_DISTANCE,
+                         blur_ratio=BLUR_OUTLIER_RATIO, reference=None):
+    """
+    Clasifica las fotos prescindibles: duplicados exactos, casi duplicados y
+    borrosas respecto al resto del conjunto.
+
+    Los casi duplicados se resuelven de mejor a peor calidad: una foto se
+    descarta solo si está cerca de otra que se conserva, así una secuencia de
+    fotos consecutivas parecidas (p. ej. una plataforma giratoria) no se
+    encadena en un único grupo
+
+    Args:
+        reference: Análisis de las fotos que ya forman parte del conjunto (modo
+            append). Se conservan siempre y las nuevas se comparan con ellas
+
+    Returns:
+        (exactos, casi duplicados, borrosas) como listas de dicts, solo con
+        fotos de analysis
+    """
+    reference = reference or {}
+    exact, near, blurry = [], [], []
+
+    first_by_content = {}
+    for name in sorted(reference):
+        first_by_content.setdefault(reference[name]["content_hash"], name)
+    unique = []
+    for name in sorted(analysis):
+        original = first_by_content.setdefault(analysis[name]["content_hash"], name)
+        if original != name:
+            exact.append({"filename": name, "duplicate_of": original})
+        else:
+            unique.append(name)
+
+    def by_quality(names, source):
+        return sorted(names, key=lambda name: (-source[name]["quality_score"], name))
+
+    if near_duplicate_distance >= 0 and unique:
+        ranked = by_quality(reference, reference) + by_quality(unique, analysis)
+        hashes = np.array([reference[name]["dhash"] for name in ranked[:len(reference)]] +
+                          [analysis[name]["dhash"] for name in ranked[len(reference):]],
+                          dtype=np.uint64)
+        kept = list(range(len(reference)))
+        for i in range(len(reference), len(ranked)):
+            name = ranked[i]
+            if kept:
+                distances = np.bitwise_count(hashes[kept] ^ hashes[i])
+                closest = int(np.argmin(distances))
+                if distances[closest] <= near_duplicate_distance:
+                    near.append({"filename": name, "duplicate_of": ranked[kept[closest]],
+                                 "distance": int(distances[closest])})
+                    continue
+            kept.append(i)
+
+    removed = {entry["filename"] for entry in near}
+    candidates = [name for name in unique if name not in removed]
+    sharpness = [analysis[name]["sharpness"] for name in candidates] + \
+        [entry["sharpness"] for entry in reference.values()]
+    if blur_ratio > 0 and len(sharpness) >= MIN_IMAGES_FOR_BLUR:
+        median_sharpness = float(np.median(sharpness))
+        for name in candidates:
+            if analysis[name]["sharpness"] < blur_ratio * median_sharpness:
+                blurry.append({"filename": name, "sharpness": analysis[name]["sharpness"],
+                               "median_sharpness": round(median_sharpness, 2)})
+
+    return exact, near, blurry
+
+
+def reference_analysis(image_folder, path=PRUNING_REPORT_PATH):
+    """
+    Análisis de las fotos que ya están en image_folder: se reutiliza el
+    guardado en el informe si la foto no ha cambiado y se calcula el resto
+    """
+    index = directory_index(image_folder)
+    analysis = _current_report(index, path)[1]
+    missing = [name for name in index if name not in analysis]
+    if missing:
+        analysis.update(analyze_photos(image_folder, missing))
+    return analysis
+
+
+def prune_photos(image_folder, image_names, near_duplicate_distance=NEAR_DUPLICATE_DISTANCE,
+                 blur_ratio=BLUR_OUTLIER_RATIO, remove_exact_duplicates=True,
+                 reference_folder=None):
+    """
+    Analiza las fotos subidas y elimina los duplicados exactos (no aportan nada).
+    Los casi duplicados y las borrosas solo se sugieren para deseleccionar
+
+    Args:
+        reference_folder: Carpeta con las fotos que ya forman parte del
+            conjunto (modo append); las nuevas se comparan también con ellas
+
+    Returns:
+        (informe de la poda, análisis de las fotos nuevas y de las de referencia)
+    """
+    start = time.time()
+    analysis = analyze_photos(image_folder, image_names)
+    reference = reference_analysis(reference_folder) if reference_folder else None
+    exact, near, blurry = find_prunable_photos(analysis, near_duplicate_distance, blur_ratio,
+                                               reference)
+
+    if remove_exact_duplicates:
+        for entry in exact:
+            try:
+                os.remove(os.path.join(image_folder, entry["filename"]))
+            except OSError as e:
+                print(f"Error eliminando el duplicado {entry['filename']}: {e}")
+
+    suggestions = {entry["filename"]: "near_duplicate" for entry in near}
+    suggestions.update({entry["filename"]: "blurry" for entry in blurry})
+    report = {
+        "analyzed": len(analysis),
+        "compared_with_existing": len(reference) if reference is not None else 0,
+        "unreadable": sorted(set(image_names) - set(analysis)),
+        "exact_duplicates": exact,
+        "exact_duplicates_removed": remove_exact_duplicates,
+        "near_duplicates": near,
+        "blurry": blurry,
+        "suggestions": suggestions,
+        "thresholds": {"near_duplicate_distance": near_duplicate_distance,
+                       "blur_ratio": blur_ratio},
+        "seconds": round(time.time() - start, 2)
+    }
+    return report, dict(reference or {}, **analysis)
+
+
+def _current_report(index, path=PRUNING_REPORT_PATH):
+    """
+    Sugerencias y análisis guardados de las fotos que siguen iguales que al
+    analizarlas
+
+    Returns:
+        (dict nombre -> motivo, dict nombre -> análisis)
+    """
+    try:
+        with open(path) as file:
+            report = json.load(file)
+    except (OSError, ValueError):
+        return {}, {}
+    versions = report.get("versions", {})
+
+    def current(name):
+        return name in index and \
+            versions.get(name) == [index[name]["size"], index[name]["mtime_ns"]]
+
+    return ({name: reason for name, reason in report.get("suggestions", {}).items()
+             if current(name)},
+            {name: entry for name, entry in report.get("analysis", {}).items()
+             if current(name) and len(entry.get("content_hash", "")) == SHA256_HEX_LENGTH})
+
+
+def save_pruning_report(report, image_folder, analysis=None, renamed=None, merge=False,
+                        path=PRUNING_REPORT_PATH):
+    """
+    Guarda las sugerencias y el análisis junto con el tamaño y la fecha de
+    cada foto, para ignorarlos si la foto se reemplaza después
+
+    Args:
+        analysis: Análisis de las fotos del informe (se reutiliza al añadir fotos)
+        renamed: dict nombre analizado -> nombre final, si las fotos cambiaron
+            de nombre después del análisis (segmentación)
+        merge: Conservar las sugerencias y el análisis vigentes de las fotos
+            que ya estaban en la carpeta (modo append)
+    """
+    renamed = renamed or {}
+    suggestions = {renamed.get(name, name): reason
+                   for name, reason in report["suggestions"].items()}
+    analysis = {renamed.get(name, name): entry for name, entry in (analysis or {}).items()}
+
+    index = directory_index(image_folder)
+    if merge:
+        previous_suggestions, previous_analysis = _current_report(index, path)
+        suggestions = dict(previous_suggestions, **suggestions)
+        analysis = dict(previous_analysis, **analysis)
+
+    suggestions = {name: reason for name, reason in suggestions.items() if name in index}
+    analysis = {name: entry for name, entry in analysis.items() if name in index}
+    versions = {name: [index[name]["size"], index[name]["mtime_ns"]]
+                for name in set(suggestions) | set(analysis)}
+    with open(path, "w") as file:
+        json.dump(dict(report, suggestions=suggestions, analysis=analysis,
+                       versions=versions), file)
+
+
+def load_pruning_suggestions(index, path=PRUNING_REPORT_PATH):
+    """
+    Sugerencias vigentes: las de fotos que siguen iguales que al analizarlas
+
+    Args:
+        index: Índice de la carpeta de imágenes (directory_index)
+
+    Returns:
+        dict nombre -> motivo ("near_duplicate" o "blurry")
+    """
+    return _current_report(index, path)[0]
@@ -0,0 +1,279 @@
+import os
+import time
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+PLY_TYPES = {
+    "char": "i1", "int8": "i1",
+    "uchar": "u1", "uint8": "u1",
+    "short": "<i2", "int16": "<i2",
+    "ushort": "<u2", "uint16": "<u2",
+    "int": "<i4", "int32": "<i4",
+    "uint": "<u4", "uint32": "<u4",
+    "float": "<f4", "float32": "<f4",
+    "double": "<f8", "float64": "<f8",
+}
+
+# Filtro estadístico: vecinos considerados y desviaciones permitidas
+SOR_NEIGHBORS = 16
+SOR_STD_RATIO = 2.0
+
+# Filtro por radio: radio en múltiplos del espaciado medio y vecinos mínimos
+RADIUS_FACTOR = 4.0
+RADIUS_MIN_NEIGHBORS = 4
+
+
+def read_ply_header(path):
+    """
+    Lee la cabecera de un PLY
+
+    Returns:
+        (formato, lista de elementos [(nombre, cantidad, propiedades)], tamaño de la cabecera)
+    """
+    elements = []
+    file_format = None
+    with open(path, "rb") as file:
+        if file.readline().strip() != b"ply":
+            raise ValueError(f"No es un archivo PLY: {path}")
+        while True:
+            line = file.readline()
+            if not line:
+                raise ValueError(f"Cabecera PLY incompleta: {path}")
+            tokens = line.decode("ascii", errors="replace").split()
+            if not tokens:
+                continue
+            if tokens[0] == "format":
+                file_format = tokens[1]
+            elif tokens[0] == "element":
+                elements.append((tokens[1], int(tokens[2]), []))
+            elif tokens[0] == "property":
+                if tokens[1] == "list":
+                    elements[-1][2].append(
+                        (tokens[4], "list", PLY_TYPES[tokens[2]], PLY_TYPES[tokens[3]]))
+                else:
+                    elements[-1][2].append((tokens[2], PLY_TYPES[tokens[1]]))
+            elif tokens[0] == "end_header":
+                return file_format, elements, file.tell()
+
+
+def ply_element_count(path, element_name):
+    """
+    Número de registros de un elemento ("vertex", "face") leyendo solo la cabecera,
+    o None si el archivo no se puede leer
+    """
+    try:
+        elements = read_ply_header(path)[1]
+    except (OSError, ValueError, KeyError):
+        return None
+    for name, count, _ in elements:
+        if name == element_name:
+            return count
+    return None
+
+
+def list_record_offsets(raw, header_size, count, properties):
+    """
+    Offset de cada registro de vértice cuando tiene listas. El inicio de cada
+    registro depende de las longitudes de las listas anteriores, así que se
+    recorren en orden, pero las propiedades fijas se saltan en bloque y solo
+    se lee el campo de longitud de cada lista (un byte en las de OpenMVS)
+
+    Returns:
+        Array de count + 1 offsets; el último es el final de los vértices
+    """
+    # Cada lista se describe como (bytes fijos previos, bytes de la longitud, bytes por elemento)
+    lists = []
+    skip = 0
+    for prop in properties:
+        if prop[1] == "list":
+            lists.append((skip, np.dtype(prop[2]).itemsize, np.dtype(prop[3]).itemsize))
+            skip = 0
+        else:
+            skip += np.dtype(prop[1]).itemsize
+    tail = skip
+
+    data = memoryview(raw)
+    starts = [0] * (count + 1)
+    offset = header_size
+    if all(size == 1 for _, size, _ in lists):
+        for i in range(count):
+            starts[i] = offset
+            for skip, _, item_size in lists:
+                offset += skip
+                offset += 1 + item_size * data[offset]
+            offset += tail
+    else:
+        for i in range(count):
+            starts[i] = offset
+            for skip, size, item_size in lists:
+                offset += skip
+                length = int.from_bytes(data[offset:offset + size], "little")
+                offset += size + item_size * length
+            offset += tail
+    starts[count] = offset
+    return np.array(starts, dtype=np.int64)
+
+
+def load_ply_vertices(path):
+    """
+    Carga los vértices de un PLY binario little-endian mapeando el archivo en memoria.
+    Si los vértices solo tienen propiedades de tamaño fijo el resultado es una vista
+    sin copia; con listas (p. ej. las vistas de OpenMVS) se localiza el inicio de
+    cada registro y se extraen las propiedades fijas
+
+    Returns:
+        dict con las coordenadas (N x 3), el dtype fijo y los offsets de cada registro
+    """
+    file_format, elements, header_size = read_ply_header(path)
+    if file_format != "binary_little_endian":
+        raise ValueError(f"Formato PLY no soportado: {file_format}")
+    if not elements or elements[0][0] != "vertex":
+        raise ValueError("El PLY no empieza con el elemento vertex")
+
+    _, count, properties = elements[0]
+    fixed = [(name, dtype) for name, dtype, *rest in properties if dtype != "list"]
+    has_lists = any(prop[1] == "list" for prop in properties)
+
+    raw = np.memmap(path, dtype=np.uint8, mode="r")
+    info = {
+        "header_size": header_size,
+        "count": count,
+        "properties": properties,
+        "elements": elements,
+        "raw": raw
+    }
+
+    if not has_lists:
+        record_dtype = np.dtype(fixed)
+        vertices = np.frombuffer(raw, dtype=record_dtype, count=count,
+                                 offset=header_size)
+        info.update({"record_dtype": record_dtype, "vertices": vertices,
+                     "offsets": None, "end": header_size + record_dtype.itemsize * count})
+    else:
+        offsets = list_record_offsets(raw, header_size, count, properties)
+
+        # Extraer x, y, z (propiedades fijas previas a la primera lista)
+        prefix = []
+        for prop in properties:
+            if prop[1] == "list":
+                break
+            prefix.append((prop[0], prop[1]))
+        prefix_dtype = np.dtype(prefix)
+        if not {"x", "y", "z"} <= set(prefix_dtype.names or ()):
+            raise ValueError("Las coordenadas deben preceder a las listas del PLY")
+        gathered = raw[offsets[:-1, None] + np.arange(prefix_dtype.itemsize)]
+        vertices = gathered.view(prefix_dtype).reshape(count)
+        info.update({"record_dtype": None, "vertices": vertices,
+                     "offsets": offsets, "end": int(offsets[-1])})
+
+    info["xyz"] = np.stack([vertices["x"], vertices["y"], vertices["z"]],
+                           axis=1).astype(np.float64)
+    return info
+
+
+def statistical_outlier_mask(tree, xyz, neighbors=SOR_NEIGHBORS, std_ratio=SOR_STD_RATIO):
+    """
+    Filtro estadístico: descarta puntos cuya distancia media a sus k vecinos
+    supera la media global en más de std_ratio desviaciones
+    """
+    k = min(neighbors + 1, len(xyz))
+    distances, _ = tree.query(xyz, k=k, workers=-1)
+    mean_distance = distances[:, 1:].mean(axis=1)
+    threshold = mean_distance.mean() + std_ratio * mean_distance.std()
+    return mean_distance <= threshold, float(np.median(distances[:, 1]))
+
+
+def radius_outlier_mask(tree, xyz, radius, min_neighbors=RADIUS_MIN_NEIGHBORS):
+    """
+    Filtro por radio: descarta puntos con menos de min_neighbors vecinos dentro del radio
+    """
+    counts = tree.query_ball_point(xyz, r=radius, workers=-1, return_length=True)
+    return counts - 1 >= min_neighbors
+
+
+def voxel_downsample_mask(xyz, voxel_size):
+    """
+    Conserva un punto por vóxel
+    """
+    keys = np.floor((xyz - xyz.min(axis=0)) / voxel_size).astype(np.int64)
+    _, first = np.unique(keys, axis=0, return_index=True)
+    mask = np.zeros(len(xyz), dtype=bool)
+    mask[first] = True
+    return mask
+
+
+def write_filtered_ply(info, keep, output_path):
+    """
+    Escribe un PLY con los vértices conservados, preservando todas sus propiedades
+    (incluidas las listas de vistas) y los elementos posteriores sin cambios
+    """
+    kept = int(np.count_nonzero(keep))
+    raw = info["raw"]
+
+    with open(output_path, "wb") as file:
+        header = bytes(raw[:info["header_size"]]).decode("ascii")
+        header = header.replace(f"element vertex {info['count']}",
+                                f"element vertex {kept}", 1)
+        file.write(header.encode("ascii"))
+
+        if info["offsets"] is None:
+            info["vertices"][keep].tofile(file)
+        else:
+            # Copiar tramos contiguos de registros conservados
+            offsets = info["offsets"]
+            change = np.flatnonzero(np.diff(np.concatenate(
+                [[False], keep, [False]]).astype(np.int8)))
+            for start, end in zip(change[::2], change[1::2]):
+                file.write(raw[offsets[start]:offsets[end]].tobytes())
+
+        file.write(raw[info["end"]:].tobytes())
+
+
+def filter_dense_point_cloud(input_path, output_path, voxel_factor=0.0):
+    """
+    Limpia la nube densa antes del mallado: filtro estadístico, filtro por
+    radio y, opcionalmente, submuestreo por vóxeles
+
+    Args:
+        input_path: PLY denso generado por DensifyPointCloud
+        output_path: PLY filtrado
+        voxel_factor: Tamaño de vóxel en múltiplos del espaciado medio (0 = sin submuestreo)
+
+    Returns:
+        dict con puntos antes y después de cada filtro
+    """
+    start_time = time.time()
+    info = load_ply_vertices(input_path)
+    xyz = info["xyz"]
+    points_before = len(xyz)
+
+    if points_before <= SOR_NEIGHBORS:
+        return None
+
+    tree = cKDTree(xyz)
+    keep, spacing = statistical_outlier_mask(tree, xyz)
+    after_statistical = int(np.count_nonzero(keep))
+
+    keep &= radius_outlier_mask(tree, xyz, RADIUS_FACTOR * spacing)
+    after_radius = int(np.count_nonzero(keep))
+
+    if voxel_factor > 0:
+        voxel_mask = np.zeros_like(keep)
+        voxel_mask[np.flatnonzero(keep)[voxel_downsample_mask(
+            xyz[keep], voxel_factor * spacing)]] = True
+        keep = voxel_mask
+
+    write_filtered_ply(info, keep, output_path)
+    points_after = int(np.count_nonzero(keep))
+
+    return {
+        "points_before": points_before,
+        "points_after_statistical": after_statistical,
+        "points_after_radius": after_radius,
+        "points_after": points_after,
+        "removed_ratio": round(1 - points_after / points_before, 4),
+        "voxel_factor": voxel_factor,
+        "filter_time_seconds": round(time.time() - start_time, 2),
+        "output_size_mb": round(os.path.getsize(output_path) / (1024 * 1024), 2)
+    }
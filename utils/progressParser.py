@@ -0,0 +1,114 @@
+import re
+import time
+
+
+# Número de etapas principales del pipeline ("1." a "10.")
+PIPELINE_STAGES = 10
+
+# Intervalo mínimo entre eventos de progreso de un mismo proceso
+PROGRESS_MIN_INTERVAL = 0.5
+
+# COLMAP: contadores [actual/total] de cada herramienta
+COUNTER_PATTERNS = [
+    (re.compile(r"Processed file \[(\d+)/(\d+)\]"), "Procesando imágenes"),
+    (re.compile(r"Matching block \[(\d+)/(\d+)(?:, (\d+)/(\d+))?\]"), "Emparejando bloques"),
+    (re.compile(r"Matching image \[(\d+)/(\d+)\]"), "Emparejando imágenes"),
+    (re.compile(r"Undistorting image \[(\d+)/(\d+)\]"), "Corrigiendo distorsión"),
+]
+
+# COLMAP mapper / image_registrator: "Registering image #12 (15)"
+REGISTERED_PATTERN = re.compile(r"Registering image #\d+ \((\d+)\)")
+
+# OpenMVS: "Estimated depth-maps 10 (16.67%, 4s, ETA 20s)..."
+OPENMVS_PATTERN = re.compile(
+    r"([A-Za-z][A-Za-z \-]+?)\s+(?:\d+\s+)?\((\d+(?:\.\d+)?)%")
+ETA_PATTERN = re.compile(r"ETA ([^)]+)\)")
+STAGE_NUMBER_PATTERN = re.compile(r"^(\d+)")
+
+
+def parse_progress_line(line):
+    """
+    Extrae el progreso de una línea de salida de COLMAP u OpenMVS
+
+    Returns:
+        dict con label, current/total y/o percent, o None si la línea no indica progreso
+    """
+    for pattern, label in COUNTER_PATTERNS:
+        match = pattern.search(line)
+        if not match:
+            continue
+        current, total = int(match.group(1)), int(match.group(2))
+        if pattern.groups == 4 and match.group(3):
+            # Bloques anidados del emparejamiento exhaustivo: [i/n, j/n]
+            inner, inner_total = int(match.group(3)), int(match.group(4))
+            current = (current - 1) * inner_total + inner
+            total = total * inner_total
+        return {"label": label, "current": current, "total": total,
+                "percent": round(100.0 * current / total, 1) if total else None}
+
+    match = REGISTERED_PATTERN.search(line)
+    if match:
+        return {"label": "Imágenes registradas", "current": int(match.group(1)),
+                "total": None, "percent": None}
+
+    match = OPENMVS_PATTERN.search(line)
+    if match:
+        progress = {"label": match.group(1).strip(), "percent": float(match.group(2))}
+        eta = ETA_PATTERN.search(line)
+        if eta:
+            progress["eta"] = eta.group(1).strip()
+        return progress
+
+    return None
+
+
+def overall_progress(stage, percent=None):
+    """
+    Porcentaje aproximado del pipeline completo a partir de la etapa en curso
+    ("7. Densificando...") y del progreso dentro de ella
+    """
+    match = STAGE_NUMBER_PATTERN.match(stage or "")
+    if not match:
+        return None
+    completed = min(int(match.group(1)), PIPELINE_STAGES) - 1
+    fraction = (percent or 0.0) / 100.0
+    return round(100.0 * (completed + fraction) / PIPELINE_STAGES, 1)
+
+
+def follow_output(stream, tail, tool, publish=None, total=None):
+    """
+    Lee la salida de un proceso línea a línea conforme se produce. Conserva
+    solo las últimas líneas en tail (deque) y publica eventos de progreso
+
+    Args:
+        stream: stdout o stderr del proceso (modo texto)
+        tail: deque con tamaño máximo donde se guardan las últimas líneas
+        tool: Nombre de la herramienta que genera la salida
+        publish: Función que recibe cada evento de progreso
+        total: Total conocido para contadores sin total (p. ej. imágenes a registrar)
+    """
+    last_publish = 0.0
+
+    for line in stream:
+        line = line.rstrip()
+        if not line:
+            continue
+        tail.append(line)
+        if publish is None:
+            continue
+
+        progress = parse_progress_line(line)
+        if progress is None:
+            continue
+        if progress.get("total") is None and "current" in progress and total:
+            progress["total"] = total
+            progress["percent"] = round(100.0 * progress["current"] / total, 1)
+
+        # Limitar la frecuencia de eventos, salvo al completar
+        now = time.time()
+        finished = (progress.get("percent") or 0) >= 100
+        if now - last_publish < PROGRESS_MIN_INTERVAL and not finished:
+            continue
+
+        last_publish = now
+        publish({"type": "progress", "tool": tool, **progress})
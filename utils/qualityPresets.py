@@ -0,0 +1,64 @@
+import os
+
+
+# Hilos usados por las etapas de OpenMVS
+MAX_THREADS = os.environ.get("PIPELINE_MAX_THREADS", "24")
+
+PRESET_ORDER = ["preview", "standard", "high"]
+
+# pixel_budget_mp: megapíxeles del conjunto completo de imágenes al ingerirlas;
+# si se superan, las imágenes se reducen (ver utils/resolutionPolicy.py)
+QUALITY_PRESETS = {
+    # Modelo texturizado en pocos minutos para validar la captura
+    "preview": {
+        "max_image_size": 1600,
+        "pixel_budget_mp": 150,
+        "matching_strategy": "sequential",
+        "densify_resolution_level": 3,
+        "mesh_decimate": 0.2,
+        "mesh_face_budget": 20000,
+        "texture_resolution_level": 2
+    },
+    # Parámetros históricos del pipeline
+    "standard": {
+        "max_image_size": None,
+        "pixel_budget_mp": 800,
+        "matching_strategy": None,
+        "densify_resolution_level": 2,
+        "mesh_decimate": 0.4,
+        "mesh_face_budget": 100000,
+        "texture_resolution_level": 1
+    },
+    "high": {
+        "max_image_size": None,
+        "pixel_budget_mp": 2500,
+        "matching_strategy": None,
+        "densify_resolution_level": 1,
+        "mesh_decimate": 0.7,
+        "mesh_face_budget": 300000,
+        "texture_resolution_level": 0
+    }
+}
+
+
+def get_quality_preset(name):
+    """
+    Devuelve una copia del preset de calidad indicado
+
+    Raises:
+        ValueError: si el preset no existe
+    """
+    if name not in QUALITY_PRESETS:
+        raise ValueError(
+            f"Calidad no válida: {name}. Opciones: {', '.join(PRESET_ORDER)}")
+    preset = dict(QUALITY_PRESETS[name])
+    preset["name"] = name
+    return preset
+
+
+def next_quality_preset(name):
+    """
+    Preset inmediatamente superior, o None si ya es el más alto
+    """
+    index = PRESET_ORDER.index(name)
+    return PRESET_ORDER[index + 1] if index + 1 < len(PRESET_ORDER) else None
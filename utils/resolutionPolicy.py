@@ -0,0 +1,76 @@
+import math
+
+
+# Lado mayor mínimo de las imágenes de trabajo: por debajo SIFT pierde
+# demasiados keypoints, así que el presupuesto no reduce más allá
+MIN_WORKING_IMAGE_SIZE = 1000
+
+
+def resolution_policy(preset, image_count, max_pixels=None):
+    """
+    Política de resolución de ingesta: cada imagen puede tener como mucho
+    pixel_budget_mp / image_count megapíxeles. El max_image_size del preset
+    no se aplica aquí sino en el pipeline (SIFT y undistorter), para que las
+    imágenes guardadas sirvan también a un preset superior (reuse_sparse)
+
+    Args:
+        preset: Preset de calidad (get_quality_preset)
+        image_count: Número total de imágenes del conjunto
+        max_pixels: Píxeles por imagen ya fijados (p. ej. al añadir fotos a
+            una escena, para que las nuevas tengan el tamaño de las anteriores)
+    """
+    if max_pixels is None:
+        max_pixels = int(preset["pixel_budget_mp"] * 1e6 / max(1, image_count))
+    return {
+        "quality": preset["name"],
+        "pixel_budget_mp": preset["pixel_budget_mp"],
+        "max_pixels": max_pixels,
+        "min_side": MIN_WORKING_IMAGE_SIZE
+    }
+
+
+def target_size(width, height, policy):
+    """
+    Tamaño de trabajo de una imagen según la política. Depende solo del
+    tamaño original, así que las imágenes de una misma cámara siguen
+    compartiendo resolución (e intrínsecos)
+
+    Returns:
+        (ancho, alto); el original si no hay que reducirla
+    """
+    if not policy or not width or not height:
+        return width, height
+    longest = max(width, height)
+    scale = 1.0
+    if policy.get("max_pixels"):
+        scale = min(scale, math.sqrt(policy["max_pixels"] / (width * height)))
+    # Sin bajar de min_side
+    scale = max(scale, min(policy.get("min_side") or 0, longest) / longest)
+    if scale >= 1:
+        return width, height
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def working_scale(original_width, original_height, width, height):
+    """
+    Escala trabajo/original (1.0 si no se redujo), tomada en el lado mayor
+    para no depender de si la imagen se giró al ingerirla
+    """
+    if not original_width or not original_height or not width or not height:
+        return 1.0
+    return round(max(width, height) / max(original_width, original_height), 4)
+
+
+def summarize_working_resolution(policy, images):
+    """
+    Resumen para la respuesta de las subidas
+
+    Args:
+        images: dict nombre -> {"original_width", "original_height", "scale"}
+    """
+    scales = [image["scale"] for image in images.values()]
+    return {
+        "policy": policy,
+        "resized_images": sum(1 for scale in scales if scale < 1),
+        "min_scale": min(scales) if scales else None
+    }
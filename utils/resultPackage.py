@@ -0,0 +1,146 @@
+import os
+import re
+import zipfile
+
+
+# Formatos ya comprimidos: se guardan sin recomprimir
+STORED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".glb")
+
+# Tamaño de los bloques leídos y enviados
+CHUNK_SIZE = 1024 * 1024
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def compression_for(filename):
+    """
+    ZIP_STORED para texturas ya comprimidas y ZIP_DEFLATED para texto (OBJ, MTL)
+    """
+    if filename.lower().endswith(STORED_EXTENSIONS):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class _ChunkBuffer:
+    """
+    Destino no posicionable para ZipFile: acumula lo escrito hasta que se recoge
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_zip(folder, filenames, chunk_size=CHUNK_SIZE):
+    """
+    Genera el ZIP por bloques a medida que lee los archivos, sin construirlo
+    completo en memoria ni en disco. Sirve tanto para escribirlo a un archivo
+    como para enviarlo directamente en una StreamingResponse
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for filename in filenames:
+            path = os.path.join(folder, filename)
+            if not os.path.exists(path):
+                continue
+            info = zipfile.ZipInfo.from_file(path, filename)
+            info.compress_type = compression_for(filename)
+            with open(path, "rb") as source, archive.open(info, "w") as target:
+                while True:
+                    data = source.read(chunk_size)
+                    if not data:
+                        break
+                    target.write(data)
+                    if buffer.chunks:
+                        yield buffer.take()
+    # Descriptores de datos pendientes y directorio central
+    if buffer.chunks:
+        yield buffer.take()
+
+
+def write_result_zip(folder, filenames, zip_path):
+    """
+    Empaqueta los resultados en zip_path por bloques
+
+    Returns:
+        Tamaño del ZIP en bytes
+    """
+    temp_path = zip_path + ".part"
+    with open(temp_path, "wb") as file:
+        for data in iter_zip(folder, filenames):
+            file.write(data)
+    os.replace(temp_path, zip_path)
+    return os.path.getsize(zip_path)
+
+
+def file_etag(path):
+    """
+    ETag fuerte a partir del tamaño y la fecha de modificación del archivo
+    """
+    stat = os.stat(path)
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Indica si la cabecera If-None-Match incluye el ETag actual
+    """
+    tags = [tag.strip() for tag in (if_none_match or "").split(",")]
+    return etag in tags or "*" in tags
+
+
+def parse_range(header, size):
+    """
+    Interpreta una cabecera Range de un solo intervalo
+
+    Returns:
+        (inicio, fin) inclusivos, None si no hay rango utilizable (se envía el
+        archivo completo) o "unsatisfiable" si el rango queda fuera del archivo
+    """
+    match = RANGE_PATTERN.match((header or "").strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    start, end = match.group(1), match.group(2)
+    if start == "":
+        # Sufijo: los últimos N bytes
+        length = int(end)
+        if length == 0:
+            return "unsatisfiable"
+        return max(0, size - length), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        return "unsatisfiable"
+    return start, min(int(end), size - 1) if end else size - 1
+
+
+def iter_file_range(path, start, end, chunk_size=CHUNK_SIZE):
+    """
+    Lee los bytes [start, end] del archivo por bloques
+    """
+    with open(path, "rb") as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = file.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
@@ -0,0 +1,154 @@
+import os
+import numpy as np
+from utils.stageProfiler import load_profiles, PROFILES_DIR
+
+
+# Timeout de cada comando = TIMEOUT_FACTOR x duración prevista de su etapa
+TIMEOUT_FACTOR = float(os.environ.get("STAGE_TIMEOUT_FACTOR", "4"))
+MIN_STAGE_TIMEOUT = 120
+MAX_STAGE_TIMEOUT = 6 * 3600
+
+# Timeouts sin historial suficiente para predecir la etapa
+DEFAULT_STAGE_TIMEOUTS = {
+    "1": 600, "2": 600, "3": 1200, "5": 600, "6": 300,
+    "7": 1800, "8": 1800, "9": 1800
+}
+DEFAULT_STAGE_TIMEOUT = 600
+
+# Ejecuciones mínimas para ajustar el modelo de una etapa
+MIN_SAMPLES = 5
+
+# Duración mínima considerada (etapas casi instantáneas)
+MIN_STAGE_SECONDS = 0.01
+
+# Variables explicativas: número de imágenes y megapíxeles, más el tamaño
+# de la entrada de la etapa cuando ya se conoce
+BASE_FEATURES = ("images", "megapixels")
+STAGE_SIZE_FEATURES = {
+    "7": "sparse_points",
+    "7b": "dense_points",
+    "8": "dense_points",
+    "8b": "mesh_faces",
+    "9": "mesh_faces"
+}
+
+# En modo append estas etapas solo procesan las imágenes nuevas
+APPEND_STAGES = ("1", "2", "3")
+
+_cache = {"key": None, "model": None}
+
+
+def _design_row(features, names):
+    values = [features.get(name) for name in names]
+    if any(value is None or value <= 0 for value in values):
+        return None
+    return [1.0] + [float(np.log(value)) for value in values]
+
+
+def fit_stage_model(samples, names):
+    """
+    Ajusta log(duración) = a + sum(b_i * log(x_i)) por mínimos cuadrados
+
+    Args:
+        samples: Lista de (variables, segundos)
+        names: Variables explicativas
+
+    Returns:
+        dict con variables y coeficientes, o None sin datos suficientes
+    """
+    rows, targets = [], []
+    for features, seconds in samples:
+        row = _design_row(features, names)
+        if row is None:
+            continue
+        rows.append(row)
+        targets.append(np.log(max(seconds, MIN_STAGE_SECONDS)))
+    if len(rows) < max(MIN_SAMPLES, len(names) + 2):
+        return None
+
+    coefficients = np.linalg.lstsq(np.array(rows), np.array(targets), rcond=None)[0]
+    return {
+        "features": list(names),
+        "coefficients": coefficients.tolist(),
+        "samples": len(rows)
+    }
+
+
+def fit_runtime_model(profiles):
+    """
+    Ajusta un modelo por etapa y preset de calidad (y otro común a todos los
+    presets) con los perfiles de pipelines completos. Cada etapa tiene un
+    modelo con el tamaño de su entrada y otro solo con imágenes y megapíxeles,
+    para poder predecir antes de conocer ese tamaño
+    """
+    samples = {}
+    for profile in profiles:
+        stages = profile.get("stages", [])
+        # Los perfiles de pipelines fallidos o cancelados tienen etapas truncadas
+        if not stages or stages[-1]["stage"] != "10":
+            continue
+        features = dict(profile.get("dataset") or {})
+        for stage in stages:
+            if profile.get("append") and stage["stage"] in APPEND_STAGES:
+                continue
+            for quality in (profile.get("quality"), None):
+                samples.setdefault((quality, stage["stage"]), []).append(
+                    (features, stage["wall_seconds"]))
+
+    model = {}
+    for (quality, stage), stage_samples in samples.items():
+        candidates = []
+        size_feature = STAGE_SIZE_FEATURES.get(stage)
+        if size_feature:
+            candidates.append(fit_stage_model(stage_samples, BASE_FEATURES + (size_feature,)))
+        candidates.append(fit_stage_model(stage_samples, BASE_FEATURES))
+        candidates = [candidate for candidate in candidates if candidate]
+        if candidates:
+            model[(quality, stage)] = candidates
+    return model
+
+
+def get_runtime_model(profiles_dir=PROFILES_DIR):
+    """
+    Modelo ajustado con los perfiles guardados; se reajusta solo cuando
+    cambia el contenido del directorio de perfiles
+    """
+    try:
+        key = (profiles_dir, os.stat(profiles_dir).st_mtime_ns)
+    except OSError:
+        return {}
+    if _cache["key"] != key:
+        _cache["model"] = fit_runtime_model(load_profiles("photogrammetry", profiles_dir))
+        _cache["key"] = key
+    return _cache["model"]
+
+
+def predict_stage_seconds(model, stage, features, quality=None, pooled=True):
+    """
+    Duración prevista de una etapa en segundos, o None si no hay modelo
+    para ella. Se prefiere el modelo del preset y el que usa más variables
+
+    Args:
+        pooled: Recurrir al modelo común a todos los presets si el del preset
+            no existe. Ese modelo no distingue presets, así que sirve para el
+            ETA pero no para acotar la duración de un preset concreto
+    """
+    for group in ((quality, None) if pooled else (quality,)):
+        for candidate in model.get((group, stage), []):
+            row = _design_row(features, candidate["features"])
+            if row is not None:
+                return round(float(np.exp(np.dot(row, candidate["coefficients"]))), 1)
+    return None
+
+
+def stage_timeout(model, stage, features, quality=None):
+    """
+    Timeout de los comandos de una etapa: un múltiplo de la duración prevista
+    con el modelo del mismo preset, o el valor por defecto si ese preset no
+    tiene historial suficiente
+    """
+    predicted = predict_stage_seconds(model, stage, features, quality, pooled=False)
+    if predicted is None:
+        return DEFAULT_STAGE_TIMEOUTS.get(stage, DEFAULT_STAGE_TIMEOUT)
+    return int(min(MAX_STAGE_TIMEOUT, max(MIN_STAGE_TIMEOUT, TIMEOUT_FACTOR * predicted)))
+
@@ -0,0 +1,63 @@
+import json
+import os
+import shutil
+
+
+SCENE_STATE_DIR = "/data/scene_state"
+
+
+def save_scene_state(database_path, sparse_model_path, image_names, state_dir=SCENE_STATE_DIR,
+                     **metadata):
+    """
+    Conserva la base de datos y el modelo disperso de la escena reconstruida
+    para poder añadir imágenes después sin repetir todo el pipeline
+
+    Args:
+        database_path: Base de datos de COLMAP con features y emparejamientos
+        sparse_model_path: Carpeta del modelo disperso usado en la reconstrucción
+        image_names: Imágenes que forman parte de la escena
+        **metadata: Datos adicionales de la reconstrucción (p. ej. el preset de calidad)
+    """
+    clear_scene_state(state_dir)
+    os.makedirs(state_dir)
+
+    shutil.move(database_path, os.path.join(state_dir, "database.db"))
+    shutil.move(sparse_model_path, os.path.join(state_dir, "sparse"))
+
+    with open(os.path.join(state_dir, "scene.json"), "w") as file:
+        json.dump({"images": sorted(image_names), **metadata}, file)
+
+
+def load_scene_state(state_dir=SCENE_STATE_DIR):
+    """
+    Lee la información de la escena conservada.
+    Retorna None si no hay una escena completa disponible
+    """
+    info_path = os.path.join(state_dir, "scene.json")
+    if not (os.path.exists(info_path) and
+            os.path.exists(os.path.join(state_dir, "database.db")) and
+            os.path.isdir(os.path.join(state_dir, "sparse"))):
+        return None
+
+    try:
+        with open(info_path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Error leyendo estado de la escena: {e}")
+        return None
+
+
+def restore_scene_state(database_path, sparse_model_path, state_dir=SCENE_STATE_DIR):
+    """
+    Copia la base de datos y el modelo conservados al espacio de trabajo.
+    Se copian (no se mueven) para que un fallo no destruya la escena guardada
+    """
+    shutil.copy2(os.path.join(state_dir, "database.db"), database_path)
+    if os.path.exists(sparse_model_path):
+        shutil.rmtree(sparse_model_path)
+    shutil.copytree(os.path.join(state_dir, "sparse"), sparse_model_path)
+
+
+def clear_scene_state(state_dir=SCENE_STATE_DIR):
+    if os.path.exists(state_dir):
+        shutil.rmtree(state_dir)
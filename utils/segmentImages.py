@@ -1,4 +1,5 @@
 import os
+import time
 import cv2
 import numpy as np
 from pathlib import Path
@@ -7,6 +8,7 @@ from ultralytics import YOLO
 from concurrent.futures import ThreadPoolExecutor
 from shutil import rmtree
 from collections import Counter
+from utils.metrics import inc_counter, observe
 
 
 def segment_images_for_photogrammetry(input_folder, output_folder_segmented=None, output_folder_mask=None,
@@ -289,7 +291,10 @@ def segment_images_for_photogrammetry(input_folder, output_folder_segmented=None
                 confidence_levels = [confidence]
 
             for conf_level in confidence_levels:
+                inference_start = time.perf_counter()
                 results = model(img_path, conf=conf_level)
+                inc_counter("yolo_inferences_total")
+                observe("yolo_inference_seconds", time.perf_counter() - inference_start)
                 mask, best_info = get_main_object_mask(
                     results, original_image.shape, conf_level, min_area_ratio)
 
@@ -298,6 +303,7 @@ def segment_images_for_photogrammetry(input_folder, output_folder_segmented=None
                     break
 
             if mask is not None:
+                postprocess_start = time.perf_counter()
                 # Validar y corregir la máscara si es necesario
                 mask = validate_and_fix_mask(mask, original_image.shape)
 
@@ -324,6 +330,8 @@ def segment_images_for_photogrammetry(input_folder, output_folder_segmented=None
 
                 cv2.imwrite(segmented_path, segmented_image)
                 cv2.imwrite(mask_path, mask * 255)
+                observe("segmentation_postprocess_seconds",
+                        time.perf_counter() - postprocess_start)
 
                 # Información de debug
                 if best_info:
@@ -479,7 +487,10 @@ def segment_single_object_adaptive(image_path, model, confidence_levels=[0.3, 0.
     h, w = original_image.shape[:2]
 
     for confidence in confidence_levels:
+        inference_start = time.perf_counter()
         results = model(enhanced_image, conf=confidence, iou=0.7, max_det=100)
+        inc_counter("yolo_inferences_total")
+        observe("yolo_inference_seconds", time.perf_counter() - inference_start)
 
         if not results or not results[0].masks:
             continue
@@ -0,0 +1,184 @@
+import json
+import os
+import struct
+import numpy as np
+from utils.colmapModel import read_model
+
+
+SPARSE_PREVIEW_PATH = "/data/sparse_preview.glb"
+
+# Tamaño de los frustums de cámara como fracción de la extensión de la escena
+FRUSTUM_SCALE = 0.05
+
+FRUSTUM_COLOR = [1.0, 0.35, 0.0, 1.0]
+
+GLB_MAGIC = 0x46546C67
+GLB_JSON_CHUNK = 0x4E4F534A
+GLB_BIN_CHUNK = 0x004E4942
+
+# COLMAP usa y hacia abajo y z hacia delante; glTF usa y hacia arriba
+COLMAP_TO_GLTF = np.array([1.0, -1.0, -1.0])
+
+
+def qvec_to_rotation(qvec):
+    """
+    Matrices de rotación (N x 3 x 3) a partir de cuaterniones de COLMAP (w, x, y, z)
+    """
+    w, x, y, z = qvec.T
+    return np.stack([
+        1 - 2 * y * y - 2 * z * z, 2 * x * y - 2 * w * z, 2 * x * z + 2 * w * y,
+        2 * x * y + 2 * w * z, 1 - 2 * x * x - 2 * z * z, 2 * y * z - 2 * w * x,
+        2 * x * z - 2 * w * y, 2 * y * z + 2 * w * x, 1 - 2 * x * x - 2 * y * y
+    ], axis=1).reshape(-1, 3, 3)
+
+
+def camera_intrinsics(model_id, params):
+    """
+    (fx, fy, cx, cy) de una cámara de COLMAP
+    """
+    # Modelos con focal única: SIMPLE_PINHOLE, SIMPLE_RADIAL, RADIAL, FOV...
+    if model_id in (0, 2, 3, 8, 9):
+        return params[0], params[0], params[1], params[2]
+    return params[0], params[1], params[2], params[3]
+
+
+def build_camera_frustums(model, scale):
+    """
+    Vértices e índices de líneas de los frustums (centro + 4 esquinas por imagen)
+    """
+    images = model["images"]
+    cameras = {int(camera["camera_id"]): camera for camera in model["cameras"]}
+
+    rotations = qvec_to_rotation(images["qvec"])
+    centers = -np.einsum("nji,nj->ni", rotations, images["tvec"])
+
+    vertices = np.empty((len(images), 5, 3))
+    for i, image in enumerate(images):
+        camera = cameras[int(image["camera_id"])]
+        fx, fy, cx, cy = camera_intrinsics(
+            int(camera["model_id"]), model["camera_params"][int(camera["camera_id"])])
+        width, height = float(camera["width"]), float(camera["height"])
+        corners = np.array([
+            [(0 - cx) / fx, (0 - cy) / fy, 1.0],
+            [(width - cx) / fx, (0 - cy) / fy, 1.0],
+            [(width - cx) / fx, (height - cy) / fy, 1.0],
+            [(0 - cx) / fx, (height - cy) / fy, 1.0],
+        ]) * scale
+        vertices[i, 0] = centers[i]
+        vertices[i, 1:] = corners @ rotations[i] + centers[i]
+
+    # Aristas: centro a cada esquina y el rectángulo de la imagen
+    edges = np.array([[0, 1], [0, 2], [0, 3], [0, 4],
+                      [1, 2], [2, 3], [3, 4], [4, 1]], dtype=np.uint32)
+    indices = (edges[None, :, :] + 5 * np.arange(len(images), dtype=np.uint32)[:, None, None])
+    return vertices.reshape(-1, 3), indices.reshape(-1)
+
+
+def _pad4(data, fill=b"\x00"):
+    return data + fill * (-len(data) % 4)
+
+
+def write_glb(path, point_positions, point_colors, line_positions, line_indices):
+    """
+    Escribe un glTF binario con una primitiva de puntos coloreados y otra de
+    líneas para los frustums
+    """
+    chunks = []
+    buffer_views = []
+    offset = 0
+
+    def add_view(array, target):
+        nonlocal offset
+        data = _pad4(np.ascontiguousarray(array).tobytes())
+        buffer_views.append({"buffer": 0, "byteOffset": offset,
+                             "byteLength": array.nbytes, "target": target})
+        chunks.append(data)
+        offset += len(data)
+        return len(buffer_views) - 1
+
+    accessors = []
+
+    def add_accessor(view, component_type, count, accessor_type, **extra):
+        accessors.append({"bufferView": view, "componentType": component_type,
+                          "count": int(count), "type": accessor_type, **extra})
+        return len(accessors) - 1
+
+    positions = point_positions.astype(np.float32)
+    colors = np.concatenate(
+        [point_colors, np.full((len(point_colors), 1), 255, dtype=np.uint8)], axis=1)
+    point_position_accessor = add_accessor(
+        add_view(positions, 34962), 5126, len(positions), "VEC3",
+        min=positions.min(axis=0).tolist(), max=positions.max(axis=0).tolist())
+    point_color_accessor = add_accessor(
+        add_view(colors, 34962), 5121, len(colors), "VEC4", normalized=True)
+
+    primitives = [{"attributes": {"POSITION": point_position_accessor,
+                                  "COLOR_0": point_color_accessor}, "mode": 0}]
+
+    if len(line_positions):
+        frustum_positions = line_positions.astype(np.float32)
+        line_position_accessor = add_accessor(
+            add_view(frustum_positions, 34962), 5126, len(frustum_positions), "VEC3",
+            min=frustum_positions.min(axis=0).tolist(),
+            max=frustum_positions.max(axis=0).tolist())
+        line_index_accessor = add_accessor(
+            add_view(line_indices, 34963), 5125, len(line_indices), "SCALAR")
+        primitives.append({"attributes": {"POSITION": line_position_accessor},
+                           "indices": line_index_accessor, "mode": 1, "material": 0})
+
+    document = {
+        "asset": {"version": "2.0", "generator": "photogrammetry sparse preview"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0}],
+        "meshes": [{"primitives": primitives}],
+        "materials": [{"pbrMetallicRoughness": {"baseColorFactor": FRUSTUM_COLOR}}],
+        "accessors": accessors,
+        "bufferViews": buffer_views,
+        "buffers": [{"byteLength": offset}]
+    }
+
+    write_glb_container(path, document, b"".join(chunks))
+
+
+def write_glb_container(path, document, bin_chunk):
+    """
+    Escribe el documento glTF y su buffer binario (ya alineado) como GLB
+    """
+    json_chunk = _pad4(json.dumps(document, separators=(",", ":")).encode("utf-8"), b" ")
+    total_length = 12 + 8 + len(json_chunk) + 8 + len(bin_chunk)
+
+    with open(path, "wb") as file:
+        file.write(struct.pack("<III", GLB_MAGIC, 2, total_length))
+        file.write(struct.pack("<II", len(json_chunk), GLB_JSON_CHUNK))
+        file.write(json_chunk)
+        file.write(struct.pack("<II", len(bin_chunk), GLB_BIN_CHUNK))
+        file.write(bin_chunk)
+
+
+def export_sparse_preview(model_path, output_path=SPARSE_PREVIEW_PATH):
+    """
+    Exporta la nube dispersa coloreada y los frustums de cámara de un modelo
+    binario de COLMAP a un GLB que se puede revisar antes de las etapas densas
+
+    Returns:
+        dict con puntos, cámaras y tamaño del archivo, o None si el modelo está vacío
+    """
+    model = read_model(model_path)
+    points = model["points3D"]
+    if len(points) == 0:
+        return None
+
+    xyz = points["xyz"]
+    low, high = np.percentile(xyz, [2, 98], axis=0)
+    scale = FRUSTUM_SCALE * float(np.linalg.norm(high - low))
+
+    frustum_vertices, frustum_indices = build_camera_frustums(model, scale)
+    write_glb(output_path, xyz * COLMAP_TO_GLTF, points["rgb"],
+              frustum_vertices * COLMAP_TO_GLTF, frustum_indices)
+
+    return {
+        "points": int(len(points)),
+        "cameras": int(len(model["images"])),
+        "size_bytes": os.path.getsize(output_path)
+    }
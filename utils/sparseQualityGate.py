@@ -0,0 +1,96 @@
+import os
+from utils.colmapModel import compute_model_statistics, model_exists
+
+
+# Umbrales por defecto de la verificación posterior al mapper
+MIN_REGISTRATION_RATIO = 0.6
+MIN_SPARSE_POINTS = 500
+MIN_MEAN_TRACK_LENGTH = 2.5
+
+
+class SparseQualityError(Exception):
+    """
+    La reconstrucción dispersa no alcanza la calidad mínima para continuar
+    """
+
+    def __init__(self, message, diagnostics):
+        super().__init__(message)
+        self.diagnostics = diagnostics
+
+
+def inspect_sparse_models(sparse_root, total_images):
+    """
+    Calcula las estadísticas de cada modelo generado por el mapper en sparse_root/*
+
+    Returns:
+        Lista de dicts con la ruta y estadísticas de cada modelo, del más grande al más pequeño
+    """
+    if not os.path.isdir(sparse_root):
+        return []
+
+    models = []
+    for entry in sorted(os.listdir(sparse_root)):
+        model_path = os.path.join(sparse_root, entry)
+        if not os.path.isdir(model_path) or not model_exists(model_path):
+            continue
+        stats = compute_model_statistics(model_path, total_images=total_images)
+        if stats:
+            stats["model"] = entry
+            stats["path"] = model_path
+            models.append(stats)
+
+    models.sort(key=lambda m: (m["registered_images"], m["points3D"]), reverse=True)
+    return models
+
+
+def evaluate_sparse_quality(sparse_root, total_images,
+                            min_registration_ratio=MIN_REGISTRATION_RATIO,
+                            min_points=MIN_SPARSE_POINTS,
+                            min_track_length=MIN_MEAN_TRACK_LENGTH):
+    """
+    Verifica la reconstrucción dispersa antes de las etapas densas (costosas).
+    Elige el modelo más grande en lugar de asumir sparse/0
+
+    Returns:
+        dict de diagnóstico con el modelo elegido, los umbrales y los fallos encontrados
+    """
+    models = inspect_sparse_models(sparse_root, total_images)
+    thresholds = {
+        "min_registration_ratio": min_registration_ratio,
+        "min_points": min_points,
+        "min_mean_track_length": min_track_length
+    }
+
+    if not models:
+        return {
+            "passed": False,
+            "best_model": None,
+            "models": [],
+            "thresholds": thresholds,
+            "failures": ["El mapper no generó ningún modelo"]
+        }
+
+    best = models[0]
+    failures = []
+
+    if best["registration_ratio"] < min_registration_ratio:
+        failures.append(
+            f"Solo {best['registered_images']} de {total_images} imágenes registradas "
+            f"({best['registration_ratio']:.0%} < {min_registration_ratio:.0%})")
+    if best["points3D"] < min_points:
+        failures.append(
+            f"Pocos puntos 3D ({best['points3D']} < {min_points})")
+    if best["mean_track_length"] < min_track_length:
+        failures.append(
+            f"Longitud media de track baja ({best['mean_track_length']} < {min_track_length})")
+
+    return {
+        "passed": not failures,
+        "best_model": best["model"],
+        "best_model_path": best["path"],
+        "num_models": len(models),
+        "models": [{key: value for key, value in model.items() if key != "path"}
+                   for model in models],
+        "thresholds": thresholds,
+        "failures": failures
+    }
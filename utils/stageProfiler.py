@@ -0,0 +1,290 @@
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+from utils.metrics import observe
+from utils.imageProbe import directory_index
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+PROFILES_DIR = os.environ.get("PROFILES_DIR", "/data/cache/profiles")
+
+# Perfiles conservados; los más antiguos se eliminan
+MAX_PROFILES = 500
+
+# Intervalo de muestreo del árbol de procesos hijos (RSS e I/O)
+PROFILE_SAMPLE_SECONDS = 0.5
+
+# Clases de dataset para agregar perfiles: número de imágenes y megapíxeles
+IMAGE_COUNT_BUCKETS = [25, 50, 100, 200, 400]
+MEGAPIXEL_BUCKETS = [2, 6, 12, 24]
+
+_local = threading.local()
+
+
+def describe_dataset(image_folder, image_names):
+    """
+    Número de imágenes y resolución mediana (leída de las cabeceras con el
+    índice de la carpeta, sin decodificar las imágenes)
+    """
+    index = directory_index(image_folder)
+    sizes = [(index[name]["width"], index[name]["height"]) for name in image_names
+             if name in index and index[name]["width"] and index[name]["height"]]
+
+    megapixels = float(np.median([w * h for w, h in sizes])) / 1e6 if sizes else None
+    return {
+        "images": len(image_names),
+        "megapixels": round(megapixels, 2) if megapixels else None,
+        "width": int(np.median([w for w, _ in sizes])) if sizes else None,
+        "height": int(np.median([h for _, h in sizes])) if sizes else None
+    }
+
+
+def _bucket_label(value, buckets):
+    if value is None:
+        return "desconocido"
+    for limit in buckets:
+        if value <= limit:
+            return f"<={limit}"
+    return f">{buckets[-1]}"
+
+
+def dataset_class(dataset):
+    return (f"{_bucket_label(dataset.get('images'), IMAGE_COUNT_BUCKETS)} imágenes, "
+            f"{_bucket_label(dataset.get('megapixels'), MEGAPIXEL_BUCKETS)} MP")
+
+
+def _process_io():
+    if psutil is None:
+        return 0, 0
+    try:
+        counters = psutil.Process().io_counters()
+        return counters.read_bytes, counters.write_bytes
+    except (psutil.Error, AttributeError):
+        return 0, 0
+
+
+def new_profile(profile_id, kind, dataset=None):
+    """
+    Crea un perfil de recursos vacío para un trabajo o una subida
+    """
+    return {
+        "id": profile_id,
+        "kind": kind,
+        "dataset": dataset or {},
+        "created_at": time.time(),
+        "stages": [],
+        "_active": None
+    }
+
+
+def stage_key(description):
+    """
+    Clave de una etapa: su número ("7b") o la descripción completa
+    """
+    return description.split(".")[0].strip() if description[:1].isdigit() else description
+
+
+def start_stage(profile, description, predicted_seconds=None):
+    """
+    Cierra la etapa en curso del perfil (si hay una) y empieza a medir la siguiente
+    """
+    end_stage(profile)
+
+    record = {"stage": stage_key(description), "description": description}
+    if predicted_seconds is not None:
+        record["predicted_seconds"] = predicted_seconds
+    active = {
+        "record": record,
+        "wall": time.time(),
+        "self": resource.getrusage(resource.RUSAGE_SELF),
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN),
+        "io": _process_io(),
+        "children_peak_rss": 0,
+        "children_read": 0,
+        "children_write": 0
+    }
+    profile["_active"] = active
+    _local.active = active
+
+
+def end_stage(profile):
+    """
+    Completa la etapa en curso con tiempo, CPU propia y de los hijos, RSS pico e I/O
+    """
+    active = profile.get("_active")
+    if active is None:
+        return
+    profile["_active"] = None
+    if getattr(_local, "active", None) is active:
+        _local.active = None
+
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    read_bytes, write_bytes = _process_io()
+    process_rss = psutil.Process().memory_info().rss if psutil else \
+        self_usage.ru_maxrss * 1024
+
+    record = active["record"]
+    record.update({
+        "wall_seconds": round(time.time() - active["wall"], 3),
+        "cpu_user_seconds": round(self_usage.ru_utime - active["self"].ru_utime, 3),
+        "cpu_system_seconds": round(self_usage.ru_stime - active["self"].ru_stime, 3),
+        "children_cpu_user_seconds": round(
+            children_usage.ru_utime - active["children"].ru_utime, 3),
+        "children_cpu_system_seconds": round(
+            children_usage.ru_stime - active["children"].ru_stime, 3),
+        "children_peak_rss_mb": round(active["children_peak_rss"] / (1024 * 1024), 1),
+        "process_rss_mb": round(process_rss / (1024 * 1024), 1),
+        "read_mb": round((read_bytes - active["io"][0] + active["children_read"]) / (1024 * 1024), 2),
+        "write_mb": round((write_bytes - active["io"][1] + active["children_write"]) / (1024 * 1024), 2)
+    })
+    profile["stages"].append(record)
+    observe("pipeline_stage_duration_seconds", record["wall_seconds"],
+            kind=profile["kind"], stage=record["stage"])
+
+
+@contextmanager
+def track_process(pid):
+    """
+    Muestrea el árbol de procesos del comando en curso (RSS total e I/O por
+    proceso) y lo acumula en la etapa activa del hilo actual
+    """
+    active = getattr(_local, "active", None)
+    if active is None or psutil is None:
+        yield
+        return
+
+    stop = threading.Event()
+    io_by_pid = {}
+
+    def sample():
+        try:
+            root = psutil.Process(pid)
+        except psutil.Error:
+            return
+        while not stop.is_set():
+            try:
+                processes = [root] + root.children(recursive=True)
+            except psutil.Error:
+                break
+            rss = 0
+            for process in processes:
+                try:
+                    rss += process.memory_info().rss
+                    counters = process.io_counters()
+                    io_by_pid[process.pid] = (counters.read_bytes, counters.write_bytes)
+                except (psutil.Error, AttributeError):
+                    continue
+            active["children_peak_rss"] = max(active["children_peak_rss"], rss)
+            stop.wait(PROFILE_SAMPLE_SECONDS)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        sampler.join(timeout=2)
+        active["children_read"] += sum(read for read, _ in io_by_pid.values())
+        active["children_write"] += sum(write for _, write in io_by_pid.values())
+
+
+def finish_profile(profile, save=True):
+    """
+    Cierra la última etapa, calcula los totales y guarda el perfil en PROFILES_DIR
+
+    Returns:
+        dict serializable del perfil
+    """
+    end_stage(profile)
+    stages = profile["stages"]
+    result = {key: value for key, value in profile.items() if not key.startswith("_")}
+    result["dataset_class"] = dataset_class(profile["dataset"]) if profile["dataset"] else None
+    result["total_wall_seconds"] = round(sum(stage["wall_seconds"] for stage in stages), 2)
+    result["bottleneck_stage"] = max(
+        stages, key=lambda stage: stage["wall_seconds"])["stage"] if stages else None
+
+    if save:
+        try:
+            os.makedirs(PROFILES_DIR, exist_ok=True)
+            path = os.path.join(PROFILES_DIR, f"{profile['id']}.json")
+            with open(path, "w") as file:
+                json.dump(result, file, indent=2)
+            _evict_profiles()
+        except OSError as e:
+            print(f"Error guardando perfil {profile['id']}: {e}")
+    return result
+
+
+def _evict_profiles():
+    paths = [os.path.join(PROFILES_DIR, name) for name in os.listdir(PROFILES_DIR)
+             if name.endswith(".json")]
+    if len(paths) <= MAX_PROFILES:
+        return
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:len(paths) - MAX_PROFILES]:
+        os.remove(path)
+
+
+def load_profiles(kind=None, profiles_dir=PROFILES_DIR):
+    """
+    Lee los perfiles guardados, opcionalmente filtrados por tipo
+    """
+    if not os.path.isdir(profiles_dir):
+        return []
+    profiles = []
+    for name in os.listdir(profiles_dir):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(profiles_dir, name), "r") as file:
+                profile = json.load(file)
+        except (OSError, ValueError):
+            continue
+        if kind is None or profile.get("kind") == kind:
+            profiles.append(profile)
+    return profiles
+
+
+def aggregate_profiles(kind=None, profiles_dir=PROFILES_DIR):
+    """
+    Agrega los perfiles por clase de dataset (número de imágenes y resolución)
+    y etapa, e indica la etapa cuello de botella de cada clase
+    """
+    groups = {}
+    for profile in load_profiles(kind, profiles_dir):
+        group = groups.setdefault(profile.get("dataset_class") or "desconocido", {})
+        for stage in profile["stages"]:
+            group.setdefault(stage["stage"], []).append(stage)
+
+    summary = {}
+    for class_name, stages in groups.items():
+        stage_summary = {}
+        for key, records in stages.items():
+            wall = np.array([record["wall_seconds"] for record in records])
+            cpu = np.array([record["cpu_user_seconds"] + record["cpu_system_seconds"] +
+                            record["children_cpu_user_seconds"] + record["children_cpu_system_seconds"]
+                            for record in records])
+            stage_summary[key] = {
+                "runs": len(records),
+                "wall_seconds_mean": round(float(wall.mean()), 2),
+                "wall_seconds_p90": round(float(np.percentile(wall, 90)), 2),
+                "cpu_seconds_mean": round(float(cpu.mean()), 2),
+                "peak_rss_mb_max": max(max(record["children_peak_rss_mb"], record["process_rss_mb"])
+                                       for record in records),
+                "read_mb_mean": round(float(np.mean([record["read_mb"] for record in records])), 2),
+                "write_mb_mean": round(float(np.mean([record["write_mb"] for record in records])), 2)
+            }
+        summary[class_name] = {
+            "stages": stage_summary,
+            "bottleneck_stage": max(stage_summary, key=lambda key: stage_summary[key]["wall_seconds_mean"])
+        }
+    return summary
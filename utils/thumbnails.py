@@ -0,0 +1,212 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from utils.imageProbe import probe_image
+
+
+THUMBNAIL_DIR = os.environ.get("THUMBNAIL_DIR", "/data/cache/thumbnails")
+
+# Lado mayor de cada tamaño de miniatura (px)
+THUMBNAIL_SIZES = (160, 480, 1024)
+DEFAULT_THUMBNAIL_SIZE = 480
+
+THUMBNAIL_JPEG_QUALITY = 80
+
+# Tamaño máximo de la caché en disco; al superarlo se eliminan las miniaturas
+# usadas hace más tiempo hasta bajar a THUMBNAIL_CACHE_LOW_WATER del máximo
+THUMBNAIL_CACHE_MAX_BYTES = int(os.environ.get("THUMBNAIL_CACHE_MB", "512")) * 1024 * 1024
+THUMBNAIL_CACHE_LOW_WATER = 0.8
+
+# Las miniaturas se generan en segundo plano al subir las imágenes
+THUMBNAIL_WORKERS = min(4, os.cpu_count() or 1)
+
+# Factores de decodificación reducida de JPEG
+REDUCED_READ_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                      (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnail")
+_lock = threading.Lock()
+_pending = {}
+_cache_bytes = {"value": None}
+
+
+def source_key(image_path):
+    """
+    Identificador de la versión de una imagen: cambia si se reemplaza el archivo
+    """
+    stat = os.stat(image_path)
+    identity = f"{os.path.abspath(image_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(identity.encode()).hexdigest()[:20]
+
+
+def thumbnail_cache_path(key, size):
+    return os.path.join(THUMBNAIL_DIR, f"{key}_{size}.jpg")
+
+
+def thumbnail_etag(key, size):
+    return f'"{key}-{size}"'
+
+
+def _read_for_thumbnail(image_path):
+    """
+    Decodifica la imagen a la menor escala que aún cubre la miniatura más grande
+    (en JPEG la reducción se hace en la propia decodificación)
+    """
+    probe = probe_image(image_path)
+    if probe:
+        longest = max(probe["width"], probe["height"])
+        for factor, flag in REDUCED_READ_FLAGS:
+            if longest // factor >= max(THUMBNAIL_SIZES):
+                image = cv2.imread(image_path, flag)
+                if image is not None:
+                    return image
+                break
+    return cv2.imread(image_path)
+
+
+def _write_atomic(path, data):
+    temp_path = path + ".part"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+
+def generate_thumbnails(image_path, key):
+    """
+    Genera todos los tamaños de una imagen con una sola decodificación,
+    reduciendo en cascada del mayor al menor
+
+    Returns:
+        Bytes escritos en la caché
+    """
+    image = _read_for_thumbnail(image_path)
+    if image is None:
+        raise ValueError(f"No se pudo decodificar {os.path.basename(image_path)}")
+
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    written = 0
+    for size in sorted(THUMBNAIL_SIZES, reverse=True):
+        height, width = image.shape[:2]
+        scale = size / max(height, width)
+        if scale < 1:
+            image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_JPEG_QUALITY])
+        if not ok:
+            raise ValueError(f"No se pudo codificar la miniatura de {os.path.basename(image_path)}")
+        _write_atomic(thumbnail_cache_path(key, size), encoded.tobytes())
+        written += len(encoded)
+    return written
+
+
+def _is_cached(key):
+    return all(os.path.exists(thumbnail_cache_path(key, size)) for size in THUMBNAIL_SIZES)
+
+
+def _generate_and_account(image_path, key):
+    try:
+        written = generate_thumbnails(image_path, key)
+    finally:
+        with _lock:
+            _pending.pop(key, None)
+    _account(written)
+
+
+def _submit(image_path, key):
+    """
+    Encola la generación salvo que ya esté en curso. Debe llamarse con _lock tomado
+    """
+    future = _pending.get(key)
+    if future is None:
+        future = _pending[key] = _executor.submit(_generate_and_account, image_path, key)
+    return future
+
+
+def schedule_thumbnails(image_folder, image_names):
+    """
+    Encola en el pool en segundo plano las miniaturas que falten
+
+    Returns:
+        Número de imágenes encoladas
+    """
+    scheduled = 0
+    for name in image_names:
+        image_path = os.path.join(image_folder, name)
+        try:
+            key = source_key(image_path)
+        except OSError:
+            continue
+        if _is_cached(key):
+            continue
+        with _lock:
+            _submit(image_path, key)
+        scheduled += 1
+    return scheduled
+
+
+def thumbnail_file(image_path, size):
+    """
+    Miniatura de la imagen en el tamaño indicado. Si aún no existe (subida
+    reciente o expulsada de la caché) se espera a la generación en curso o
+    se genera en el momento
+
+    Returns:
+        (ruta de la miniatura, ETag)
+    """
+    key = source_key(image_path)
+    path = thumbnail_cache_path(key, size)
+    if not os.path.exists(path):
+        with _lock:
+            future = _submit(image_path, key)
+        future.result()
+    # La fecha de modificación hace de marca de último uso para el LRU
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return path, thumbnail_etag(key, size)
+
+
+def _account(written):
+    with _lock:
+        known = _cache_bytes["value"]
+        if known is not None:
+            _cache_bytes["value"] = known + written
+    # El primer recuento recorre la carpeta; después se lleva la cuenta en memoria
+    if known is None or known + written > THUMBNAIL_CACHE_MAX_BYTES:
+        enforce_cache_limit()
+
+
+def enforce_cache_limit(max_bytes=THUMBNAIL_CACHE_MAX_BYTES):
+    """
+    Elimina las miniaturas usadas hace más tiempo hasta dejar la caché por
+    debajo del límite
+
+    Returns:
+        Número de archivos eliminados
+    """
+    try:
+        entries = [(entry.stat().st_mtime_ns, entry.stat().st_size, entry.path)
+                   for entry in os.scandir(THUMBNAIL_DIR)
+                   if entry.is_file() and entry.name.endswith(".jpg")]
+    except OSError:
+        return 0
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    if total > max_bytes:
+        for _, size, path in sorted(entries):
+            if total <= max_bytes * THUMBNAIL_CACHE_LOW_WATER:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+    with _lock:
+        _cache_bytes["value"] = total
+    return removed